@@ -0,0 +1,216 @@
+"""Semantic answer cache keyed on question embedding and retrieved documents."""
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.database import SessionLocal, AnswerCacheEntry
+
+def documents_key(context_docs: List[Dict]) -> Tuple[int, ...]:
+    """Order-independent key for a set of retrieved documents."""
+    return tuple(sorted(int(doc["id"]) for doc in context_docs))
+
+def documents_fingerprint(context_docs: List[Dict]) -> str:
+    """Hash of the retrieved documents' contents and matched chunks, so re-ingested documents miss."""
+    digest = hashlib.sha1()
+    for doc in sorted(context_docs, key=lambda doc: int(doc["id"])):
+        digest.update(f"{doc['id']}\x00{doc.get('content') or ''}\x00{doc.get('chunk') or ''}\x00".encode("utf-8"))
+    return digest.hexdigest()
+
+class SemanticAnswerCache:
+    """LRU cache of LLM answers for near-identical questions over the same documents.
+    
+    A lookup hits when a cached question's embedding is within the cosine
+    threshold of the new question and it was answered from exactly the same
+    set of documents with unchanged contents. Entries are written through to
+    the answer_cache table in the background and reloaded on startup.
+    """
+    
+    def __init__(self, max_size: int = None, threshold: float = None, session_factory=SessionLocal):
+        self.max_size = max_size or int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+        self.threshold = threshold if threshold is not None else float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        self.session_factory = session_factory
+        self._entries = OrderedDict()  # key -> entry dict
+        self._by_docs = {}  # documents key -> set of entry keys
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_inserts = {}
+        self._pending_deletes = set()
+        self._pending_invalidations = set()  # Doc IDs whose persisted entries must go
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def lookup(self, question_embedding: np.ndarray, context_docs: List[Dict]) -> Optional[str]:
+        """Return a cached answer for a similar question over the same documents."""
+        if not context_docs:
+            return None
+        docs_key = documents_key(context_docs)
+        query = self._normalize(question_embedding)
+        
+        with self._lock:
+            candidates = [self._entries[key] for key in self._by_docs.get(docs_key, ())]
+            if candidates:
+                fingerprint = documents_fingerprint(context_docs)
+                candidates = [entry for entry in candidates if entry["fingerprint"] == fingerprint]
+            if candidates:
+                similarities = np.stack([entry["embedding"] for entry in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = candidates[best]
+                    self._entries.move_to_end(entry["key"])
+                    self.hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+    
+    def put(self, question: str, question_embedding: np.ndarray, context_docs: List[Dict], answer: str):
+        """Cache an answer generated from context_docs."""
+        if not context_docs:
+            return
+        entry = {
+            "key": uuid.uuid4().hex,
+            "question": question,
+            "embedding": self._normalize(question_embedding),
+            "doc_ids": documents_key(context_docs),
+            "fingerprint": documents_fingerprint(context_docs),
+            "answer": answer,
+            "created": time.time()
+        }
+        with self._lock:
+            self._add(entry)
+            self._pending_inserts[entry["key"]] = entry
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def _add(self, entry: Dict):
+        """Insert into the memory structures; caller must hold the lock."""
+        self._entries[entry["key"]] = entry
+        self._by_docs.setdefault(entry["doc_ids"], set()).add(entry["key"])
+    
+    def _remove(self, key: str):
+        """Remove an entry and queue its deletion; caller must hold the lock."""
+        entry = self._entries.pop(key)
+        keys = self._by_docs.get(entry["doc_ids"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_docs[entry["doc_ids"]]
+        if self._pending_inserts.pop(key, None) is None:
+            self._pending_deletes.add(key)
+    
+    def invalidate_documents(self, doc_ids: List[int]):
+        """Drop every entry that was answered from any of the given documents."""
+        doc_ids = set(int(doc_id) for doc_id in doc_ids)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if doc_ids.intersection(entry["doc_ids"])]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            # Entries persisted by other processes are not in memory here
+            self._pending_invalidations.update(doc_ids)
+    
+    def load(self):
+        """Load the most recent persisted entries into memory."""
+        if self.session_factory is None:
+            return
+        db = self.session_factory()
+        try:
+            rows = (db.query(AnswerCacheEntry)
+                    .order_by(AnswerCacheEntry.created.desc())
+                    .limit(self.max_size).all())
+            with self._lock:
+                for row in reversed(rows):
+                    self._add({
+                        "key": row.key,
+                        "question": row.question,
+                        "embedding": np.frombuffer(row.embedding, dtype='float32'),
+                        "doc_ids": tuple(row.doc_ids),
+                        "fingerprint": row.fingerprint,
+                        "answer": row.answer,
+                        "created": row.created
+                    })
+        finally:
+            db.close()
+    
+    def flush(self):
+        """Write pending inserts and deletes to the answer_cache table; a failed batch is retried on the next flush."""
+        if self.session_factory is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                inserts = list(self._pending_inserts.values())
+                deletes = list(self._pending_deletes)
+                invalidated = self._pending_invalidations
+                self._pending_inserts = {}
+                self._pending_deletes = set()
+                self._pending_invalidations = set()
+            if not inserts and not deletes and not invalidated:
+                return
+            pending_deletes = list(deletes)
+            
+            db = self.session_factory()
+            try:
+                if invalidated:
+                    rows = db.query(AnswerCacheEntry.key, AnswerCacheEntry.doc_ids).all()
+                    deletes += [row.key for row in rows if invalidated.intersection(row.doc_ids or [])]
+                if deletes:
+                    db.query(AnswerCacheEntry).filter(AnswerCacheEntry.key.in_(deletes)).delete(synchronize_session=False)
+                db.add_all([
+                    AnswerCacheEntry(
+                        key=entry["key"],
+                        question=entry["question"],
+                        embedding=entry["embedding"].tobytes(),
+                        doc_ids=list(entry["doc_ids"]),
+                        fingerprint=entry["fingerprint"],
+                        answer=entry["answer"],
+                        created=entry["created"]
+                    )
+                    for entry in inserts
+                ])
+                db.commit()
+            except Exception as e:
+                print(f"Error persisting answer cache: {e}")
+                db.rollback()
+                self._requeue(inserts, pending_deletes, invalidated)
+            finally:
+                db.close()
+    
+    def _requeue(self, inserts: List[Dict], deletes: List[str], invalidated: set):
+        """Put a batch that failed to persist back into the pending sets for the next flush."""
+        with self._lock:
+            for entry in inserts:
+                # Entries evicted since the swap need neither an insert nor a delete
+                if entry["key"] in self._entries:
+                    self._pending_inserts.setdefault(entry["key"], entry)
+            self._pending_deletes.update(deletes)
+            self._pending_invalidations.update(invalidated)
+    
+    def get_stats(self) -> dict:
+        """Hit/miss counters for /stats."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
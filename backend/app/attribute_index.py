@@ -0,0 +1,172 @@
+"""In-memory document attribute index producing ID bitsets for filtered search."""
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import faiss
+import numpy as np
+
+# Document attributes that searches can be filtered on
+ATTRIBUTES = ("topic", "source")
+
+# Set bits of every byte value, for counting a bitmap's members
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype='int64')
+
+def normalize_value(value: str) -> str:
+    """Case- and whitespace-insensitive form of an attribute value."""
+    return " ".join((value or "").split()).lower()
+
+def source_of(source_link: str) -> str:
+    """Source attribute of a document: the host of its link (e.g. en.wikipedia.org)."""
+    return normalize_value(urlparse(source_link or "").netloc)
+
+def _pack(ids: np.ndarray, num_bits: int) -> np.ndarray:
+    """Packed little-endian bitmap of num_bits bits with the given IDs set (bit i of byte j is ID 8j + i)."""
+    bits = np.zeros(num_bits, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits, bitorder='little')
+
+class IDFilter:
+    """The vectors (and documents) a filtered search may return.
+    
+    Both sets are packed bitmaps: `bits` over FAISS IDs, passed to FAISS as an
+    IDSelectorBitmap, and `doc_bits` over document IDs, for results that do
+    not come from a vector (knowledge graph re-ranking).
+    """
+    
+    def __init__(self, bits: np.ndarray, doc_bits: np.ndarray):
+        self.bits = bits
+        self.doc_bits = doc_bits
+        self._count = None
+    
+    @property
+    def count(self) -> int:
+        """Number of selected vectors."""
+        if self._count is None:
+            self._count = int(_POPCOUNT[self.bits].sum())
+        return self._count
+    
+    @staticmethod
+    def _member(bits: np.ndarray, i: int) -> bool:
+        return 0 <= i < len(bits) * 8 and bool(bits[i >> 3] >> (i & 7) & 1)
+    
+    def __contains__(self, key: int) -> bool:
+        return self._member(self.bits, int(key))
+    
+    def allows_document(self, doc_id: int) -> bool:
+        return self._member(self.doc_bits, int(doc_id))
+    
+    def keys(self) -> np.ndarray:
+        """Selected FAISS IDs, ascending."""
+        return np.flatnonzero(np.unpackbits(self.bits, bitorder='little')).astype('int64')
+    
+    def selector(self):
+        """FAISS ID selector accepting the selected vectors."""
+        return faiss.IDSelectorBitmap(self.bits)
+    
+    def __and__(self, other: "IDFilter") -> "IDFilter":
+        return IDFilter(self.bits & other.bits, self.doc_bits & other.doc_bits)
+
+class AttributeIndex:
+    """Bitsets of the vectors and documents having each attribute value.
+    
+    Built once from the documents table and the vector store's ID mapping
+    (FAISS ID -> document ID), so a filter is a few bitwise ANDs of
+    precomputed bitmaps rather than a database query, and FAISS skips the
+    vectors outside it during the search instead of results being dropped
+    afterwards. Values of one attribute are OR-ed, attributes are AND-ed.
+    """
+    
+    def __init__(self):
+        self.bitsets = {attribute: {} for attribute in ATTRIBUTES}  # attribute -> value -> (bits, doc_bits)
+        self.num_bits = 0  # Bitmap length over FAISS IDs (largest ID + 1)
+        self.num_doc_bits = 0  # Bitmap length over document IDs
+        self._sorted_docs = np.zeros(0, dtype='int64')  # Document ID of every vector, ascending
+        self._sorted_keys = np.zeros(0, dtype='int64')  # The matching FAISS IDs
+    
+    def build(self, documents: Iterable[Tuple[int, str, str]], keys: np.ndarray, key_docs: np.ndarray):
+        """Build the bitsets from (doc_id, topic, source_link) rows and the aligned (FAISS ID, document ID) arrays."""
+        keys = np.asarray(keys, dtype='int64')
+        key_docs = np.asarray(key_docs, dtype='int64')
+        rows = [(int(doc_id), {'topic': normalize_value(topic), 'source': source_of(source_link)})
+                for doc_id, topic, source_link in documents]
+        self.num_bits = int(keys.max()) + 1 if len(keys) else 0
+        max_doc = max(max((doc_id for doc_id, _ in rows), default=-1), int(key_docs.max()) if len(key_docs) else -1)
+        self.num_doc_bits = max_doc + 1
+        
+        order = np.argsort(key_docs, kind='stable')
+        self._sorted_docs = key_docs[order]
+        self._sorted_keys = keys[order]
+        
+        for attribute in ATTRIBUTES:
+            values = {}  # value -> document IDs
+            for doc_id, attributes in rows:
+                if attributes[attribute]:
+                    values.setdefault(attributes[attribute], []).append(doc_id)
+            self.bitsets[attribute] = {
+                value: (_pack(self._keys_of(doc_ids), self.num_bits), _pack(doc_ids, self.num_doc_bits))
+                for value, doc_ids in values.items()
+            }
+    
+    def load(self, vector_store, session_factory=None) -> "AttributeIndex":
+        """Build the index from every stored document and the vector store's ID mapping."""
+        from sqlalchemy import select
+        from app.database import SessionLocal, Document
+        db = (session_factory or SessionLocal)()
+        try:
+            rows = db.execute(select(Document.id, Document.topic, Document.source_link)).all()
+        finally:
+            db.close()
+        keys, key_docs = vector_store.id_arrays()
+        self.build(rows, keys, key_docs)
+        return self
+    
+    def _keys_of(self, doc_ids: List[int]) -> np.ndarray:
+        """FAISS IDs of the given documents' vectors."""
+        doc_ids = np.unique(np.asarray(doc_ids, dtype='int64'))
+        starts = np.searchsorted(self._sorted_docs, doc_ids, side='left')
+        ends = np.searchsorted(self._sorted_docs, doc_ids, side='right')
+        lengths = ends - starts
+        # Positions start..end-1 of every document's run, concatenated
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self._sorted_keys[positions]
+    
+    def _union(self, attribute: str, values: List[str]) -> IDFilter:
+        """Vectors and documents having any of the values."""
+        bits = np.zeros((self.num_bits + 7) // 8, dtype='uint8')
+        doc_bits = np.zeros((self.num_doc_bits + 7) // 8, dtype='uint8')
+        for value in values:
+            value_bits = self.bitsets[attribute].get(normalize_value(value))
+            if value_bits is not None:
+                bits |= value_bits[0]
+                doc_bits |= value_bits[1]
+        return IDFilter(bits, doc_bits)
+    
+    def filter(self, topics: List[str] = None, sources: List[str] = None,
+               doc_ids: List[int] = None) -> Optional[IDFilter]:
+        """The vectors of documents matching every given condition, or None when no condition is given.
+        
+        A document matches a condition when it has any of the listed topics,
+        sources (link hosts) or IDs.
+        """
+        conditions = []
+        if topics:
+            conditions.append(self._union('topic', topics))
+        if sources:
+            conditions.append(self._union('source', sources))
+        if doc_ids:
+            in_range = [doc_id for doc_id in doc_ids if 0 <= doc_id < self.num_doc_bits]
+            conditions.append(IDFilter(_pack(self._keys_of(in_range), self.num_bits),
+                                       _pack(in_range, self.num_doc_bits)))
+        if not conditions:
+            return None
+        id_filter = conditions[0]
+        for condition in conditions[1:]:
+            id_filter = id_filter & condition
+        return id_filter
+    
+    def get_stats(self) -> Dict:
+        """Distinct values per attribute and bitmap size for /stats."""
+        stats = {f"{attribute}s": len(self.bitsets[attribute]) for attribute in ATTRIBUTES}
+        stats['bitmap_bytes'] = sum(len(bits) + len(doc_bits) for values in self.bitsets.values()
+                                    for bits, doc_bits in values.values())
+        return stats
@@ -0,0 +1,204 @@
+"""Local inverted-index BM25 engine for exact-term retrieval."""
+import heapq
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from itertools import chain
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+_TERM_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word terms of a text."""
+    return _TERM_RE.findall((text or "").lower())
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, keyed like FAISSVectorStore.
+    
+    Every entry is stored under the same ID as its vector (the chunk ID, or
+    the document ID for unchunked indexes) and belongs to a document. Deleted
+    entries stop matching immediately; their postings are dropped when the
+    index is compacted (on save).
+    """
+    
+    def __init__(self, index_path: str = "bm25_index.npz", k1: float = None, b: float = None):
+        self.index_path = index_path
+        self.k1 = k1 if k1 is not None else float(os.getenv("BM25_K1", "1.2"))
+        self.b = b if b is not None else float(os.getenv("BM25_B", "0.75"))
+        self.postings = {}  # term -> {key: term frequency}
+        self.doc_len = {}  # key -> number of terms (live entries only)
+        self.id_to_doc = {}  # key -> document ID
+        self.doc_to_ids = {}  # document ID -> keys
+        self.total_len = 0
+        self.tombstones = set()  # Deleted keys still referenced from postings
+    
+    def __len__(self) -> int:
+        return len(self.doc_len)
+    
+    def reset(self):
+        """Drop every entry."""
+        self.postings = {}
+        self.doc_len = {}
+        self.id_to_doc = {}
+        self.doc_to_ids = {}
+        self.total_len = 0
+        self.tombstones = set()
+    
+    def add(self, texts: List[str], doc_ids: List[int], keys: List[int] = None):
+        """Index texts under keys (defaults to the document IDs)."""
+        keys = list(keys) if keys is not None else list(doc_ids)
+        if self.tombstones.intersection(keys):
+            # A deleted copy of a reused key still has postings, drop them first
+            self.compact()
+        for key, doc_id, text in zip(keys, doc_ids, texts):
+            if key in self.doc_len:
+                raise ValueError(f"Key {key} is already indexed; use upsert to replace documents")
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[key] = tf
+            length = sum(terms.values())
+            self.doc_len[key] = length
+            self.total_len += length
+            self.id_to_doc[key] = doc_id
+            self.doc_to_ids.setdefault(doc_id, []).append(key)
+    
+    def upsert(self, texts: List[str], doc_ids: List[int], keys: List[int] = None):
+        """Replace all entries of the given documents."""
+        self.delete(set(doc_ids))
+        self.add(texts, doc_ids, keys)
+    
+    def delete(self, doc_ids: Iterable[int]) -> int:
+        """Stop matching the given documents; returns the number of entries removed."""
+        deleted = 0
+        for doc_id in doc_ids:
+            for key in self.doc_to_ids.pop(doc_id, []):
+                del self.id_to_doc[key]
+                self.total_len -= self.doc_len.pop(key)
+                self.tombstones.add(key)
+                deleted += 1
+        return deleted
+    
+    def compact(self):
+        """Drop postings of deleted entries."""
+        if not self.tombstones:
+            return
+        for term in list(self.postings):
+            entries = {key: tf for key, tf in self.postings[term].items() if key in self.doc_len}
+            if entries:
+                self.postings[term] = entries
+            else:
+                del self.postings[term]
+        self.tombstones = set()
+    
+    def search(self, query: str, top_k: int = 5, id_filter=None) -> List[Tuple[int, float]]:
+        """Return the top_k (key, score) pairs for a query, only among the keys in id_filter if given."""
+        if not self.doc_len:
+            return []
+        n = len(self.doc_len)
+        avg_len = self.total_len / n or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            live = [(key, tf) for key, tf in entries.items() if key in self.doc_len] if self.tombstones else entries.items()
+            df = len(live)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            if id_filter is not None:
+                # Term weights stay those of the whole index, only the candidates are restricted
+                live = [(key, tf) for key, tf in live if key in id_filter]
+            for key, tf in live:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[key] / avg_len)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+    
+    def search_documents(self, query: str, top_k: int = 5, overfetch: int = None,
+                         id_filter=None) -> List[Tuple[int, float, int]]:
+        """Search entries and collapse hits to (doc_id, score, best_key) by best entry."""
+        overfetch = overfetch or int(os.getenv("CHUNK_OVERFETCH", "4"))
+        best = {}
+        for key, score in self.search(query, top_k * overfetch, id_filter):
+            doc_id = self.id_to_doc[key]
+            if doc_id not in best:  # Hits arrive best first
+                best[doc_id] = (score, key)
+            if len(best) >= top_k:
+                break
+        return [(doc_id, score, key) for doc_id, (score, key) in best.items()]
+    
+    def search_documents_batch(self, queries: List[str], top_k: int = 5,
+                               id_filter=None) -> List[List[Tuple[int, float, int]]]:
+        """search_documents for several queries."""
+        return [self.search_documents(query, top_k, id_filter=id_filter) for query in queries]
+    
+    def save(self, path: str = None):
+        """Compact and save the index to disk as numpy arrays, replacing the old file atomically.
+        
+        Postings are stored term by term as aligned key and term frequency
+        arrays, with each term's start offset, and the terms as one
+        newline-separated UTF-8 string.
+        """
+        path = path or self.index_path
+        self.compact()
+        terms = list(self.postings)
+        keys = np.fromiter(sorted(self.doc_len), dtype='int64', count=len(self.doc_len))
+        num_postings = sum(len(entries) for entries in self.postings.values())
+        arrays = {
+            'keys': keys,
+            'doc_ids': np.fromiter((self.id_to_doc[key] for key in keys.tolist()), dtype='int64', count=len(keys)),
+            'lengths': np.fromiter((self.doc_len[key] for key in keys.tolist()), dtype='int64', count=len(keys)),
+            'terms': np.frombuffer("\n".join(terms).encode("utf-8"), dtype='uint8'),
+            'term_offsets': np.cumsum([0] + [len(self.postings[term]) for term in terms], dtype='int64'),
+            'posting_keys': np.fromiter(chain.from_iterable(self.postings[term] for term in terms),
+                                        dtype='int64', count=num_postings),
+            'posting_tfs': np.fromiter(chain.from_iterable(self.postings[term].values() for term in terms),
+                                       dtype='int64', count=num_postings)
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    
+    def load(self, path: str = None) -> bool:
+        """Load the index from disk (or from the pickle that older versions saved next to it)."""
+        path = path or self.index_path
+        legacy_path = os.path.splitext(path)[0] + ".pkl"
+        if os.path.exists(path):
+            with np.load(path) as data:
+                blob = data['terms'].tobytes().decode("utf-8")
+                terms = blob.split("\n") if blob else []
+                offsets = data['term_offsets'].tolist()
+                posting_keys = data['posting_keys'].tolist()
+                posting_tfs = data['posting_tfs'].tolist()
+                self.postings = {term: dict(zip(posting_keys[start:end], posting_tfs[start:end]))
+                                 for term, start, end in zip(terms, offsets, offsets[1:])}
+                keys = data['keys'].tolist()
+                self.doc_len = dict(zip(keys, data['lengths'].tolist()))
+                self.id_to_doc = dict(zip(keys, data['doc_ids'].tolist()))
+        elif os.path.exists(legacy_path) and legacy_path != path:
+            with open(legacy_path, 'rb') as f:
+                data = pickle.load(f)
+            self.postings = data['postings']
+            self.doc_len = data['doc_len']
+            self.id_to_doc = data['id_to_doc']
+        else:
+            return False
+        self.total_len = sum(self.doc_len.values())
+        self.tombstones = set()
+        self.doc_to_ids = {}
+        for key, doc_id in sorted(self.id_to_doc.items()):
+            self.doc_to_ids.setdefault(doc_id, []).append(key)
+        return True
+    
+    def get_stats(self) -> dict:
+        """Index size for /stats."""
+        return {
+            'entries': len(self.doc_len),
+            'documents': len(self.doc_to_ids),
+            'terms': len(self.postings)
+        }
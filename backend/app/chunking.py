@@ -0,0 +1,60 @@
+"""Split document text into overlapping token-bounded chunks."""
+import os
+import re
+from typing import List, Dict, Callable
+
+# Word pieces, numbers and punctuation each count as a token, which tracks
+# WordPiece/BPE lengths much better than whitespace splitting.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """Approximate model token count of a piece of text."""
+    return len(_TOKEN_RE.findall(text))
+
+class TextChunker:
+    """Token-aware sliding window over the words of a text.
+    
+    Each chunk holds at most max_tokens tokens (as measured by count_tokens or a
+    model tokenizer) and the next chunk starts overlap_tokens before the end
+    of the previous one. Chunks are cut on word boundaries and keep their
+    character offsets into the source text.
+    """
+    
+    def __init__(self, max_tokens: int = None, overlap_tokens: int = None,
+                 token_counter: Callable[[str], int] = None):
+        self.max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+        if self.overlap_tokens >= self.max_tokens:
+            raise ValueError("CHUNK_OVERLAP_TOKENS must be smaller than CHUNK_MAX_TOKENS")
+        self.token_counter = token_counter or count_tokens
+    
+    def chunk(self, text: str) -> List[Dict]:
+        """Split text into chunks with 'text', 'start_char' and 'end_char'."""
+        words = [(match.start(), match.end(), self.token_counter(match.group()))
+                 for match in re.finditer(r"\S+", text or "")]
+        chunks = []
+        start = 0
+        while start < len(words):
+            # Grow the window until the token budget is used up (always take one word)
+            end = start
+            tokens = 0
+            while end < len(words) and (end == start or tokens + words[end][2] <= self.max_tokens):
+                tokens += words[end][2]
+                end += 1
+            
+            chunks.append({
+                "text": text[words[start][0]:words[end - 1][1]],
+                "start_char": words[start][0],
+                "end_char": words[end - 1][1]
+            })
+            if end >= len(words):
+                break
+            
+            # Step back over overlap_tokens worth of words, but always move forward
+            next_start = end
+            overlap = 0
+            while next_start - 1 > start and overlap + words[next_start - 1][2] <= self.overlap_tokens:
+                next_start -= 1
+                overlap += words[next_start][2]
+            start = next_start
+        return chunks
@@ -0,0 +1,99 @@
+"""Lazily constructed API components with readiness reporting."""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+class Components:
+    """Registry that builds each heavy component on first use.
+    
+    Importing the API is then cheap: the embedding model, LangChain and the
+    indexes load when a request first needs them, in a background warm-up
+    task, or in a parent process before it forks workers (preload). Each
+    component is built at most once, whichever of these gets there first.
+    """
+    
+    def __init__(self):
+        self._factories = {}  # name -> (factory, required for readiness)
+        self._warm_up = []  # Names built by preload() and warm_up(), in order
+        self._instances = {}
+        self._load_seconds = {}
+        self._errors = {}
+        self._locks = {}
+    
+    def register(self, name: str, factory: Callable[[], object], required: bool = False, warm_up: bool = True):
+        """Register a factory; required components must be loaded before /ready reports ready.
+        
+        Components registered with warm_up=False are only built on first use.
+        """
+        self._factories[name] = (factory, required)
+        if warm_up:
+            self._warm_up.append(name)
+        self._locks[name] = threading.Lock()
+    
+    def get(self, name: str):
+        """Return a component, building it on this thread if needed."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name][0]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                print(f"✅ Loaded {name} in {self._load_seconds[name]:.2f}s")
+            return self._instances[name]
+    
+    async def aget(self, name: str):
+        """Return a component, building it on a worker thread so the event loop keeps serving."""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, name)
+    
+    def peek(self, name: str) -> Optional[object]:
+        """Return a component only if it is already loaded."""
+        return self._instances.get(name)
+    
+    def preload(self):
+        """Build the warm-up components now (e.g. in the parent before forking workers)."""
+        for name in self._warm_up:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"⚠️  Could not load {name}: {e}")
+    
+    async def warm_up(self):
+        """Build the warm-up components in the background, one at a time."""
+        for name in self._warm_up:
+            try:
+                await self.aget(name)
+            except Exception as e:
+                print(f"⚠️  Could not load {name}: {e}")
+    
+    def ready(self) -> bool:
+        """Whether every required component is loaded."""
+        return all(name in self._instances for name, (_, required) in self._factories.items() if required)
+    
+    def status(self) -> Dict[str, dict]:
+        """Per-component load state for the readiness endpoint."""
+        return {
+            name: {
+                'loaded': name in self._instances,
+                'required': required,
+                'warm_up': name in self._warm_up,
+                'load_seconds': self._load_seconds.get(name),
+                'error': self._errors.get(name)
+            }
+            for name, (_, required) in self._factories.items()
+        }
+
+def env_flag(name: str, default: str) -> bool:
+    """Read a true/false environment variable."""
+    return os.getenv(name, default).lower() == "true"
@@ -0,0 +1,120 @@
+"""Pack the most question-relevant sentences of retrieved documents into a token budget."""
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+from app.bm25 import tokenize
+from app.chunking import count_tokens
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences (and lines) of a text."""
+    return [sentence.strip() for sentence in _SENTENCE_RE.split(text or "") if sentence.strip()]
+
+def llm_token_counter(model_name: str = None) -> Callable[[str], int]:
+    """Token counter of the LLM's tokenizer, or the approximate count_tokens without tiktoken."""
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model_name or os.getenv("LLM_MODEL", "gpt-3.5-turbo"))
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or the encoding could not be fetched
+        return count_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+class ContextPacker:
+    """Choose the sentences of retrieved documents that go into the prompt.
+    
+    Every document is split into sentences (of its content, or of its
+    matching chunk when content was not fetched). Sentences are scored by
+    BM25 of the question's terms among all candidate sentences, plus a bonus
+    for being in the document's matching chunk and for better-ranked
+    documents; sentences with no matching term are only candidates if they
+    are in the matching chunk or lead their document. The best are taken
+    until token_budget is spent, skipping near-duplicates (token-set Jaccard
+    of at least dedup_threshold) of sentences already taken, so overlapping
+    chunks and documents repeating each other are only paid for once. Taken
+    sentences are emitted per document, in their original order.
+    """
+    
+    LEAD_SENTENCES = 2  # Opening sentences of a document that are candidates even without matching terms
+    MIN_SENTENCE_TOKENS = 8  # Stop looking once less than this is left of the budget
+    
+    def __init__(self, token_budget: int = None, dedup_threshold: float = None,
+                 token_counter: Callable[[str], int] = None, k1: float = 1.2, b: float = 0.75):
+        self.token_budget = token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+        self.dedup_threshold = dedup_threshold if dedup_threshold is not None else float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+        self.token_counter = token_counter or count_tokens
+        self.k1 = k1
+        self.b = b
+    
+    def _candidates(self, question: str, context_docs: List[Dict]) -> List[Dict]:
+        """Scored candidate sentences of all documents."""
+        candidates = []
+        for rank, doc in enumerate(context_docs):
+            chunk = doc.get('chunk') or ""
+            for position, sentence in enumerate(split_sentences(doc.get('content') or chunk)):
+                terms = tokenize(sentence)
+                if terms:
+                    candidates.append({'rank': rank, 'position': position, 'text': sentence,
+                                       'terms': Counter(terms), 'term_set': set(terms),
+                                       'in_chunk': bool(chunk) and sentence in chunk})
+        if not candidates:
+            return []
+        
+        avg_len = sum(sum(c['terms'].values()) for c in candidates) / len(candidates)
+        scored = []
+        for term in set(tokenize(question)):
+            df = sum(1 for c in candidates if term in c['terms'])
+            if df:
+                scored.append((term, math.log(1 + (len(candidates) - df + 0.5) / (df + 0.5))))
+        for c in candidates:
+            length = sum(c['terms'].values())
+            norm = self.k1 * (1 - self.b + self.b * length / avg_len)
+            c['relevance'] = sum(idf * c['terms'][term] * (self.k1 + 1) / (c['terms'][term] + norm)
+                                 for term, idf in scored if term in c['terms'])
+            c['score'] = c['relevance'] + (1.0 if c['in_chunk'] else 0.0) + 1.0 / (c['rank'] + 2)
+        return [c for c in candidates if c['relevance'] > 0 or c['in_chunk'] or c['position'] < self.LEAD_SENTENCES]
+    
+    def pack(self, question: str, context_docs: List[Dict]) -> Tuple[str, Dict]:
+        """Context text for the prompt and stats about it ('context_tokens', 'sentences', 'candidates', 'documents')."""
+        candidates = self._candidates(question, context_docs)
+        candidates.sort(key=lambda c: (-c['score'], c['rank'], c['position']))
+        
+        chosen = []
+        documents = set()  # Ranks of the documents with a sentence, whose header is paid for
+        used = 0
+        for c in candidates:
+            if self.token_budget - used < self.MIN_SENTENCE_TOKENS:
+                break
+            terms = c['term_set']
+            if any(len(terms & o['term_set']) / len(terms | o['term_set']) >= self.dedup_threshold for o in chosen):
+                continue
+            tokens = self.token_counter(c['text'])
+            if c['rank'] not in documents:
+                tokens += self.token_counter(self._header(c['rank'], context_docs))
+            if used + tokens > self.token_budget:
+                continue
+            documents.add(c['rank'])
+            used += tokens
+            chosen.append(c)
+        
+        sections = []
+        for rank in sorted(documents):
+            sentences = sorted((c for c in chosen if c['rank'] == rank), key=lambda c: c['position'])
+            sections.append(self._header(rank, context_docs) + " ".join(c['text'] for c in sentences))
+        return "\n\n".join(sections), {
+            'context_tokens': used,
+            'sentences': len(chosen),
+            'candidates': len(candidates),
+            'documents': len(documents)
+        }
+    
+    @staticmethod
+    def _header(rank: int, context_docs: List[Dict]) -> str:
+        return f"Document {rank + 1}: {context_docs[rank].get('title', 'Unknown')}\n"
@@ -1,7 +1,10 @@
 """Database models and connection for metadata storage."""
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, JSON
+from sqlalchemy import (create_engine, inspect, text, Column, Integer, String, Text, Float, JSON, LargeBinary,
+                        ForeignKey, func, select)
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from typing import List, Dict
 import os
 from dotenv import load_dotenv
 
@@ -19,6 +22,19 @@ class Document(Base):
     source_link = Column(String)
     related_entities = Column(JSON)
     embedding_id = Column(Integer, index=True)
+    topic = Column(String, index=True)  # Ingest topic the document was found under
+
+class DocumentChunk(Base):
+    """A token-bounded window of a document's content with its own vector."""
+    __tablename__ = "document_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    chunk_index = Column(Integer)
+    text = Column(Text)
+    start_char = Column(Integer)
+    end_char = Column(Integer)
+    embedding_id = Column(Integer, index=True)
 
 class QueryLog(Base):
     """Query logging for analytics."""
@@ -28,15 +44,61 @@ class QueryLog(Base):
     query = Column(String)
     timestamp = Column(Float)
     result_count = Column(Integer)
+    endpoint = Column(String)
+    # Milliseconds spent per request stage (None when the stage did not run)
+    latency_ms = Column(Float)
+    embed_ms = Column(Float)
+    search_ms = Column(Float)
+    graph_ms = Column(Float)
+    fetch_ms = Column(Float)
+    rerank_ms = Column(Float)
+    generate_ms = Column(Float)
+
+class AnswerCacheEntry(Base):
+    """Persisted semantic answer cache entry."""
+    __tablename__ = "answer_cache"
+    
+    key = Column(String, primary_key=True)
+    question = Column(Text)
+    embedding = Column(LargeBinary)  # Normalized float32 question embedding
+    doc_ids = Column(JSON)  # Sorted IDs of the documents the answer was generated from
+    fingerprint = Column(String)  # Hash of those documents' contents
+    answer = Column(Text)
+    created = Column(Float)
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./knowledge_base.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+# Async engine used by the API request path (ingestion keeps the sync engine)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def _add_missing_columns():
+    """Add columns introduced after a table was created (create_all only creates missing tables)."""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
 
 def get_db():
     """Get database session."""
@@ -46,3 +108,65 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """Get async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+SNIPPET_LENGTH = 200
+
+def make_snippet(content: str) -> str:
+    """Create a snippet from the start of the document content."""
+    content = content or ""
+    return content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content
+
+def _documents_by_ids_query(doc_ids: List[int], include_content: bool):
+    """SELECT for the given documents, loading only the columns the response needs."""
+    columns = [Document.id, Document.title, Document.source_link]
+    if include_content:
+        columns.append(Document.content)
+    else:
+        columns.append(func.substr(Document.content, 1, SNIPPET_LENGTH + 1).label("content_head"))
+    return select(*columns).where(Document.id.in_(set(doc_ids)))
+
+def _order_documents(rows, doc_ids: List[int], include_content: bool) -> List[Dict]:
+    """Convert rows to dicts in the order of doc_ids."""
+    by_id = {}
+    for row in rows:
+        content = row.content if include_content else None
+        by_id[row.id] = {
+            "id": row.id,
+            "title": row.title,
+            "content": content,
+            "source_link": row.source_link,
+            "snippet": make_snippet(content if include_content else row.content_head)
+        }
+    return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+def get_documents_by_ids(db: Session, doc_ids: List[int], include_content: bool = True) -> List[Dict]:
+    """Fetch documents in a single IN (...) query, preserving the order of doc_ids.
+    
+    When include_content is False the full body is never loaded: the snippet is
+    cut from the first SNIPPET_LENGTH + 1 characters by the database.
+    """
+    doc_ids = [int(doc_id) for doc_id in doc_ids]
+    if not doc_ids:
+        return []
+    rows = db.execute(_documents_by_ids_query(doc_ids, include_content)).all()
+    return _order_documents(rows, doc_ids, include_content)
+
+async def get_documents_by_ids_async(db: AsyncSession, doc_ids: List[int], include_content: bool = True) -> List[Dict]:
+    """Async variant of get_documents_by_ids."""
+    doc_ids = [int(doc_id) for doc_id in doc_ids]
+    if not doc_ids:
+        return []
+    result = await db.execute(_documents_by_ids_query(doc_ids, include_content))
+    return _order_documents(result.all(), doc_ids, include_content)
+
+async def get_chunk_texts_async(db: AsyncSession, chunk_ids: List[int]) -> Dict[int, str]:
+    """Fetch the text of the given chunks in a single IN (...) query."""
+    chunk_ids = set(int(chunk_id) for chunk_id in chunk_ids if chunk_id is not None)
+    if not chunk_ids:
+        return {}
+    result = await db.execute(select(DocumentChunk.id, DocumentChunk.text).where(DocumentChunk.id.in_(chunk_ids)))
+    return {row.id: row.text for row in result.all()}
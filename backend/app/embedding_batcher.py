@@ -0,0 +1,130 @@
+"""Dynamic micro-batching of concurrent query embeddings."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from app.embeddings import EmbeddingGenerator
+from app.metrics import Histogram
+
+BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+class EmbeddingBatcher:
+    """Collect concurrent embed requests and encode them in one batched call.
+
+    Callers await embed(text). A background task takes the first queued text,
+    then keeps collecting until max_batch_size texts are queued or max_wait_ms
+    has passed, and encodes the batch on a worker thread so the event loop is
+    never blocked by the model.
+    """
+
+    def __init__(self, generator: EmbeddingGenerator, max_batch_size: int = None, max_wait_ms: float = None):
+        self.generator = generator
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))) / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batcher")
+        self._queue = None
+        self._task = None
+
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+        self.queue_depths = Histogram(BATCH_BUCKETS)
+
+    def start(self):
+        """Start the batching task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Cancel the batching task and fail any requests still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a single text, sharing a model call with concurrent requests."""
+        # Memory tier only; the disk tier is searched on the worker thread
+        cached = self.generator.cache.get(self.generator.model_name, text, disk=False)
+        if cached is not None:
+            return cached
+
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue_depths.observe(self._queue.qsize() + 1)
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed a list of texts (e.g. a batch request) in one model call on the worker thread."""
+        embeddings = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.generator.generate_query_embeddings, texts
+        )
+        return np.vstack(embeddings) if embeddings else np.zeros((0, 0), dtype='float32')
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for one request, then gather more until the batch is full or the wait expires."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """Batching loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Skip callers that gave up (e.g. client disconnected) before encoding
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            self.batch_sizes.observe(len(batch))
+
+            texts = [text for text, _ in batch]
+            try:
+                # embed() already checked the memory tier, but not the disk tier
+                embeddings = await loop.run_in_executor(
+                    self._executor, self.generator.generate_query_embeddings, texts,
+                    bool(self.generator.cache.disk_path)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    def get_stats(self) -> dict:
+        """Batch-size and queue-depth histograms for /stats."""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'batch_sizes': self.batch_sizes.snapshot(),
+            'queue_depths': self.queue_depths.snapshot()
+        }
@@ -0,0 +1,174 @@
+"""Bounded LRU cache for query embeddings with TTL and an optional disk tier."""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different queries share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+class EmbeddingCache:
+    """Thread-safe in-memory LRU cache with TTL, backed by an optional SQLite file.
+
+    Entries are keyed on (model name, normalized text). The memory tier is
+    bounded by max_size and evicts least recently used entries; the disk tier
+    is bounded by disk_max_size (<= 0 disables the limit) and drops its oldest
+    entries. Both tiers expire entries older than ttl seconds (ttl <= 0
+    disables expiry); expired rows are deleted from disk when they are read
+    and whenever the disk tier is pruned.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None, disk_path: str = None,
+                 disk_max_size: int = None):
+        self.max_size = max_size if max_size is not None else int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+        self.disk_path = disk_path if disk_path is not None else os.getenv("EMBEDDING_CACHE_PATH", "")
+        self.disk_max_size = (disk_max_size if disk_max_size is not None
+                              else int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000")))
+        self._entries = OrderedDict()  # key -> (timestamp, vector)
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_lock = threading.Lock()  # Separate, so memory hits never wait on SQLite
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._disk_rows = 0  # Upper bound on the rows on disk (replaced rows are counted again)
+
+        if self.disk_path:
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created REAL, dtype TEXT, vector BLOB)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+            self._disk.commit()
+            with self._disk_lock:
+                self._prune_disk()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Cache key for a model and (unnormalized) text."""
+        payload = f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def get(self, model_name: str, text: str, disk: bool = True) -> Optional[np.ndarray]:
+        """Return a copy of the cached embedding, or None on a miss.
+
+        With disk=False only the memory tier is searched (no I/O, so it is
+        safe on the event loop); a miss is then not counted when the disk
+        tier may still have the entry, as the caller looks again later.
+        """
+        key = self.make_key(model_name, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, vector = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector.copy()
+                del self._entries[key]
+            if self._disk is None:
+                self.misses += 1
+                return None
+        if not disk:
+            return None
+
+        with self._disk_lock:
+            row = self._disk.execute(
+                "SELECT created, dtype, vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._expired(row[0]):
+                self._disk.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._disk.commit()
+        with self._lock:
+            if row is not None and not self._expired(row[0]):
+                vector = np.frombuffer(row[2], dtype=row[1])
+                self._store(key, row[0], vector)
+                self.disk_hits += 1
+                return vector.copy()
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, text: str, vector: np.ndarray):
+        """Store an embedding in the memory tier and, if enabled, on disk."""
+        key = self.make_key(model_name, text)
+        vector = np.array(vector, copy=True)
+        created = time.time()
+        with self._lock:
+            self._store(key, created, vector)
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, created, dtype, vector) VALUES (?, ?, ?, ?)",
+                    (key, created, vector.dtype.str, vector.tobytes())
+                )
+                self._disk.commit()
+                self._disk_rows += 1
+                if self.disk_max_size > 0 and self._disk_rows > self.disk_max_size:
+                    self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete expired rows, then the oldest beyond 90% of disk_max_size; caller must hold the disk lock.
+
+        Pruning below the limit means it runs once per tenth of disk_max_size
+        inserts rather than on every one.
+        """
+        if self.ttl > 0:
+            self._disk.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,))
+        if self.disk_max_size > 0:
+            keep = int(self.disk_max_size * 0.9)
+            self.disk_evictions += self._disk.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)", (keep,)
+            ).rowcount
+        self._disk.commit()
+        self._disk_rows = self._disk.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _store(self, key: str, created: float, vector: np.ndarray):
+        """Insert into the memory tier; caller must hold the lock."""
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
+                self._disk_rows = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters for /stats."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_size': self._disk_rows,
+                'disk_max_size': self.disk_max_size,
+                'disk_evictions': self.disk_evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,234 @@
+"""Persistent, content-addressed store of document embeddings."""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Storage precisions: float16 halves float32, int8 (with one float32 scale per vector) quarters it
+STORE_DTYPES = ("float16", "int8")
+
+def content_key(model_name: str, text: str) -> bytes:
+    """128-bit key of a text as embedded by a model."""
+    return hashlib.blake2b(f"{model_name}\x00{text}".encode("utf-8"), digest_size=16).digest()
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Stored form of float32 vectors: (values, per-vector scales or None)."""
+    vectors = np.asarray(vectors, dtype='float32')
+    if dtype == "float16":
+        return vectors.astype('float16'), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype('int8'), scales.astype('float32')
+
+def dequantize(values: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    """float32 vectors from their stored form."""
+    vectors = np.asarray(values, dtype='float32')
+    return vectors * scales[:, None] if scales is not None else vectors
+
+class EmbeddingStore:
+    """Embeddings keyed by a hash of (model name, text), kept in columnar segment files.
+    
+    Each segment is a set of .npy columns sorted by key: the 16-byte keys,
+    the vectors in float16 or int8, and for int8 a float32 scale per vector.
+    Segments are memory-mapped, so lookups (a binary search per segment) do
+    not load the vectors into memory. New embeddings are buffered and written
+    as a new segment on flush(); once there are more than max_segments they
+    are merged into one. A manifest written last lists the complete
+    segments, so an interrupted flush leaves the store as it was.
+    
+    embed() returns the stored vectors of texts seen before and only sends
+    the rest to the embedding model, so re-ingesting unchanged text or
+    rebuilding an index makes no model calls.
+    """
+    
+    def __init__(self, path: str = None, dtype: str = None, max_segments: int = None):
+        self.path = path or os.getenv("EMBEDDING_STORE_PATH", "embedding_store")
+        self.dtype = (dtype or os.getenv("EMBEDDING_STORE_DTYPE", "float16")).lower()
+        if self.dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown embedding store dtype '{self.dtype}', expected one of {STORE_DTYPES}")
+        self.max_segments = max_segments or int(os.getenv("EMBEDDING_STORE_MAX_SEGMENTS", "32"))
+        self._segments = []  # Dicts of the memory-mapped columns of each segment, oldest first
+        self._pending = {}  # key -> float32 vector not yet written
+        self._next_segment = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.load()
+    
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+    
+    def _column_path(self, name: str, column: str) -> str:
+        return os.path.join(self.path, f"{name}.{column}.npy")
+    
+    def load(self):
+        """Map the segments listed in the manifest."""
+        self._segments = []
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path()) as f:
+            manifest = json.load(f)
+        for name in manifest['segments']:
+            segment = {'name': name}
+            for column in ('keys', 'vectors', 'scales'):
+                column_path = self._column_path(name, column)
+                if os.path.exists(column_path):
+                    segment[column] = np.load(column_path, mmap_mode='r')
+            self._segments.append(segment)
+        self._next_segment = manifest['next_segment']
+    
+    def __len__(self) -> int:
+        return sum(len(segment['keys']) for segment in self._segments) + len(self._pending)
+    
+    def _lookup(self, keys: List[bytes]) -> List[np.ndarray]:
+        """Stored float32 vector of each key, or None; caller must hold the lock."""
+        found = [self._pending.get(key) for key in keys]
+        wanted = np.array(keys, dtype='S16')
+        for segment in reversed(self._segments):
+            missing = [i for i, vector in enumerate(found) if vector is None]
+            if not missing:
+                break
+            positions = np.searchsorted(segment['keys'], wanted[missing])
+            positions = np.minimum(positions, len(segment['keys']) - 1)
+            matches = segment['keys'][positions] == wanted[missing]
+            rows = positions[matches]
+            if not len(rows):
+                continue
+            vectors = dequantize(segment['vectors'][rows], segment['scales'][rows] if 'scales' in segment else None)
+            for i, vector in zip(np.asarray(missing)[matches].tolist(), vectors):
+                found[i] = vector
+        return found
+    
+    def get_many(self, model_name: str, texts: List[str]) -> List[np.ndarray]:
+        """Stored embedding of each text (None for texts not stored)."""
+        with self._lock:
+            return self._lookup([content_key(model_name, text) for text in texts])
+    
+    def put_many(self, model_name: str, texts: List[str], vectors: np.ndarray):
+        """Buffer embeddings until the next flush()."""
+        vectors = np.asarray(vectors, dtype='float32')
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._pending[content_key(model_name, text)] = vector
+    
+    def embed(self, embedding_gen, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embeddings of texts with embedding_gen, computing (and storing) only the ones not stored yet."""
+        model_name = embedding_gen.model_name
+        vectors = self.get_many(model_name, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+        if missing:
+            embedded = np.asarray(embedding_gen.generate_embeddings_batch(
+                missing, batch_size=batch_size, show_progress_bar=False
+            ), dtype='float32')
+            self.put_many(model_name, missing, embedded)
+            by_text = dict(zip(missing, embedded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, 0), dtype='float32')
+        return np.stack(vectors)
+    
+    def _stored(self, segment: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """A segment's (values, scales) in the configured dtype, converting it if it was written in another."""
+        scales = segment.get('scales')
+        if segment['vectors'].dtype == np.dtype(self.dtype):
+            return segment['vectors'], scales
+        return quantize(dequantize(segment['vectors'], scales), self.dtype)
+    
+    def _write_segment(self, keys: np.ndarray, vectors: np.ndarray = None, stored: Tuple = None) -> Dict:
+        """Write sorted keys and their float32 vectors (or already stored values and scales) as a new segment.
+        
+        Returns the segment, which is not live until it is in the manifest.
+        """
+        name = f"segment_{self._next_segment:06d}"
+        self._next_segment += 1
+        values, scales = stored if stored is not None else quantize(vectors, self.dtype)
+        columns = {'keys': keys, 'vectors': values}
+        if scales is not None:
+            columns['scales'] = scales
+        segment = {'name': name}
+        for column, array in columns.items():
+            column_path = self._column_path(name, column)
+            with open(column_path + ".tmp", 'wb') as f:
+                np.save(f, array)
+            os.replace(column_path + ".tmp", column_path)
+            segment[column] = np.load(column_path, mmap_mode='r')
+        return segment
+    
+    def _write_manifest(self, segments: List[Dict]):
+        """Atomically replace the list of live segments, then delete files of segments no longer listed."""
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'segments': [segment['name'] for segment in segments],
+                       'next_segment': self._next_segment}, f)
+        os.replace(tmp_path, self._manifest_path())
+        live = {segment['name'] for segment in segments}
+        for old in self._segments:
+            if old['name'] not in live:
+                for column in ('keys', 'vectors', 'scales'):
+                    if os.path.exists(self._column_path(old['name'], column)):
+                        os.remove(self._column_path(old['name'], column))
+        self._segments = segments
+    
+    def flush(self) -> int:
+        """Write buffered embeddings as a new segment (merging segments past max_segments); returns rows written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            os.makedirs(self.path, exist_ok=True)
+            # Vectors of different models can have different dimensions, one segment per dimension
+            by_dimension = {}
+            for key, vector in self._pending.items():
+                by_dimension.setdefault(len(vector), []).append((key, vector))
+            segments = list(self._segments)
+            for rows in by_dimension.values():
+                keys = np.array([key for key, _ in rows], dtype='S16')
+                order = np.argsort(keys)
+                segments.append(self._write_segment(keys[order], np.stack([vector for _, vector in rows])[order]))
+            written = len(self._pending)
+            self._pending = {}
+            self._write_manifest(segments)
+            if len(self._segments) > self.max_segments:
+                self._compact()
+            return written
+    
+    def _compact(self):
+        """Merge same-dimension segments into one, keeping the newest vector of each key; caller must hold the lock."""
+        by_dimension = {}
+        for segment in self._segments:
+            by_dimension.setdefault(segment['vectors'].shape[1], []).append(segment)
+        merged = []
+        for segments in by_dimension.values():
+            if len(segments) == 1:
+                merged.append(segments[0])
+                continue
+            stored = [self._stored(segment) for segment in segments]
+            # Reversed so np.unique's first occurrence of a key is its newest copy
+            keys = np.concatenate([segment['keys'] for segment in segments])[::-1]
+            values = np.concatenate([values for values, _ in stored])[::-1]
+            scales = np.concatenate([scales for _, scales in stored])[::-1] if self.dtype == "int8" else None
+            keys, first = np.unique(keys, return_index=True)
+            merged.append(self._write_segment(keys, stored=(values[first], scales[first] if scales is not None else None)))
+        self._write_manifest(merged)
+    
+    def compact(self):
+        """Merge all segments (per vector dimension) into one."""
+        with self._lock:
+            self._compact()
+    
+    def get_stats(self) -> dict:
+        """Size and reuse counters."""
+        return {
+            'vectors': len(self),
+            'segments': len(self._segments),
+            'dtype': self.dtype,
+            'bytes': sum(segment[column].nbytes for segment in self._segments for column in ('keys', 'vectors', 'scales')
+                         if column in segment),
+            'hits': self.hits,
+            'misses': self.misses
+        }
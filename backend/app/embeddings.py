@@ -4,16 +4,37 @@ from typing import List
 from dotenv import load_dotenv
 import numpy as np
 
+from app.embedding_cache import EmbeddingCache
+
 load_dotenv()
 
+# Local inference backends for the SentenceTransformers model
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
 class EmbeddingGenerator:
-    """Generate vector embeddings for text."""
+    """Generate vector embeddings for text.
     
-    def __init__(self, model_name: str = None):
+    Without an OpenAI key the SentenceTransformers model runs locally on the
+    configured backend: PyTorch, or ONNX Runtime with the model exported
+    once (and for onnx-int8 dynamically quantized to int8) into
+    EMBEDDING_ONNX_DIR. All backends produce interchangeable vectors within
+    the tolerance checked by benchmarks.embedding_backends.
+    """
+    
+    def __init__(self, model_name: str = None, cache: EmbeddingCache = None, backend: str = None,
+                 threads: int = None):
         self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "sentence-transformers")
         self.model = None
         self.use_openai = False
         self.client = None
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.backend = (backend or os.getenv("EMBEDDING_BACKEND", "torch")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{self.backend}', expected one of {BACKENDS}")
+        # Intra-op threads of the local model (0 = the runtime's default, one per core)
+        self.threads = threads if threads is not None else int(os.getenv("EMBEDDING_THREADS", "0"))
+        # Quantization config of the target CPU for onnx-int8: arm64, avx2, avx512 or avx512_vnni
+        self.quantization = os.getenv("EMBEDDING_QUANTIZATION", "avx2")
         
         # Try OpenAI first if API key is available
         if os.getenv("OPENAI_API_KEY"):
@@ -31,24 +52,67 @@ class EmbeddingGenerator:
             self._init_sentence_transformers()
     
     def _init_sentence_transformers(self):
-        """Initialize SentenceTransformers model."""
+        """Initialize SentenceTransformers model on the configured backend."""
         from sentence_transformers import SentenceTransformer
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("Using SentenceTransformers: all-MiniLM-L6-v2")
+        if self.backend == "torch":
+            if self.threads:
+                import torch
+                torch.set_num_threads(self.threads)
+            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        else:
+            self.model = self._load_onnx('all-MiniLM-L6-v2')
+        # Cached and stored vectors are keyed by model_name, so each backend gets its own
+        # (torch keeps the bare model name of vectors stored before backends existed)
+        self.model_name = 'all-MiniLM-L6-v2'
+        if self.backend == "onnx":
+            self.model_name += ":onnx"
+        elif self.backend == "onnx-int8":
+            self.model_name += f":onnx-int8:{self.quantization}"
+        print(f"Using SentenceTransformers: all-MiniLM-L6-v2 ({self.backend})")
+    
+    def _load_onnx(self, model_id: str):
+        """SentenceTransformer on ONNX Runtime, exporting (and quantizing) the model on first use."""
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        
+        model_dir = os.path.join(os.getenv("EMBEDDING_ONNX_DIR", "onnx_models"), model_id)
+        file_name = "onnx/model.onnx"
+        if self.backend == "onnx-int8":
+            file_name = f"onnx/model_qint8_{self.quantization}.onnx"
+        
+        if not os.path.exists(os.path.join(model_dir, file_name)):
+            print(f"Exporting {model_id} to ONNX in {model_dir}...")
+            model = SentenceTransformer(model_id, backend="onnx")
+            model.save(model_dir)
+            if self.backend == "onnx-int8":
+                export_dynamic_quantized_onnx_model(model, self.quantization, model_dir)
+        
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        return SentenceTransformer(model_dir, backend="onnx",
+                                   model_kwargs={"file_name": file_name, "session_options": session_options})
     
     def generate_embedding(self, text: str) -> np.ndarray:
-        """Generate embedding for a single text."""
+        """Generate embedding for a single text (served from the cache when possible)."""
+        cached = self.cache.get(self.model_name, text)
+        if cached is not None:
+            return cached
+        
         if self.use_openai:
             response = self.client.embeddings.create(
                 model=self.model_name,
                 input=text
             )
-            return np.array(response.data[0].embedding)
+            embedding = np.array(response.data[0].embedding)
         else:
             embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding
+        
+        self.cache.put(self.model_name, text, embedding)
+        return embedding
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32,
+                                  show_progress_bar: bool = True) -> np.ndarray:
         """Generate embeddings for multiple texts in batches."""
         embeddings = []
         
@@ -64,7 +128,25 @@ class EmbeddingGenerator:
                 embeddings.extend(batch_embeddings)
         else:
             # SentenceTransformers batch processing
-            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=True)
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=show_progress_bar)
         
         return np.array(embeddings)
-
+    
+    def generate_query_embeddings(self, texts: List[str], check_cache: bool = True) -> List[np.ndarray]:
+        """Embed several query texts in one model call, using and filling the cache."""
+        if check_cache:
+            embeddings = [self.cache.get(self.model_name, text) for text in texts]
+        else:
+            embeddings = [None] * len(texts)
+        
+        # Encode each distinct missing text once
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            batch = self.generate_embeddings_batch(missing, batch_size=len(missing), show_progress_bar=False)
+            encoded = dict(zip(missing, batch))
+            for text, embedding in encoded.items():
+                self.cache.put(self.model_name, text, embedding)
+            embeddings = [encoded[text] if embedding is None else embedding
+                          for text, embedding in zip(texts, embeddings)]
+        
+        return embeddings
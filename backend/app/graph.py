@@ -0,0 +1,246 @@
+"""Knowledge graph over documents and their related entities, stored as CSR arrays."""
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+def _node_key(title: str) -> str:
+    """Case-insensitive node identity for a page title."""
+    return " ".join(title.split()).lower()
+
+class KnowledgeGraph:
+    """Undirected graph linking each document to the entities it mentions.
+    
+    Nodes are page titles: ingested documents plus linked entities that were
+    not ingested (so two documents mentioning the same entity are two hops
+    apart). Adjacency is kept as CSR arrays (indptr, indices), so expansion
+    and personalized PageRank are plain numpy operations on a small subgraph:
+    at most max_nodes nodes, following at most max_degree edges per node so
+    hub entities cannot blow up a query.
+    """
+    
+    def __init__(self, path: str = "knowledge_graph.npz", max_nodes: int = None, max_degree: int = None,
+                 ppr_hops: int = None, alpha: float = None, iterations: int = None, rerank_weight: float = None):
+        self.path = path
+        self.max_nodes = max_nodes or int(os.getenv("GRAPH_MAX_NODES", "2000"))
+        self.max_degree = max_degree or int(os.getenv("GRAPH_MAX_DEGREE", "50"))
+        self.ppr_hops = ppr_hops or int(os.getenv("GRAPH_PPR_HOPS", "2"))
+        self.alpha = alpha if alpha is not None else float(os.getenv("GRAPH_PPR_ALPHA", "0.85"))
+        self.iterations = iterations or int(os.getenv("GRAPH_PPR_ITERATIONS", "20"))
+        self.rerank_weight = rerank_weight if rerank_weight is not None else float(os.getenv("GRAPH_RERANK_WEIGHT", "0.3"))
+        self._set_arrays(np.zeros(1, dtype='int64'), np.zeros(0, dtype='int32'), np.zeros(0, dtype='int64'),
+                         np.zeros(0, dtype='uint8'), np.zeros(1, dtype='int64'))
+    
+    def _set_arrays(self, indptr, indices, node_doc, title_bytes, title_offsets):
+        self.indptr = indptr  # Node i's neighbours are indices[indptr[i]:indptr[i + 1]]
+        self.indices = indices
+        self.node_doc = node_doc  # Document ID of each node, -1 for entity-only nodes
+        self.title_bytes = title_bytes  # UTF-8 titles, concatenated
+        self.title_offsets = title_offsets
+        self.doc_to_node = {int(doc_id): node for node, doc_id in enumerate(node_doc.tolist()) if doc_id >= 0}
+    
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_doc)
+    
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices) // 2
+    
+    def title(self, node: int) -> str:
+        """Title of a node."""
+        return self.title_bytes[self.title_offsets[node]:self.title_offsets[node + 1]].tobytes().decode("utf-8")
+    
+    def build(self, documents: Iterable[Tuple[int, str, List[str]]]):
+        """Build the graph from (doc_id, title, related_entities) rows."""
+        nodes = {}  # node key -> node ID
+        titles = []
+        node_doc = []
+        links = []
+        for doc_id, title, entities in documents:
+            key = _node_key(title)
+            node = nodes.get(key)
+            if node is None:
+                node = nodes[key] = len(titles)
+                titles.append(title)
+                node_doc.append(doc_id)
+            links.append((node, entities or []))
+        
+        src = []
+        dst = []
+        for node, entities in links:
+            for entity in entities:
+                key = _node_key(entity)
+                target = nodes.get(key)
+                if target is None:
+                    target = nodes[key] = len(titles)
+                    titles.append(entity)
+                    node_doc.append(-1)
+                if target != node:
+                    src.append(node)
+                    dst.append(target)
+        
+        num_nodes = len(titles)
+        src = np.asarray(src, dtype='int64')
+        dst = np.asarray(dst, dtype='int64')
+        # Store both directions once each, sorted by source node
+        edges = np.unique(np.concatenate([src * num_nodes + dst, dst * num_nodes + src]))
+        edge_src = edges // max(num_nodes, 1)
+        indptr = np.zeros(num_nodes + 1, dtype='int64')
+        np.cumsum(np.bincount(edge_src, minlength=num_nodes), out=indptr[1:])
+        
+        encoded = [title.encode("utf-8") for title in titles]
+        title_offsets = np.zeros(num_nodes + 1, dtype='int64')
+        np.cumsum([len(b) for b in encoded], out=title_offsets[1:])
+        self._set_arrays(indptr, (edges % max(num_nodes, 1)).astype('int32'), np.asarray(node_doc, dtype='int64'),
+                         np.frombuffer(b"".join(encoded), dtype='uint8'), title_offsets)
+    
+    def _neighbors_of(self, nodes: np.ndarray) -> np.ndarray:
+        """Concatenated neighbour lists of several nodes, max_degree per node.
+        
+        Documents get the lowest node IDs, so truncated lists keep document
+        neighbours before entity-only ones.
+        """
+        starts = self.indptr[nodes]
+        counts = np.minimum(self.indptr[nodes + 1] - starts, self.max_degree)
+        # Position of every neighbour in indices, without a Python loop over nodes
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        return self.indices[positions].astype('int64')
+    
+    @staticmethod
+    def _local_ids(nodes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Position of each query node in nodes, or -1 when it is not there."""
+        order = np.argsort(nodes)
+        sorted_nodes = nodes[order]
+        positions = np.minimum(np.searchsorted(sorted_nodes, queries), len(nodes) - 1)
+        return np.where(sorted_nodes[positions] == queries, order[positions], -1)
+    
+    def expand(self, seeds: Iterable[int], hops: int, max_nodes: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Breadth-first k-hop expansion from seed nodes.
+        
+        Returns (nodes, hop distance) in BFS order, seeds first, stopping once
+        max_nodes have been reached.
+        """
+        max_nodes = max_nodes or self.max_nodes
+        frontier = np.unique(np.asarray(list(seeds), dtype='int64'))
+        found = [frontier]
+        depth = [np.zeros(len(frontier), dtype='int32')]
+        total = len(frontier)
+        for hop in range(1, hops + 1):
+            if not len(frontier) or total >= max_nodes:
+                break
+            candidates = np.unique(self._neighbors_of(frontier))
+            new = candidates[~np.isin(candidates, np.concatenate(found))][:max_nodes - total]
+            found.append(new)
+            depth.append(np.full(len(new), hop, dtype='int32'))
+            total += len(new)
+            frontier = new
+        return np.concatenate(found), np.concatenate(depth)
+    
+    def neighbors(self, doc_id: int, hops: int = 1, limit: int = 20) -> Optional[List[Dict]]:
+        """Nodes within hops of a document (None if the document is not in the graph)."""
+        node = self.doc_to_node.get(int(doc_id))
+        if node is None:
+            return None
+        nodes, depth = self.expand([node], hops, max_nodes=limit + 1)
+        return [
+            {
+                'title': self.title(int(n)),
+                'doc_id': int(self.node_doc[n]) if self.node_doc[n] >= 0 else None,
+                'hops': int(d)
+            }
+            for n, d in zip(nodes[1:], depth[1:])
+        ]
+    
+    def personalized_pagerank(self, seeds: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Personalized PageRank restricted to the ppr_hops neighbourhood of the seed nodes.
+        
+        Returns (nodes, scores); scores sum to 1 over the subgraph.
+        """
+        nodes, _ = self.expand(seeds.keys(), self.ppr_hops)
+        
+        # Local edge list: neighbours of every subgraph node that are inside it
+        counts = np.minimum(self.indptr[nodes + 1] - self.indptr[nodes], self.max_degree)
+        src = np.repeat(np.arange(len(nodes)), counts)
+        dst = self._local_ids(nodes, self._neighbors_of(nodes))
+        inside = dst >= 0
+        src, dst = src[inside], dst[inside]
+        out_degree = np.bincount(src, minlength=len(nodes)).astype('float64')
+        
+        restart = np.zeros(len(nodes))
+        seed_nodes = np.fromiter(seeds.keys(), dtype='int64', count=len(seeds))
+        restart[self._local_ids(nodes, seed_nodes)] = np.maximum([seeds[node] for node in seed_nodes.tolist()], 0.0)
+        restart = restart / restart.sum() if restart.sum() > 0 else np.full(len(nodes), 1.0 / len(nodes))
+        
+        scores = restart.copy()
+        dangling = out_degree == 0
+        for _ in range(self.iterations):
+            spread = np.bincount(dst, weights=scores[src] / out_degree[src], minlength=len(nodes))
+            # Mass at nodes without edges goes back to the seeds
+            scores = self.alpha * (spread + scores[dangling].sum() * restart) + (1 - self.alpha) * restart
+        return nodes, scores
+    
+    def rerank(self, results: List[Tuple[int, float, int]], top_k: int,
+               allow: Callable[[int], bool] = None) -> List[Tuple[int, float, int]]:
+        """Blend retrieval scores with personalized PageRank seeded by the hits.
+        
+        Documents reachable from the hits through shared entities can enter
+        the ranking (with no matching chunk), if allow(doc_id) is true when
+        given. Both signals are scaled by their maximum and mixed by
+        rerank_weight.
+        """
+        seeds = {}
+        for doc_id, score, _ in results:
+            node = self.doc_to_node.get(int(doc_id))
+            if node is not None:
+                seeds[node] = seeds.get(node, 0.0) + max(score, 0.0) + 1e-6
+        if not seeds:
+            return results[:top_k]
+        
+        nodes, ppr = self.personalized_pagerank(seeds)
+        doc_ids = self.node_doc[nodes]
+        graph_scores = {int(doc_id): float(score) for doc_id, score in zip(doc_ids, ppr) if doc_id >= 0}
+        if allow is not None:
+            graph_scores = {doc_id: score for doc_id, score in graph_scores.items() if allow(doc_id)}
+        top_graph = max(graph_scores.values()) if graph_scores else 0.0
+        
+        retrieval = {int(doc_id): score for doc_id, score, _ in results}
+        # Scale against zero (or the lowest negative score) so every hit keeps some weight
+        low, high = min(min(retrieval.values()), 0.0), max(retrieval.values())
+        chunks = {int(doc_id): chunk_id for doc_id, _, chunk_id in results}
+        
+        combined = {}
+        for doc_id in set(retrieval) | set(graph_scores):
+            base = (retrieval[doc_id] - low) / (high - low) if doc_id in retrieval and high > low else 0.0
+            graph = graph_scores.get(doc_id, 0.0) / top_graph if top_graph > 0 else 0.0
+            combined[doc_id] = (1 - self.rerank_weight) * base + self.rerank_weight * graph
+        ranked = sorted(combined.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(doc_id, score, chunks.get(doc_id)) for doc_id, score in ranked]
+    
+    def save(self, path: str = None):
+        """Save the CSR arrays to a .npz file, replacing the old one atomically."""
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        # A file object, so np.savez does not append .npz to the temporary name
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, indptr=self.indptr, indices=self.indices, node_doc=self.node_doc,
+                     title_bytes=self.title_bytes, title_offsets=self.title_offsets)
+        os.replace(tmp_path, path)
+    
+    def load(self, path: str = None) -> bool:
+        """Load the graph saved by save()."""
+        path = path or self.path
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            self._set_arrays(data['indptr'], data['indices'], data['node_doc'],
+                             data['title_bytes'], data['title_offsets'])
+        return True
+    
+    def get_stats(self) -> dict:
+        """Graph size for /stats."""
+        return {
+            'nodes': self.num_nodes,
+            'edges': self.num_edges,
+            'documents': len(self.doc_to_node)
+        }
@@ -0,0 +1,46 @@
+"""Fusion of dense (FAISS) and sparse (BM25) document rankings."""
+import os
+from typing import List, Tuple
+
+SEARCH_MODES = ("dense", "sparse", "hybrid")
+FUSION_METHODS = ("rrf", "weighted")
+
+def _min_max(results: List[Tuple[int, float, int]]) -> dict:
+    """Scale a ranking's scores to [0, 1]."""
+    if not results:
+        return {}
+    scores = [score for _, score, _ in results]
+    low, high = min(scores), max(scores)
+    span = high - low
+    return {doc_id: (score - low) / span if span else 1.0 for doc_id, score, _ in results}
+
+def fuse_rankings(dense: List[Tuple[int, float, int]], sparse: List[Tuple[int, float, int]], top_k: int,
+                  method: str = None, rrf_k: int = None, alpha: float = None) -> List[Tuple[int, float, int]]:
+    """Fuse two (doc_id, score, chunk_id) rankings into one.
+    
+    'rrf' scores each document by sum(1 / (rrf_k + rank)) over the rankings it
+    appears in; 'weighted' mixes min-max normalized scores as
+    alpha * dense + (1 - alpha) * sparse. The returned chunk is the dense hit's
+    when there is one, since it matched the meaning of the query.
+    """
+    method = (method or os.getenv("HYBRID_FUSION", "rrf")).lower()
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+    rrf_k = rrf_k if rrf_k is not None else int(os.getenv("HYBRID_RRF_K", "60"))
+    alpha = alpha if alpha is not None else float(os.getenv("HYBRID_ALPHA", "0.5"))
+    
+    chunks = {doc_id: chunk_id for doc_id, _, chunk_id in sparse}
+    chunks.update({doc_id: chunk_id for doc_id, _, chunk_id in dense})
+    
+    scores = {}
+    if method == "rrf":
+        for ranking in (dense, sparse):
+            for rank, (doc_id, _, _) in enumerate(ranking, start=1):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    else:
+        for weight, ranking in ((alpha, dense), (1 - alpha, sparse)):
+            for doc_id, score in _min_max(ranking).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * score
+    
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(doc_id, score, chunks[doc_id]) for doc_id, score in ranked]
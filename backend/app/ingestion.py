@@ -0,0 +1,482 @@
+"""Streaming ingestion pipeline: documents -> DB insert -> embed -> index add."""
+import os
+import queue
+import threading
+import time
+from typing import Iterable, Dict, List
+
+import numpy as np
+from sqlalchemy import select, update, delete
+
+from app.database import SessionLocal, Document, DocumentChunk
+from app.chunking import TextChunker
+
+_DONE = object()  # End-of-stream marker passed between stages
+
+class IngestionPipeline:
+    """Ingest a stream of documents with bounded memory.
+    
+    Each stage runs on its own thread (the indexer on the caller's), connected
+    by bounded queues:
+    
+        documents --(db_batch_size)--> DB writer --(chunk batches)--> embedder
+            --(vectors)--> indexer
+    
+    The DB writer bulk-inserts new documents and chunks, and re-chunks
+    documents whose content changed since they were ingested, while the
+    embedder works on the previous batch. The indexer upserts the vectors
+    (replacing those of changed documents) along with their BM25 entries,
+    bulk-updates embedding_id and saves the indexes every save_every vectors.
+    Once everything is indexed the knowledge graph, if given, is rebuilt from
+    the stored related_entities. At most queue_size batches wait between any
+    two stages, so memory does not grow with the size of the corpus (apart
+    from the indexes themselves).
+    
+    With an embedding_store, chunk texts embedded before (by the same model)
+    are not sent to the model again; rebuild_index() re-creates the indexes
+    from the stored chunks that way.
+    """
+    
+    def __init__(self, embedding_gen, vector_store, chunker: TextChunker = None, session_factory=SessionLocal,
+                 db_batch_size: int = None, embed_batch_size: int = None, queue_size: int = None,
+                 save_every: int = None, answer_cache=None, keyword_index=None,
+                 graph=None, embedding_store=None):
+        self.embedding_gen = embedding_gen
+        self.vector_store = vector_store
+        self.chunker = chunker or TextChunker()
+        self.session_factory = session_factory
+        self.db_batch_size = db_batch_size or int(os.getenv("INGEST_DB_BATCH_SIZE", "32"))
+        self.embed_batch_size = embed_batch_size or int(os.getenv("INGEST_EMBED_BATCH_SIZE", "32"))
+        self.queue_size = queue_size or int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+        self.save_every = save_every or int(os.getenv("INGEST_SAVE_EVERY", "10000"))
+        self.answer_cache = answer_cache
+        self.keyword_index = keyword_index
+        self.graph = graph
+        self.embedding_store = embedding_store
+        
+        self._stop = threading.Event()
+        self._errors = []
+        self.stats = {'documents': 0, 'updated': 0, 'skipped': 0, 'chunks': 0, 'vectors': 0}
+    
+    def _put(self, q: queue.Queue, item):
+        """Put with a timeout loop so a failed downstream stage cannot deadlock us."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _get(self, q: queue.Queue):
+        """Get with a timeout loop so a failed upstream stage cannot deadlock us."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+    
+    def _run_stage(self, fn, *args):
+        """Run a stage, recording its error and stopping the other stages on failure."""
+        try:
+            fn(*args)
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+    
+    def _feed(self, documents: Iterable[Dict], out_q: queue.Queue):
+        """Group incoming documents into DB-sized batches, dropping repeated titles."""
+        seen = set()
+        batch = []
+        for doc in documents:
+            if self._stop.is_set():
+                return
+            if doc["title"] in seen:
+                continue
+            seen.add(doc["title"])
+            batch.append(doc)
+            if len(batch) >= self.db_batch_size:
+                if not self._put(out_q, batch):
+                    return
+                batch = []
+        if batch:
+            self._put(out_q, batch)
+        self._put(out_q, _DONE)
+    
+    def _write_documents(self, in_q: queue.Queue, out_q: queue.Queue):
+        """Bulk-insert new documents and their chunks, passing chunk texts on for embedding.
+        
+        Documents whose title is already stored are skipped when their content
+        is unchanged and every stored chunk has its vector in the index as it
+        was at the start of the run; otherwise (changed, or stored or updated
+        by a run that failed before saving its vectors) the row is updated and
+        its chunks replaced. A document keeps the topic it was first ingested
+        under (stored rows without one get the new document's).
+        """
+        db = self.session_factory()
+        try:
+            while True:
+                batch = self._get(in_q)
+                if batch is _DONE:
+                    break
+                
+                existing = {row.title: row for row in db.execute(
+                    select(Document.id, Document.title, Document.content, Document.topic)
+                    .where(Document.title.in_([doc["title"] for doc in batch]))
+                )}
+                unindexed = self._unindexed([row.id for row in existing.values()], db)
+                new_docs = [doc for doc in batch if doc["title"] not in existing]
+                changed_docs = [doc for doc in batch
+                                if doc["title"] in existing and (existing[doc["title"]].content != doc["content"]
+                                                                 or existing[doc["title"]].id in unindexed)]
+                self.stats['skipped'] += len(batch) - len(new_docs) - len(changed_docs)
+                
+                # Tag unchanged documents ingested before topics were recorded
+                retagged = [{"id": existing[doc["title"]].id, "topic": doc["topic"]} for doc in batch
+                            if doc["title"] in existing and doc.get("topic")
+                            and existing[doc["title"]].content == doc["content"]
+                            and existing[doc["title"]].id not in unindexed
+                            and existing[doc["title"]].topic is None]
+                if retagged:
+                    db.execute(update(Document), retagged)
+                    db.commit()
+                if not new_docs and not changed_docs:
+                    continue
+                
+                db_docs = [
+                    Document(
+                        title=doc["title"],
+                        content=doc["content"],
+                        source_link=doc["source_link"],
+                        related_entities=doc.get("related_entities", []),
+                        topic=doc.get("topic")
+                    )
+                    for doc in new_docs
+                ]
+                db.add_all(db_docs)
+                db.flush()  # Get the IDs
+                
+                # Changed documents keep their ID; their old chunks are replaced
+                changed_ids = [existing[doc["title"]].id for doc in changed_docs]
+                if changed_docs:
+                    db.execute(update(Document), [
+                        {
+                            "id": doc_id,
+                            "content": doc["content"],
+                            "source_link": doc["source_link"],
+                            "related_entities": doc.get("related_entities", []),
+                            "topic": existing[doc["title"]].topic or doc.get("topic")
+                        }
+                        for doc_id, doc in zip(changed_ids, changed_docs)
+                    ])
+                    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_(changed_ids)))
+                
+                # Split the full content into overlapping chunks, one vector each
+                db_chunks = []
+                texts = []
+                doc_ids = [db_doc.id for db_doc in db_docs] + changed_ids
+                for doc, doc_id in zip(new_docs + changed_docs, doc_ids):
+                    for chunk_index, chunk in enumerate(self.chunker.chunk(doc["content"])):
+                        db_chunks.append(DocumentChunk(
+                            document_id=doc_id,
+                            chunk_index=chunk_index,
+                            text=chunk["text"],
+                            start_char=chunk["start_char"],
+                            end_char=chunk["end_char"]
+                        ))
+                        # Prefix the title so every chunk carries its document's subject
+                        texts.append(f"{doc['title']}. {chunk['text']}")
+                db.add_all(db_chunks)
+                db.flush()  # Get the chunk IDs
+                
+                item = {
+                    'doc_ids': doc_ids,
+                    'chunk_ids': [db_chunk.id for db_chunk in db_chunks],
+                    'chunk_doc_ids': [db_chunk.document_id for db_chunk in db_chunks],
+                    'texts': texts
+                }
+                db.commit()
+                db.expunge_all()  # Don't keep document bodies alive in the identity map
+                
+                if self.answer_cache is not None:
+                    # Cached answers built from (re-)ingested documents are stale
+                    self.answer_cache.invalidate_documents(doc_ids)
+                
+                self.stats['documents'] += len(new_docs)
+                self.stats['updated'] += len(changed_docs)
+                self.stats['chunks'] += len(item['chunk_ids'])
+                print(f"💾 Stored {self.stats['documents']} new and {self.stats['updated']} changed documents "
+                      f"({self.stats['chunks']} chunks)")
+                if not self._put(out_q, item):
+                    return
+        finally:
+            db.close()
+            self._put(out_q, _DONE)
+    
+    def _unindexed(self, doc_ids: List[int], db) -> set:
+        """Stored documents with a chunk whose vector is not in the index as loaded at the start of the run.
+        
+        Checking chunk IDs rather than documents also catches a changed
+        document whose new chunks were stored but whose old vectors are still
+        the saved ones.
+        """
+        if not doc_ids:
+            return set()
+        rows = db.execute(
+            select(DocumentChunk.id, DocumentChunk.document_id).where(DocumentChunk.document_id.in_(doc_ids))
+        ).all()
+        found = np.isin([row.id for row in rows], self._live_keys)
+        return {row.document_id for row, live in zip(rows, found) if not live}
+    
+    def _embed(self, in_q: queue.Queue, out_q: queue.Queue):
+        """Embed chunk texts batch by batch."""
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    break
+                if not item['texts']:
+                    continue
+                if self.embedding_store is not None:
+                    item['vectors'] = self.embedding_store.embed(self.embedding_gen, item['texts'],
+                                                                 batch_size=self.embed_batch_size)
+                else:
+                    item['vectors'] = np.asarray(self.embedding_gen.generate_embeddings_batch(
+                        item['texts'], batch_size=self.embed_batch_size, show_progress_bar=False
+                    ), dtype='float32')
+                if not self._put(out_q, item):
+                    return
+        finally:
+            self._put(out_q, _DONE)
+    
+    def _prepare_index(self, dimension: int):
+        """Create the index on first use, adapting to the embedding dimension."""
+        store = self.vector_store
+        if store.index is None or (store.index.ntotal == 0 and dimension != store.dimension):
+            store.dimension = dimension
+            store.create_index()
+        elif dimension != store.dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match index dimension {store.dimension}")
+    
+    def _add_to_index(self, items: List[Dict], db):
+        """Upsert embedded batches into the index and record their FAISS IDs."""
+        store = self.vector_store
+        vectors = np.concatenate([item['vectors'] for item in items])
+        chunk_ids = [chunk_id for item in items for chunk_id in item['chunk_ids']]
+        chunk_doc_ids = [doc_id for item in items for doc_id in item['chunk_doc_ids']]
+        
+        # Vectors are keyed by chunk ID; re-ingested documents lose their old vectors
+        keys = store.upsert(vectors, chunk_doc_ids, chunk_ids)
+        if self.keyword_index is not None:
+            self.keyword_index.upsert([text for item in items for text in item['texts']], chunk_doc_ids, keys)
+        
+        # Update embedding_id in database (documents point at their first chunk)
+        db.execute(update(DocumentChunk), [
+            {"id": chunk_id, "embedding_id": key} for chunk_id, key in zip(chunk_ids, keys)
+        ])
+        doc_ids = [doc_id for item in items for doc_id in item['doc_ids']]
+        db.execute(update(Document), [
+            {"id": doc_id, "embedding_id": store.document_embedding_id(doc_id)} for doc_id in doc_ids
+        ])
+        db.commit()
+        self.stats['vectors'] += len(chunk_ids)
+    
+    def _save(self):
+        """Save the vector index and, if present, the keyword index and new stored embeddings."""
+        if self.embedding_store is not None:
+            self.embedding_store.flush()
+        if self.vector_store.index is not None:
+            self.vector_store.save()
+        if self.keyword_index is not None:
+            self.keyword_index.save()
+    
+    def _index(self, in_q: queue.Queue):
+        """Add vectors to the index, saving it every save_every vectors."""
+        db = self.session_factory()
+        pending = []  # Batches held back until an untrained index has enough training data
+        unsaved = 0
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    break
+                self._prepare_index(item['vectors'].shape[1])
+                pending.append(item)
+                
+                if not self.vector_store.index.is_trained:
+                    buffered = sum(len(p['chunk_ids']) for p in pending)
+                    if buffered < self.vector_store.min_training_points():
+                        continue
+                
+                self._add_to_index(pending, db)
+                unsaved += sum(len(p['chunk_ids']) for p in pending)
+                pending = []
+                print(f"📊 Indexed {self.stats['vectors']} vectors")
+                
+                if unsaved >= self.save_every:
+                    self._save()
+                    unsaved = 0
+            
+            if pending and not self._stop.is_set():
+                self._add_to_index(pending, db)
+        finally:
+            db.close()
+    
+    def _run_stages(self, stages: List[tuple], index_q: queue.Queue):
+        """Run (name, fn, *args) stages on their own threads and the indexer on this one until all finish."""
+        threads = [threading.Thread(target=self._run_stage, args=(fn, *args), name=name)
+                   for name, fn, *args in stages]
+        for thread in threads:
+            thread.start()
+        self._run_stage(self._index, index_q)
+        for thread in threads:
+            thread.join()
+    
+    def run(self, documents: Iterable[Dict]) -> Dict:
+        """Ingest documents and save the index; returns counts and elapsed time."""
+        start = time.perf_counter()
+        doc_q = queue.Queue(maxsize=self.queue_size)
+        embed_q = queue.Queue(maxsize=self.queue_size)
+        index_q = queue.Queue(maxsize=self.queue_size)
+        # Chunks with saved vectors; stored documents with a chunk missing from it are indexed again
+        self._live_keys = self.vector_store.id_arrays()[0]
+        
+        self._run_stages([
+            ("ingest-feed", self._feed, documents, doc_q),
+            ("ingest-db", self._write_documents, doc_q, embed_q),
+            ("ingest-embed", self._embed, embed_q, index_q),
+        ], index_q)
+        
+        if self.answer_cache is not None:
+            self.answer_cache.flush()
+        if self._errors:
+            try:
+                # Keep the vectors indexed so far; the next run indexes the rest
+                self._save()
+            finally:
+                raise self._errors[0]
+        
+        self._save()
+        if self.graph is not None:
+            self.rebuild_graph()
+        self.stats['seconds'] = time.perf_counter() - start
+        return dict(self.stats)
+    
+    def delete_documents(self, doc_ids: List[int]) -> int:
+        """Delete documents, their chunks and their vectors; returns the number of vectors removed."""
+        doc_ids = list(doc_ids)
+        db = self.session_factory()
+        try:
+            db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_(doc_ids)))
+            db.execute(delete(Document).where(Document.id.in_(doc_ids)))
+            db.commit()
+        finally:
+            db.close()
+        
+        removed = self.vector_store.delete(doc_ids)
+        if self.keyword_index is not None:
+            self.keyword_index.delete(doc_ids)
+        self._save()
+        if self.graph is not None:
+            self.rebuild_graph()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_documents(doc_ids)
+            self.answer_cache.flush()
+        return removed
+    
+    def _read_chunks(self, out_q: queue.Queue):
+        """Pass every stored chunk on for embedding, about embed_batch_size at a time."""
+        db = self.session_factory()
+        
+        def item_of(rows):
+            return {
+                'doc_ids': list(dict.fromkeys(row.document_id for row in rows)),
+                'chunk_ids': [row.id for row in rows],
+                'chunk_doc_ids': [row.document_id for row in rows],
+                # Same text as at ingestion, so stored embeddings are found
+                'texts': [f"{row.title}. {row.text}" for row in rows]
+            }
+        
+        try:
+            rows = db.execute(
+                select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.text, Document.title)
+                .join(Document, Document.id == DocumentChunk.document_id)
+                .order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+                .execution_options(yield_per=self.embed_batch_size)
+            )
+            batch = []
+            for row in rows:
+                # Batches end on document boundaries: the indexer upserts whole documents
+                if len(batch) >= self.embed_batch_size and row.document_id != batch[-1].document_id:
+                    if self._stop.is_set() or not self._put(out_q, item_of(batch)):
+                        return
+                    batch = []
+                batch.append(row)
+                self.stats['chunks'] += 1
+            if batch and not self._stop.is_set():
+                self._put(out_q, item_of(batch))
+        finally:
+            db.close()
+            self._put(out_q, _DONE)
+    
+    def rebuild_index(self) -> Dict:
+        """Re-create the vector index (with the store's configured type) and keyword index from the stored chunks.
+        
+        Chunks are re-embedded only when their text is not in the embedding
+        store, so with a complete store the rebuild makes no model calls.
+        """
+        start = time.perf_counter()
+        self.vector_store.reset()
+        if self.keyword_index is not None:
+            self.keyword_index.reset()
+        embed_q = queue.Queue(maxsize=self.queue_size)
+        index_q = queue.Queue(maxsize=self.queue_size)
+        
+        self._run_stages([
+            ("rebuild-read", self._read_chunks, embed_q),
+            ("rebuild-embed", self._embed, embed_q, index_q),
+        ], index_q)
+        if self._errors:
+            raise self._errors[0]
+        
+        self._save()
+        self.stats['seconds'] = time.perf_counter() - start
+        return dict(self.stats)
+    
+    def backfill_keyword_index(self) -> int:
+        """Build the keyword index from stored chunks (for indexes built before it existed)."""
+        db = self.session_factory()
+        added = 0
+        try:
+            rows = db.execute(
+                select(DocumentChunk.embedding_id, DocumentChunk.document_id, DocumentChunk.text, Document.title)
+                .join(Document, Document.id == DocumentChunk.document_id)
+                .where(DocumentChunk.embedding_id.is_not(None))
+                .execution_options(yield_per=self.db_batch_size * 32)
+            )
+            for batch in rows.partitions():
+                self.keyword_index.add(
+                    [f"{row.title}. {row.text}" for row in batch],
+                    [row.document_id for row in batch],
+                    [row.embedding_id for row in batch]
+                )
+                added += len(batch)
+        finally:
+            db.close()
+        self.keyword_index.save()
+        return added
+    
+    def rebuild_graph(self):
+        """Rebuild the knowledge graph from every stored document's related_entities and save it."""
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(Document.id, Document.title, Document.related_entities)
+                .execution_options(yield_per=self.db_batch_size * 32)
+            )
+            self.graph.build((row.id, row.title, row.related_entities) for row in rows)
+        finally:
+            db.close()
+        self.graph.save()
+        print(f"🕸️  Knowledge graph: {self.graph.num_nodes} nodes, {self.graph.num_edges} edges")
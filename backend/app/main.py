@@ -1,21 +1,117 @@
 """FastAPI main application."""
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, NamedTuple, Tuple
+import asyncio
+import json
 import time
 import os
 from dotenv import load_dotenv
 
-from app.database import init_db, get_db, Document, QueryLog
-from app.models import SearchRequest, SearchResponse, SearchResult, AskRequest, AskResponse, StatsResponse
-from app.embeddings import EmbeddingGenerator
-from app.vector_store import FAISSVectorStore
-from app.rag import RAGPipeline
+from app.database import engine, init_db, get_async_db, get_documents_by_ids_async, get_chunk_texts_async, Document
+from app.models import (SearchRequest, SearchResponse, SearchResult, AskRequest, AskResponse, StatsResponse,
+                        GraphNeighbor, GraphNeighborsResponse, BatchSearchRequest, BatchSearchItem,
+                        BatchSearchResponse, BatchAskRequest, BatchAskItem, BatchAskResponse)
+from app.components import Components, env_flag
+from app.hybrid import SEARCH_MODES, fuse_rankings
+from app.metrics import RequestMetrics, StageTimer
+from app.query_log import QueryLogWriter
 
 load_dotenv()
 
-app = FastAPI(title="Smart Knowledge Graph Search Engine", version="1.0.0")
+def load_embedding_generator():
+    from app.embeddings import EmbeddingGenerator
+    return EmbeddingGenerator()
+
+def load_vector_store():
+    from app.sharded_store import create_vector_store
+    store = create_vector_store()
+    # Memory-mapped, so workers share one copy in the page cache
+    if not store.load(mmap=env_flag("VECTOR_INDEX_MMAP", "true")):
+        print("⚠️  Vector index not found. Please run data ingestion first.")
+    return store
+
+def load_keyword_index():
+    from app.bm25 import BM25Index
+    index = BM25Index()
+    index.load()
+    return index
+
+def load_knowledge_graph():
+    from app.graph import KnowledgeGraph
+    graph = KnowledgeGraph()
+    graph.load()
+    return graph
+
+def load_attribute_index():
+    from app.attribute_index import AttributeIndex
+    return AttributeIndex().load(components.get("vector_store"))
+
+def load_answer_cache():
+    if not env_flag("ANSWER_CACHE_ENABLED", "true"):
+        return None
+    from app.answer_cache import SemanticAnswerCache
+    cache = SemanticAnswerCache()
+    cache.load()
+    return cache
+
+def load_embedding_batcher():
+    from app.embedding_batcher import EmbeddingBatcher
+    return EmbeddingBatcher(components.get("embedding_generator"))
+
+def load_reranker():
+    from app.reranker import CrossEncoderReranker
+    return CrossEncoderReranker()
+
+def load_rag_pipeline():
+    from app.rag import RAGPipeline
+    return RAGPipeline(answer_cache=components.get("answer_cache"), executor=cpu_executor)
+
+# Heavy components are built on first use (or by the startup warm-up), not at import
+components = Components()
+components.register("embedding_generator", load_embedding_generator, required=True)
+components.register("vector_store", load_vector_store, required=True)
+components.register("keyword_index", load_keyword_index)
+components.register("knowledge_graph", load_knowledge_graph)
+components.register("attribute_index", load_attribute_index)
+components.register("answer_cache", load_answer_cache)
+components.register("embedding_batcher", load_embedding_batcher)
+components.register("rag_pipeline", load_rag_pipeline)
+# The cross-encoder is only warmed up when re-ranking is on by default
+components.register("reranker", load_reranker, warm_up=env_flag("RERANK", "false"))
+
+if env_flag("PRELOAD_COMPONENTS", "false"):
+    # Load everything in the parent process so forked workers share it (see gunicorn.conf.py)
+    init_db()
+    components.preload()
+    engine.dispose()  # Workers open their own database connections
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables, warm components up in the background and stop workers on shutdown."""
+    print("🚀 Smart Knowledge Graph Search Engine starting...")
+    await asyncio.get_running_loop().run_in_executor(None, init_db)
+    warm_up = asyncio.create_task(components.warm_up()) if env_flag("WARMUP_ON_STARTUP", "true") else None
+    query_log_writer.start()
+    yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    await query_log_writer.stop()
+    embedding_batcher = components.peek("embedding_batcher")
+    if embedding_batcher is not None:
+        await embedding_batcher.stop()
+    answer_cache = components.peek("answer_cache")
+    if answer_cache is not None:
+        answer_cache.flush()
+    cpu_executor.shutdown(wait=False)
+
+app = FastAPI(title="Smart Knowledge Graph Search Engine", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -26,137 +122,522 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-embedding_generator = EmbeddingGenerator()
-vector_store = FAISSVectorStore()
-rag_pipeline = RAGPipeline()
+# Bounded pool for CPU-bound work (FAISS search) so it never runs on the event loop
+cpu_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", str(os.cpu_count() or 4))),
+    thread_name_prefix="cpu-executor"
+)
 
-# Initialize database
-init_db()
+# Per-endpoint, per-stage latency histograms for /stats and /metrics
+request_metrics = RequestMetrics()
+# query_logs rows are written in batches by a background task
+query_log_writer = QueryLogWriter()
 
-# Load vector store if exists
-vector_store.load()
+async def run_in_cpu_executor(fn, *args, **kwargs):
+    """Run a blocking call in the bounded CPU executor."""
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, partial(fn, *args, **kwargs))
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize on startup."""
-    print("🚀 Smart Knowledge Graph Search Engine starting...")
-    if vector_store.index is None:
-        print("⚠️  Vector index not found. Please run data ingestion first.")
+class Indexes(NamedTuple):
+    """The retrieval indexes, as injected into endpoints."""
+    vector_store: object
+    keyword_index: object
+    knowledge_graph: object
+    attribute_index: object
+
+async def get_indexes() -> Indexes:
+    """Dependency: the retrieval indexes, loaded on first use."""
+    return Indexes(*[await components.aget(name) for name in Indexes._fields])
+
+async def get_embedding_batcher():
+    """Dependency: the running query embedding batcher."""
+    embedding_batcher = await components.aget("embedding_batcher")
+    embedding_batcher.start()
+    return embedding_batcher
+
+async def get_rag_pipeline():
+    """Dependency: the RAG pipeline."""
+    return await components.aget("rag_pipeline")
+
+def resolve_search_mode(mode: str = None) -> str:
+    """Validate a requested retrieval mode, defaulting to SEARCH_MODE."""
+    mode = (mode or os.getenv("SEARCH_MODE", "dense")).lower()
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+    return mode
+
+def resolve_graph_rerank(indexes: Indexes, graph: bool = None) -> bool:
+    """Whether to re-rank with the knowledge graph, defaulting to GRAPH_RERANK."""
+    if graph is None:
+        graph = env_flag("GRAPH_RERANK", "false")
+    return graph and indexes.knowledge_graph.num_nodes > 0
+
+def resolve_filter(indexes: Indexes, topics: List[str] = None, sources: List[str] = None, doc_ids: List[int] = None):
+    """The IDFilter for the requested topics, sources and document IDs (None when none are given)."""
+    return indexes.attribute_index.filter(topics=topics, sources=sources, doc_ids=doc_ids)
+
+async def resolve_reranker(rerank: bool = None):
+    """The cross-encoder if this request should be re-ranked (defaults to RERANK), else None."""
+    if rerank is None:
+        rerank = env_flag("RERANK", "false")
+    return await components.aget("reranker") if rerank else None
+
+async def retrieve_batch(db: AsyncSession, indexes: Indexes, query_embeddings, queries: List[str], top_k: int,
+                         include_content: bool = True, mode: str = "dense", graph: bool = False, reranker=None,
+                         id_filter=None, timer: StageTimer = None) -> List[List[dict]]:
+    """Search the indexes for several queries, collapse chunk hits to documents and fetch them in ranking order.
+    
+    mode selects the retriever: 'dense' (FAISS), 'sparse' (BM25 over query) or
+    'hybrid', which runs both in parallel and fuses their rankings. All
+    queries go through one FAISS search call and one document fetch. With
+    graph set, the hits are re-ranked by personalized PageRank over the
+    knowledge graph, which can pull in closely linked documents. Each returned
+    document carries its `score` and, for chunked indexes, the best-matching
+    chunk as `chunk` and as the snippet.
+    
+    With a reranker, RERANK_CANDIDATES documents are fetched and re-scored by
+    the cross-encoder (as `rerank_score`) until RERANK_BUDGET_MS have passed
+    since the request started. With an id_filter (see resolve_filter) every retriever only
+    considers the selected vectors and documents. Time spent in each stage is
+    recorded on timer.
+    """
+    timer = timer or StageTimer()
+    vector_store, keyword_index, knowledge_graph, _ = indexes
+    if id_filter is not None and not id_filter.count:
+        return [[] for _ in queries]  # Nothing matches the filter
+    final_k = top_k
+    if reranker is not None:
+        top_k = max(top_k, int(os.getenv("RERANK_CANDIDATES", "20")))
+    
+    with timer.stage("search"):
+        if mode != "dense" and not len(keyword_index):
+            mode = "dense"  # No keyword index yet
+        if mode == "dense":
+            rankings = await run_in_cpu_executor(vector_store.search_documents_batch, query_embeddings, top_k,
+                                                 id_filter=id_filter)
+        elif mode == "sparse":
+            rankings = await run_in_cpu_executor(keyword_index.search_documents_batch, queries, top_k, id_filter)
+        else:
+            depth = max(top_k, int(os.getenv("HYBRID_DEPTH", "20")))
+            dense, sparse = await asyncio.gather(
+                run_in_cpu_executor(vector_store.search_documents_batch, query_embeddings, depth,
+                                    id_filter=id_filter),
+                run_in_cpu_executor(keyword_index.search_documents_batch, queries, depth, id_filter)
+            )
+            rankings = [fuse_rankings(d, s, top_k) for d, s in zip(dense, sparse)]
+        if not vector_store.chunked:
+            # Keyword entries of unchunked indexes are keyed by document ID
+            rankings = [[(doc_id, score, None) for doc_id, score, _ in results] for results in rankings]
+    if graph:
+        with timer.stage("graph"):
+            rankings = await asyncio.gather(*[
+                run_in_cpu_executor(knowledge_graph.rerank, results, top_k,
+                                    id_filter.allows_document if id_filter is not None else None)
+                for results in rankings
+            ])
+    
+    with timer.stage("fetch"):
+        doc_ids = list(dict.fromkeys(int(doc_id) for results in rankings for doc_id, _, _ in results))
+        docs = await get_documents_by_ids_async(db, doc_ids, include_content=include_content)
+        chunk_texts = await get_chunk_texts_async(db, [chunk_id for results in rankings for _, _, chunk_id in results])
+    
+    by_id = {doc["id"]: doc for doc in docs}
+    batch = []
+    for results in rankings:
+        hits = []
+        for doc_id, score, chunk_id in results:
+            if int(doc_id) not in by_id:
+                continue  # Deleted since it was indexed
+            # Copied, since several queries can hit the same document
+            doc = dict(by_id[int(doc_id)], score=score, chunk=chunk_texts.get(chunk_id))
+            if doc["chunk"]:
+                doc["snippet"] = doc["chunk"]
+            hits.append(doc)
+        batch.append(hits)
+    
+    if reranker is not None:
+        deadline = timer.start + float(os.getenv("RERANK_BUDGET_MS", "500")) / 1000.0
+        with timer.stage("rerank"):
+            reranked = await asyncio.gather(*[
+                run_in_cpu_executor(reranker.rerank, query, hits, final_k, deadline)
+                for query, hits in zip(queries, batch)
+            ])
+        batch = [hits for hits, _ in reranked]
+        timer.info["rerank"] = {
+            'candidates': sum(info['candidates'] for _, info in reranked),
+            'scored': sum(info['scored'] for _, info in reranked),
+            'truncated': any(info['truncated'] for _, info in reranked)
+        }
+    return batch
+
+async def retrieve(db: AsyncSession, indexes: Indexes, query_embedding, top_k: int, include_content: bool = True,
+                   query: str = None, mode: str = "dense", graph: bool = False, reranker=None, id_filter=None,
+                   timer: StageTimer = None) -> List[dict]:
+    """retrieve_batch() for a single query."""
+    batch = await retrieve_batch(db, indexes, query_embedding.reshape(1, -1), [query], top_k,
+                                 include_content=include_content, mode=mode, graph=graph, reranker=reranker,
+                                 id_filter=id_filter, timer=timer)
+    return batch[0]
+
+def to_search_result(doc: dict) -> SearchResult:
+    """API representation of a retrieved document."""
+    return SearchResult(
+        id=doc["id"],
+        title=doc["title"],
+        content=doc["content"],
+        source_link=doc["source_link"],
+        similarity_score=doc["score"],
+        rerank_score=doc.get("rerank_score"),
+        snippet=doc["snippet"]
+    )
+
+def check_batch_size(size: int):
+    """Reject batches larger than BATCH_MAX_QUERIES."""
+    max_size = int(os.getenv("BATCH_MAX_QUERIES", "256"))
+    if size > max_size:
+        raise HTTPException(status_code=400, detail=f"Batch of {size} queries exceeds the limit of {max_size}")
+
+def record_request(endpoint: str, timer: StageTimer, queries: List[Tuple[str, int]]):
+    """Observe a request's stage timings and queue a log row for each of its (query, result_count) pairs."""
+    request_metrics.observe(endpoint, timer)
+    stages = timer.as_dict()
+    for query, result_count in queries:
+        query_log_writer.log({
+            'query': query,
+            'timestamp': time.time(),
+            'result_count': result_count,
+            'endpoint': endpoint,
+            'latency_ms': stages['total'],
+            'embed_ms': stages.get('embed'),
+            'search_ms': stages.get('search'),
+            'graph_ms': stages.get('graph'),
+            'fetch_ms': stages.get('fetch'),
+            'rerank_ms': stages.get('rerank'),
+            'generate_ms': stages.get('generate')
+        })
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.get("/")
 async def root():
     """Root endpoint."""
     return {"message": "Smart Knowledge Graph Search Engine API", "version": "1.0.0"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the embedding model and vector index are loaded, 503 before."""
+    is_ready = components.ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "components": components.status()}
+    )
+
 @app.get("/search", response_model=SearchResponse)
 async def search(
     query: str = Query(..., description="Search query"),
     top_k: int = Query(5, ge=1, le=20, description="Number of results"),
-    db: Session = Depends(get_db)
+    include_content: bool = Query(True, description="Include the full document body in each result"),
+    mode: str = Query(None, description="Retrieval mode: dense, sparse or hybrid (defaults to SEARCH_MODE)"),
+    graph: bool = Query(None, description="Re-rank with the knowledge graph (defaults to GRAPH_RERANK)"),
+    rerank: bool = Query(None, description="Re-rank with the cross-encoder (defaults to RERANK)"),
+    topics: List[str] = Query(None, description="Only documents ingested under one of these topics"),
+    sources: List[str] = Query(None, description="Only documents whose link host is one of these"),
+    doc_ids: List[int] = Query(None, description="Only these documents"),
+    db: AsyncSession = Depends(get_async_db),
+    indexes: Indexes = Depends(get_indexes),
+    embedding_batcher = Depends(get_embedding_batcher)
 ):
     """Semantic search endpoint."""
-    start_time = time.time()
+    timer = StageTimer()
+    mode = resolve_search_mode(mode)
     
     try:
-        # Generate query embedding
-        query_embedding = embedding_generator.generate_embedding(query)
+        reranker = await resolve_reranker(rerank)
         
-        # Search vector store
-        results = vector_store.search(query_embedding, top_k=top_k)
+        # Generate query embedding
+        with timer.stage("embed"):
+            query_embedding = await embedding_batcher.embed(query)
         
-        # Fetch document details from database
-        search_results = []
-        for doc_id, similarity_score in results:
-            doc = db.query(Document).filter(Document.id == doc_id).first()
-            if doc:
-                # Create snippet (first 200 chars)
-                snippet = doc.content[:200] + "..." if len(doc.content) > 200 else doc.content
-                
-                search_results.append(SearchResult(
-                    id=doc.id,
-                    title=doc.title,
-                    content=doc.content,
-                    source_link=doc.source_link,
-                    similarity_score=similarity_score,
-                    snippet=snippet
-                ))
+        # Search vector store and fetch document details (FAISS ranking order)
+        docs = await retrieve(db, indexes, query_embedding, top_k, include_content=include_content, query=query,
+                              mode=mode, graph=resolve_graph_rerank(indexes, graph), reranker=reranker,
+                              id_filter=resolve_filter(indexes, topics, sources, doc_ids), timer=timer)
+        search_results = [to_search_result(doc) for doc in docs]
         
-        # Log query
-        latency = (time.time() - start_time) * 1000
-        query_log = QueryLog(query=query, timestamp=time.time(), result_count=len(search_results))
-        db.add(query_log)
-        db.commit()
+        record_request("/search", timer, [(query, len(search_results))])
         
         return SearchResponse(
             results=search_results,
             query=query,
-            total_results=len(search_results)
+            total_results=len(search_results),
+            timings=timer.as_dict(),
+            rerank=timer.info.get("rerank")
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
 @app.post("/ask", response_model=AskResponse)
-async def ask(request: AskRequest, db: Session = Depends(get_db)):
+async def ask(request: AskRequest, db: AsyncSession = Depends(get_async_db), indexes: Indexes = Depends(get_indexes),
+              embedding_batcher = Depends(get_embedding_batcher), rag_pipeline = Depends(get_rag_pipeline)):
     """RAG-powered Q&A endpoint."""
+    timer = StageTimer()
+    mode = resolve_search_mode(request.mode)
     try:
+        reranker = await resolve_reranker(request.rerank)
+        
         # Generate query embedding
-        query_embedding = embedding_generator.generate_embedding(request.question)
+        with timer.stage("embed"):
+            query_embedding = await embedding_batcher.embed(request.question)
         
         # Retrieve relevant documents
-        results = vector_store.search(query_embedding, top_k=request.top_k)
-        
-        # Fetch document details
-        context_docs = []
-        for doc_id, _ in results:
-            doc = db.query(Document).filter(Document.id == doc_id).first()
-            if doc:
-                context_docs.append({
-                    "title": doc.title,
-                    "content": doc.content,
-                    "source_link": doc.source_link
-                })
+        context_docs = await retrieve(db, indexes, query_embedding, request.top_k, query=request.question, mode=mode,
+                                      graph=resolve_graph_rerank(indexes, request.graph), reranker=reranker,
+                                      id_filter=resolve_filter(indexes, request.topics, request.sources,
+                                                               request.doc_ids),
+                                      timer=timer)
         
         # Generate answer using RAG
-        answer = rag_pipeline.generate_answer(request.question, context_docs)
+        usage = {}
+        with timer.stage("generate"):
+            answer = await rag_pipeline.agenerate_answer(request.question, context_docs, query_embedding, usage)
         
         # Extract supporting document titles
         supporting_docs = [doc["title"] for doc in context_docs]
+        record_request("/ask", timer, [(request.question, len(context_docs))])
         
         return AskResponse(
             answer=answer,
             supporting_documents=supporting_docs,
-            question=request.question
+            question=request.question,
+            timings=timer.as_dict(),
+            rerank=timer.info.get("rerank"),
+            prompt_tokens=usage.get("prompt_tokens")
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"RAG error: {str(e)}")
 
+async def wait_for_disconnect(http_request: Request):
+    """Return once the client has disconnected (the request body is already read)."""
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest, http_request: Request, db: AsyncSession = Depends(get_async_db),
+                     indexes: Indexes = Depends(get_indexes), embedding_batcher = Depends(get_embedding_batcher),
+                     rag_pipeline = Depends(get_rag_pipeline)):
+    """RAG-powered Q&A streamed as Server-Sent Events.
+    
+    Emits a `documents` event with the supporting documents as soon as retrieval
+    finishes, then one `token` event per generated chunk and a final `done`
+    event with the full answer and its prompt_tokens. Both carry the time spent
+    in each stage so far. If the client disconnects, the LLM stream is closed
+    and generation stops, even while waiting for the next token.
+    """
+    timer = StageTimer()
+    mode = resolve_search_mode(request.mode)
+    try:
+        reranker = await resolve_reranker(request.rerank)
+        with timer.stage("embed"):
+            query_embedding = await embedding_batcher.embed(request.question)
+        context_docs = await retrieve(db, indexes, query_embedding, request.top_k, query=request.question, mode=mode,
+                                      graph=resolve_graph_rerank(indexes, request.graph), reranker=reranker,
+                                      id_filter=resolve_filter(indexes, request.topics, request.sources,
+                                                               request.doc_ids),
+                                      timer=timer)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"RAG error: {str(e)}")
+    
+    async def events():
+        yield sse_event("documents", {
+            "supporting_documents": [doc["title"] for doc in context_docs],
+            "question": request.question,
+            "timings": timer.as_dict(),
+            "rerank": timer.info.get("rerank")
+        })
+        
+        usage = {}
+        tokens = rag_pipeline.astream_answer(request.question, context_docs, query_embedding, usage)
+        answer = []
+        generate_start = time.perf_counter()
+        # Watch for the disconnect while waiting for tokens, not only between them
+        disconnected = asyncio.ensure_future(wait_for_disconnect(http_request))
+        next_token = None
+        try:
+            while True:
+                next_token = asyncio.ensure_future(tokens.__anext__())
+                await asyncio.wait({next_token, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_token.done():
+                    return
+                try:
+                    token = next_token.result()
+                except StopAsyncIteration:
+                    break
+                answer.append(token)
+                yield sse_event("token", {"token": token})
+            timer.stages["generate"] = (time.perf_counter() - generate_start) * 1000
+            record_request("/ask/stream", timer, [(request.question, len(context_docs))])
+            yield sse_event("done", {"answer": "".join(answer).strip(), "timings": timer.as_dict(),
+                                     "prompt_tokens": usage.get("prompt_tokens")})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"RAG error: {str(e)}"})
+        finally:
+            disconnected.cancel()
+            if next_token is not None and not next_token.done():
+                # Cancelling the pending token closes the stream from inside
+                next_token.cancel()
+                await asyncio.wait({next_token})
+            # Closing the token stream cancels the upstream LLM call
+            await tokens.aclose()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest, db: AsyncSession = Depends(get_async_db),
+                       indexes: Indexes = Depends(get_indexes), embedding_batcher = Depends(get_embedding_batcher)):
+    """Search several queries with one embedding call, one FAISS search and one document fetch.
+    
+    Items are returned in input order; an item that cannot be served (e.g. an
+    empty query) carries an error instead of results.
+    """
+    check_batch_size(len(request.queries))
+    timer = StageTimer()
+    mode = resolve_search_mode(request.mode)
+    items = [BatchSearchItem(query=query, error=None if query.strip() else "Empty query") for query in request.queries]
+    valid = [i for i, item in enumerate(items) if item.error is None]
+    queries = [request.queries[i] for i in valid]
+    
+    try:
+        if queries:
+            reranker = await resolve_reranker(request.rerank)
+            with timer.stage("embed"):
+                query_embeddings = await embedding_batcher.embed_many(queries)
+            batch = await retrieve_batch(db, indexes, query_embeddings, queries, request.top_k,
+                                         include_content=request.include_content, mode=mode,
+                                         graph=resolve_graph_rerank(indexes, request.graph), reranker=reranker,
+                                         id_filter=resolve_filter(indexes, request.topics, request.sources,
+                                                                  request.doc_ids),
+                                         timer=timer)
+            for i, docs in zip(valid, batch):
+                items[i].results = [to_search_result(doc) for doc in docs]
+            
+            record_request("/search/batch", timer, [(items[i].query, len(items[i].results)) for i in valid])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    
+    return BatchSearchResponse(items=items, timings=timer.as_dict())
+
+@app.post("/ask/batch", response_model=BatchAskResponse)
+async def ask_batch(request: BatchAskRequest, db: AsyncSession = Depends(get_async_db),
+                    indexes: Indexes = Depends(get_indexes), embedding_batcher = Depends(get_embedding_batcher),
+                    rag_pipeline = Depends(get_rag_pipeline)):
+    """Answer several questions: batched retrieval, then at most ASK_BATCH_CONCURRENCY LLM calls at a time.
+    
+    Items are returned in input order; a question whose answer failed carries
+    an error without failing the rest of the batch.
+    """
+    check_batch_size(len(request.questions))
+    timer = StageTimer()
+    mode = resolve_search_mode(request.mode)
+    items = [BatchAskItem(question=question, error=None if question.strip() else "Empty question")
+             for question in request.questions]
+    valid = [i for i, item in enumerate(items) if item.error is None]
+    questions = [request.questions[i] for i in valid]
+    if not questions:
+        return BatchAskResponse(items=items, timings=timer.as_dict())
+    
+    try:
+        reranker = await resolve_reranker(request.rerank)
+        with timer.stage("embed"):
+            query_embeddings = await embedding_batcher.embed_many(questions)
+        batch = await retrieve_batch(db, indexes, query_embeddings, questions, request.top_k, mode=mode,
+                                     graph=resolve_graph_rerank(indexes, request.graph), reranker=reranker,
+                                     id_filter=resolve_filter(indexes, request.topics, request.sources,
+                                                              request.doc_ids),
+                                     timer=timer)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"RAG error: {str(e)}")
+    
+    semaphore = asyncio.Semaphore(int(os.getenv("ASK_BATCH_CONCURRENCY", "4")))
+    
+    async def answer(question: str, context_docs: List[dict], query_embedding):
+        usage = {}
+        async with semaphore:
+            return await rag_pipeline.agenerate_answer(question, context_docs, query_embedding, usage), usage
+    
+    with timer.stage("generate"):
+        answers = await asyncio.gather(
+            *[answer(question, docs, embedding) for question, docs, embedding in zip(questions, batch, query_embeddings)],
+            return_exceptions=True
+        )
+    for i, context_docs, result in zip(valid, batch, answers):
+        if isinstance(result, Exception):
+            items[i].error = f"RAG error: {str(result)}"
+        else:
+            items[i].answer, usage = result
+            items[i].supporting_documents = [doc["title"] for doc in context_docs]
+            items[i].prompt_tokens = usage.get("prompt_tokens")
+    record_request("/ask/batch", timer, [(question, len(docs)) for question, docs in zip(questions, batch)])
+    
+    return BatchAskResponse(items=items, timings=timer.as_dict())
+
+@app.get("/graph/neighbors", response_model=GraphNeighborsResponse)
+async def graph_neighbors(
+    doc_id: int = Query(..., description="Document ID"),
+    hops: int = Query(1, ge=1, le=3, description="Maximum number of hops"),
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of neighbours")
+):
+    """Entities and documents linked to a document in the knowledge graph."""
+    knowledge_graph = await components.aget("knowledge_graph")
+    neighbors = knowledge_graph.neighbors(doc_id, hops=hops, limit=limit)
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} is not in the knowledge graph")
+    return GraphNeighborsResponse(
+        doc_id=doc_id,
+        title=knowledge_graph.title(knowledge_graph.doc_to_node[doc_id]),
+        neighbors=[GraphNeighbor(**neighbor) for neighbor in neighbors]
+    )
+
 @app.get("/stats", response_model=StatsResponse)
-async def stats(db: Session = Depends(get_db)):
+async def stats(db: AsyncSession = Depends(get_async_db), indexes: Indexes = Depends(get_indexes),
+                embedding_batcher = Depends(get_embedding_batcher)):
     """Get system statistics."""
     try:
-        total_docs = db.query(Document).count()
-        vector_stats = vector_store.get_stats()
-        
-        # Calculate average latency from recent queries
-        recent_queries = db.query(QueryLog).order_by(QueryLog.id.desc()).limit(10).all()
-        avg_latency = 0.0
-        if recent_queries:
-            # This is a simplified calculation
-            avg_latency = 50.0  # Placeholder
+        answer_cache = await components.aget("answer_cache")
+        total_docs = (await db.execute(select(func.count()).select_from(Document))).scalar_one()
+        vector_stats = indexes.vector_store.get_stats()
         
         return StatsResponse(
             total_documents=total_docs,
             index_size=vector_stats.get('total_vectors', 0),
-            average_latency_ms=avg_latency,
-            last_indexed=None
+            average_latency_ms=request_metrics.average_latency_ms(),
+            last_indexed=None,
+            embedding_cache=embedding_batcher.generator.cache.get_stats(),
+            embedding_batcher=embedding_batcher.get_stats(),
+            answer_cache=answer_cache.get_stats() if answer_cache is not None else None,
+            query_log=query_log_writer.get_stats(),
+            keyword_index=indexes.keyword_index.get_stats(),
+            knowledge_graph=indexes.knowledge_graph.get_stats(),
+            attribute_index=indexes.attribute_index.get_stats(),
+            latency=request_metrics.summary()
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stats error: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request counters and per-stage latency histograms in the Prometheus text format."""
+    return PlainTextResponse(request_metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,151 @@
+"""In-process metrics primitives."""
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Request and stage latencies in milliseconds, roughly log-spaced
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+class Histogram:
+    """Fixed-bucket histogram of observed values (cumulative counts per upper bound)."""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value: float):
+        """Record a single value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """Estimate a percentile by interpolating linearly inside its bucket.
+
+        Bucket edges are narrowed to the smallest and largest observed values,
+        so the estimate never lies outside what was actually seen.
+        """
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                low = max(self.buckets[i - 1] if i > 0 else 0.0, self.min)
+                high = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return low + (high - low) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+    
+    def snapshot(self) -> dict:
+        """Bucket counts, total count, sum and mean."""
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else f"{bound:g}"] = cumulative
+        return {
+            'buckets': buckets,
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0
+        }
+
+class StageTimer:
+    """Wall-clock time spent in each stage of one request, in milliseconds."""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.info = {}  # Non-timing facts about the request, e.g. how much was re-ranked
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block, adding to the stage's total if it runs more than once."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started."""
+        return (time.perf_counter() - self.start) * 1000
+    
+    def as_dict(self) -> dict:
+        """Per-stage timings plus the total so far."""
+        return {**{name: round(ms, 3) for name, ms in self.stages.items()}, 'total': round(self.elapsed_ms(), 3)}
+
+class RequestMetrics:
+    """Latency histograms per endpoint and stage, fed from each request's StageTimer.
+    
+    Observations are made on the event loop thread, so the histograms are
+    updated without locks.
+    """
+    
+    def __init__(self, buckets: List[float] = None):
+        self.buckets = buckets or LATENCY_BUCKETS_MS
+        self.histograms = {}  # (endpoint, stage) -> Histogram of milliseconds
+        self.requests = {}  # endpoint -> request count
+    
+    def observe(self, endpoint: str, timer: StageTimer):
+        """Record one request's stage timings and total latency."""
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        for stage, ms in timer.as_dict().items():
+            histogram = self.histograms.get((endpoint, stage))
+            if histogram is None:
+                histogram = self.histograms[(endpoint, stage)] = Histogram(self.buckets)
+            histogram.observe(ms)
+    
+    def average_latency_ms(self) -> float:
+        """Mean total latency over every request observed."""
+        totals = [h for (_, stage), h in self.histograms.items() if stage == "total"]
+        count = sum(h.count for h in totals)
+        return sum(h.total for h in totals) / count if count else 0.0
+    
+    def summary(self) -> Dict[str, Dict[str, dict]]:
+        """p50/p95/p99 and mean of each stage, per endpoint, in milliseconds."""
+        summary = {}
+        for (endpoint, stage), histogram in sorted(self.histograms.items()):
+            summary.setdefault(endpoint, {})[stage] = {
+                'count': histogram.count,
+                'mean': round(histogram.total / histogram.count, 3) if histogram.count else 0.0,
+                'p50': round(histogram.percentile(50), 3),
+                'p95': round(histogram.percentile(95), 3),
+                'p99': round(histogram.percentile(99), 3)
+            }
+        return summary
+    
+    def prometheus(self, prefix: str = "rag") -> str:
+        """Prometheus text exposition of the request counters and stage histograms (in seconds)."""
+        lines = [
+            f"# HELP {prefix}_requests_total Requests served per endpoint.",
+            f"# TYPE {prefix}_requests_total counter"
+        ]
+        for endpoint, count in sorted(self.requests.items()):
+            lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}"}} {count}')
+        
+        name = f"{prefix}_stage_latency_seconds"
+        lines += [
+            f"# HELP {name} Time spent in each stage of a request.",
+            f"# TYPE {name} histogram"
+        ]
+        for (endpoint, stage), histogram in sorted(self.histograms.items()):
+            labels = f'endpoint="{endpoint}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + [float("inf")], histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound / 1000.0:g}"
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total / 1000.0:g}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
@@ -1,36 +1,112 @@
 """Pydantic models for API requests and responses."""
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict
 
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
+    mode: Optional[str] = None
+    graph: Optional[bool] = None
+    rerank: Optional[bool] = None
+    topics: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    doc_ids: Optional[List[int]] = None
 
 class SearchResult(BaseModel):
     id: int
     title: str
-    content: str
+    content: Optional[str] = None
     source_link: str
     similarity_score: float
+    rerank_score: Optional[float] = None
     snippet: str
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
     query: str
     total_results: int
+    timings: Optional[Dict[str, float]] = None
+    rerank: Optional[Dict] = None
 
 class AskRequest(BaseModel):
     question: str
     top_k: int = 3
+    mode: Optional[str] = None
+    graph: Optional[bool] = None
+    rerank: Optional[bool] = None
+    topics: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    doc_ids: Optional[List[int]] = None
 
 class AskResponse(BaseModel):
     answer: str
     supporting_documents: List[str]
     question: str
+    timings: Optional[Dict[str, float]] = None
+    rerank: Optional[Dict] = None
+    prompt_tokens: Optional[int] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = Field(5, ge=1, le=20)
+    include_content: bool = False
+    mode: Optional[str] = None
+    graph: Optional[bool] = None
+    rerank: Optional[bool] = None
+    topics: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    doc_ids: Optional[List[int]] = None
+
+class BatchSearchItem(BaseModel):
+    query: str
+    results: List[SearchResult] = []
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    items: List[BatchSearchItem]
+    timings: Optional[Dict[str, float]] = None
+
+class BatchAskRequest(BaseModel):
+    questions: List[str]
+    top_k: int = Field(3, ge=1, le=20)
+    mode: Optional[str] = None
+    graph: Optional[bool] = None
+    rerank: Optional[bool] = None
+    topics: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    doc_ids: Optional[List[int]] = None
+
+class BatchAskItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    supporting_documents: List[str] = []
+    prompt_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchAskResponse(BaseModel):
+    items: List[BatchAskItem]
+    timings: Optional[Dict[str, float]] = None
 
 class StatsResponse(BaseModel):
     total_documents: int
     index_size: int
     average_latency_ms: float
     last_indexed: Optional[str]
+    embedding_cache: Optional[Dict] = None
+    embedding_batcher: Optional[Dict] = None
+    answer_cache: Optional[Dict] = None
+    keyword_index: Optional[Dict] = None
+    knowledge_graph: Optional[Dict] = None
+    attribute_index: Optional[Dict] = None
+    latency: Optional[Dict] = None
+    query_log: Optional[Dict] = None
 
+class GraphNeighbor(BaseModel):
+    title: str
+    doc_id: Optional[int] = None
+    hops: int
+
+class GraphNeighborsResponse(BaseModel):
+    doc_id: int
+    title: str
+    neighbors: List[GraphNeighbor]
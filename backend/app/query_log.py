@@ -0,0 +1,121 @@
+"""Background, batched writer for the query_logs table."""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal, QueryLog
+
+class QueryLogWriter:
+    """Buffer query log records and bulk-insert them off the request path.
+    
+    Requests call log(), which only puts the record on a bounded queue; when
+    the queue is full (e.g. while the database is slow) the record is dropped
+    and counted, so logging never blocks a request. A background task writes a batch once batch_size
+    records are queued or flush_interval_ms has passed since the first one,
+    with one multi-row INSERT on a worker thread. stop() writes whatever is
+    still queued.
+    """
+    
+    def __init__(self, max_queue: int = None, batch_size: int = None, flush_interval_ms: float = None,
+                 session_factory=SessionLocal):
+        self.max_queue = max_queue or int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000"))
+        self.batch_size = batch_size or int(os.getenv("QUERY_LOG_BATCH_SIZE", "500"))
+        self.flush_interval = (flush_interval_ms if flush_interval_ms is not None
+                               else float(os.getenv("QUERY_LOG_FLUSH_MS", "1000"))) / 1000.0
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-log-writer")
+        self._queue = None
+        self._task = None
+        self._batch = []  # Records taken off the queue but not yet handed to the writer thread
+        
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+    
+    def start(self):
+        """Start the writer task on the running event loop."""
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def log(self, record: Dict):
+        """Queue a QueryLog row (as column values) without waiting; drop it if the queue is full."""
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def _collect(self):
+        """Wait for one record, then gather more until the batch is full or the interval expires."""
+        loop = asyncio.get_running_loop()
+        self._batch.append(await self._queue.get())
+        deadline = loop.time() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            if not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+    
+    def _write(self, batch: List[Dict]):
+        """Insert a batch of rows in one statement (runs on the worker thread)."""
+        db = self.session_factory()
+        try:
+            db.execute(insert(QueryLog), batch)
+            db.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            db.rollback()
+            self.failed += len(batch)
+            print(f"⚠️  Could not write {len(batch)} query log records: {e}")
+        finally:
+            db.close()
+    
+    async def _run(self):
+        """Writer loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._collect()
+            batch, self._batch = self._batch, []
+            await loop.run_in_executor(self._executor, self._write, batch)
+    
+    async def stop(self):
+        """Stop the writer task and write the records still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # A batch already handed to the writer thread finishes first (single worker)
+        batch, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        self._queue = None  # Bound to this event loop; start() makes a new one
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(batch), self.batch_size):
+            await loop.run_in_executor(self._executor, self._write, batch[start:start + self.batch_size])
+    
+    def get_stats(self) -> dict:
+        """Queue depth and write/drop counters for /stats."""
+        return {
+            'queued': (self._queue.qsize() if self._queue is not None else 0) + len(self._batch),
+            'max_queue': self.max_queue,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches
+        }
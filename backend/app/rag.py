@@ -1,30 +1,75 @@
 """RAG pipeline using LangChain."""
+import asyncio
 import os
-from typing import List, Dict
+import re
+from functools import partial
+from typing import List, Dict, AsyncIterator, Optional
 from dotenv import load_dotenv
-try:
-    from langchain_openai import ChatOpenAI
-    from langchain.prompts import PromptTemplate
-    from langchain.chains import LLMChain
-except ImportError:
-    # Fallback for older langchain versions
-    try:
-        from langchain.chat_models import ChatOpenAI
-        from langchain.prompts import PromptTemplate
-        from langchain.chains import LLMChain
-    except ImportError:
-        ChatOpenAI = None
-        PromptTemplate = None
-        LLMChain = None
+import numpy as np
+
+from app.chunking import count_tokens
+from app.context_packer import ContextPacker, llm_token_counter
 
 load_dotenv()
 
+_langchain_classes = None
+
+def _langchain():
+    """(ChatOpenAI, PromptTemplate, LLMChain), imported on first use since LangChain is slow to import."""
+    global _langchain_classes
+    if _langchain_classes is None:
+        try:
+            from langchain_openai import ChatOpenAI
+            from langchain.prompts import PromptTemplate
+            from langchain.chains import LLMChain
+        except ImportError:
+            # Fallback for older langchain versions
+            try:
+                from langchain.chat_models import ChatOpenAI
+                from langchain.prompts import PromptTemplate
+                from langchain.chains import LLMChain
+            except ImportError:
+                ChatOpenAI = None
+                PromptTemplate = None
+                LLMChain = None
+        _langchain_classes = (ChatOpenAI, PromptTemplate, LLMChain)
+    return _langchain_classes
+
+PROMPT_TEMPLATE = """You are a helpful AI assistant. Answer the question based on the provided context documents.
+
+Context:
+{context}
+
+Question: {question}
+
+Provide a clear, concise answer based on the context. If the context doesn't contain enough information, say so.
+
+Answer:"""
+
 class RAGPipeline:
-    """Retrieval-Augmented Generation pipeline."""
+    """Retrieval-Augmented Generation pipeline.
     
-    def __init__(self):
+    The prompt's context is packed by a ContextPacker into CONTEXT_TOKEN_BUDGET
+    tokens of the most relevant sentences; the LLM chain is built on first use
+    and reused. Callers passing a usage dict get the prompt's token counts.
+    The async methods pack the context and hash documents for the answer
+    cache on executor (the default one if None), as both scale with the
+    length of the documents.
+    """
+    
+    def __init__(self, llm=None, answer_cache=None, packer: ContextPacker = None, executor=None):
         api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and ChatOpenAI:
+        self.answer_cache = answer_cache
+        self.executor = executor
+        self._chain = None
+        self._flush_future = None
+        self._flush_again = False
+        ChatOpenAI = _langchain()[0] if api_key and llm is None else None
+        if llm is not None:
+            # Injected model (e.g. a LangChain fake LLM for offline tests)
+            self.llm = llm
+            self.enabled = True
+        elif api_key and ChatOpenAI:
             try:
                 self.llm = ChatOpenAI(
                     model_name=os.getenv("LLM_MODEL", "gpt-3.5-turbo"),
@@ -41,46 +86,169 @@ class RAGPipeline:
             self.enabled = False
             if not api_key:
                 print("Warning: OpenAI API key not found. RAG will return template responses.")
+        # Count with the LLM's own tokenizer when answers are generated
+        self.packer = packer or ContextPacker(token_counter=llm_token_counter() if self.enabled else count_tokens)
+    
+    def _build_context(self, question: str, context_docs: List[Dict], usage: Dict = None) -> str:
+        """Pack the question's most relevant sentences of the retrieved documents, recording token counts in usage."""
+        context, stats = self.packer.pack(question, context_docs)
+        if usage is not None:
+            usage.update(stats)
+            usage['prompt_tokens'] = self.packer.token_counter(PROMPT_TEMPLATE.format(context=context, question=question))
+        return context
+    
+    def _build_chain(self):
+        """Create the prompt template and LLM chain."""
+        _, PromptTemplate, LLMChain = _langchain()
+        prompt_template = PromptTemplate(
+            input_variables=["question", "context"],
+            template=PROMPT_TEMPLATE
+        )
+        return LLMChain(llm=self.llm, prompt=prompt_template)
+    
+    @property
+    def chain(self):
+        """The LLM chain, built once and shared by all requests."""
+        if self._chain is None:
+            self._chain = self._build_chain()
+        return self._chain
+    
+    async def _off_loop(self, fn, *args):
+        """Run a CPU-bound call on the executor instead of the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args))
     
-    def generate_answer(self, question: str, context_docs: List[Dict]) -> str:
+    def _cached_answer(self, question_embedding: Optional[np.ndarray], context_docs: List[Dict]) -> Optional[str]:
+        """Look up a cached answer for a similar question over the same documents."""
+        if self.answer_cache is None or question_embedding is None:
+            return None
+        return self.answer_cache.lookup(question_embedding, context_docs)
+    
+    def _remember(self, question: str, question_embedding: Optional[np.ndarray], context_docs: List[Dict], answer: str):
+        """Store an LLM answer in the cache (template fallbacks are never cached)."""
+        if self.answer_cache is None or question_embedding is None:
+            return
+        self.answer_cache.put(question, question_embedding, context_docs, answer)
+    
+    def generate_answer(self, question: str, context_docs: List[Dict],
+                        question_embedding: np.ndarray = None, usage: Dict = None) -> str:
         """Generate answer using retrieved context."""
         if not self.enabled:
             # Fallback template response
             return self._template_response(question, context_docs)
         
-        # Combine context from retrieved documents
-        context = "\n\n".join([
-            f"Document {i+1}: {doc.get('title', 'Unknown')}\n{doc.get('content', '')[:1000]}"
-            for i, doc in enumerate(context_docs)
-        ])
+        cached = self._cached_answer(question_embedding, context_docs)
+        if cached is not None:
+            return cached
         
-        # Create prompt template
-        prompt_template = PromptTemplate(
-            input_variables=["question", "context"],
-            template="""You are a helpful AI assistant. Answer the question based on the provided context documents.
-
-Context:
-{context}
-
-Question: {question}
-
-Provide a clear, concise answer based on the context. If the context doesn't contain enough information, say so.
-
-Answer:"""
-        )
+        context = self._build_context(question, context_docs, usage)
         
         try:
-            if LLMChain and self.llm:
+            if _langchain()[2] and self.llm:
                 # Generate answer
-                chain = LLMChain(llm=self.llm, prompt=prompt_template)
-                answer = chain.run(question=question, context=context)
-                return answer.strip()
+                answer = self.chain.run(question=question, context=context).strip()
+                self._remember(question, question_embedding, context_docs, answer)
+                if self.answer_cache is not None:
+                    self.answer_cache.flush()
+                return answer
             else:
                 return self._template_response(question, context_docs)
         except Exception as e:
             print(f"Error in RAG generation: {e}")
             return self._template_response(question, context_docs)
     
+    async def agenerate_answer(self, question: str, context_docs: List[Dict],
+                               question_embedding: np.ndarray = None, usage: Dict = None) -> str:
+        """Generate answer using retrieved context without blocking the event loop."""
+        if not self.enabled:
+            return self._template_response(question, context_docs)
+        
+        cached = await self._off_loop(self._cached_answer, question_embedding, context_docs)
+        if cached is not None:
+            return cached
+        
+        context = await self._off_loop(self._build_context, question, context_docs, usage)
+        
+        try:
+            if _langchain()[2] and self.llm:
+                answer = (await self.chain.arun(question=question, context=context)).strip()
+                await self._off_loop(self._remember, question, question_embedding, context_docs, answer)
+                self._schedule_flush()
+                return answer
+            else:
+                return self._template_response(question, context_docs)
+        except Exception as e:
+            print(f"Error in RAG generation: {e}")
+            return self._template_response(question, context_docs)
+    
+    def _schedule_flush(self):
+        """Persist new cache entries on a worker thread, off the request path.
+        
+        At most one flush runs at a time: answers cached while it runs are
+        written by a single follow-up flush instead of one flush per answer.
+        """
+        if self.answer_cache is None:
+            return
+        if self._flush_future is not None and not self._flush_future.done():
+            self._flush_again = True
+            return
+        self._flush_again = False
+        self._flush_future = asyncio.get_running_loop().run_in_executor(None, self.answer_cache.flush)
+        self._flush_future.add_done_callback(self._flush_done)
+    
+    def _flush_done(self, future):
+        """Report a failed flush and start the follow-up flush if answers arrived meanwhile."""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error flushing answer cache: {future.exception()}")
+        if self._flush_again:
+            self._schedule_flush()
+    
+    async def astream_answer(self, question: str, context_docs: List[Dict],
+                             question_embedding: np.ndarray = None, usage: Dict = None) -> AsyncIterator[str]:
+        """Stream answer tokens as they are generated.
+        
+        Closing the generator (e.g. when the client disconnects) closes the
+        upstream LLM stream, which cancels the completion request.
+        """
+        if not self.enabled or not self.llm:
+            async for token in self._astream_template(question, context_docs):
+                yield token
+            return
+        
+        cached = await self._off_loop(self._cached_answer, question_embedding, context_docs)
+        if cached is not None:
+            yield cached
+            return
+        
+        context = await self._off_loop(self._build_context, question, context_docs, usage)
+        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+        stream = self.llm.astream(prompt)
+        emitted = []
+        try:
+            async for chunk in stream:
+                # Chat models yield message chunks, completion models yield strings
+                token = getattr(chunk, "content", chunk)
+                if token:
+                    emitted.append(token)
+                    yield token
+            # Only complete answers are cached
+            await self._off_loop(self._remember, question, question_embedding, context_docs,
+                                 "".join(emitted).strip())
+            self._schedule_flush()
+        except Exception as e:
+            print(f"Error in RAG streaming: {e}")
+            if emitted:
+                raise
+            async for token in self._astream_template(question, context_docs):
+                yield token
+        finally:
+            await stream.aclose()
+    
+    async def _astream_template(self, question: str, context_docs: List[Dict]) -> AsyncIterator[str]:
+        """Stream the template response word by word."""
+        for token in re.findall(r"\S+\s*", self._template_response(question, context_docs)):
+            yield token
+            await asyncio.sleep(0)
+    
     def _template_response(self, question: str, context_docs: List[Dict]) -> str:
         """Fallback template response when LLM is not available."""
         if not context_docs:
@@ -0,0 +1,58 @@
+"""Cross-encoder re-ranking of retrieved documents under a latency budget."""
+import os
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+class CrossEncoderReranker:
+    """Re-score (query, document) pairs with a local cross-encoder.
+    
+    Retrieval over-fetches candidates; they are scored in batches in
+    retrieval order, and scoring stops once the request's deadline has
+    passed. Scored candidates are sorted by cross-encoder score and placed
+    ahead of the unscored remainder, which keeps its retrieval order.
+    """
+    
+    def __init__(self, model_name: str = None, batch_size: int = None, max_chars: int = None):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name or os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "8"))
+        self.max_chars = max_chars or int(os.getenv("RERANK_MAX_CHARS", "1000"))
+        self.model = CrossEncoder(self.model_name)
+        print(f"Using cross-encoder: {self.model_name}")
+    
+    def _passage(self, doc: Dict) -> str:
+        """Text scored against the query: title plus the matching chunk (or the start of the document)."""
+        text = doc.get("chunk") or doc.get("content") or doc.get("snippet") or ""
+        return f"{doc.get('title', '')}. {text[:self.max_chars]}"
+    
+    def rerank(self, query: str, docs: List[Dict], top_k: int, deadline: float = None) -> Tuple[List[Dict], Dict]:
+        """Return the top_k documents after re-ranking, plus what was scored.
+        
+        deadline is a time.perf_counter() value; no new batch is started after
+        it. Re-ranked documents get the cross-encoder score, squashed into
+        0-1 by a sigmoid, as `rerank_score`; `score` stays the retrieval score.
+        """
+        scores = []
+        for start in range(0, len(docs), self.batch_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            batch = docs[start:start + self.batch_size]
+            scores.extend(self.model.predict([(query, self._passage(doc)) for doc in batch],
+                                             batch_size=self.batch_size, show_progress_bar=False).tolist())
+        
+        scored = len(scores)
+        logits = np.asarray(scores, dtype='float64')
+        order = np.argsort(-logits, kind='stable').tolist()
+        probabilities = (1.0 / (1.0 + np.exp(-logits))).tolist()
+        reranked = []
+        for i in order:
+            docs[i]["rerank_score"] = probabilities[i]
+            reranked.append(docs[i])
+        reranked.extend(docs[scored:])
+        return reranked[:top_k], {
+            'candidates': len(docs),
+            'scored': scored,
+            'truncated': scored < len(docs)
+        }
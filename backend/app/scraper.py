@@ -1,16 +1,52 @@
 """Data ingestion from Wikipedia API."""
 import wikipedia
+import hashlib
 import json
 import os
-from typing import List, Dict
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Iterator, Optional
 from bs4 import BeautifulSoup
 import re
 
+class RateLimiter:
+    """Thread-safe limiter that spaces calls at least 1/rate seconds apart."""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the caller may make its next request."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
 class WikipediaScraper:
     """Scrape and clean Wikipedia articles."""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", max_content_length: int = None, workers: int = None,
+                 rate_limit: float = None, max_retries: int = None, backoff: float = None,
+                 checkpoint_path: str = None):
         self.data_dir = data_dir
+        # 0 keeps the full article; documents are chunked for embedding at ingestion
+        self.max_content_length = max_content_length if max_content_length is not None else int(os.getenv("SCRAPER_MAX_CONTENT_CHARS", "0"))
+        self.workers = workers or int(os.getenv("SCRAPER_WORKERS", "8"))
+        self.rate_limiter = RateLimiter(rate_limit if rate_limit is not None else float(os.getenv("SCRAPER_RATE_LIMIT", "10")))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("SCRAPER_MAX_RETRIES", "3"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("SCRAPER_BACKOFF", "0.5"))
+        # One JSON record per finished page, so an interrupted run can be resumed
+        # (default: one file per set of topics, see checkpoint_file)
+        self.checkpoint_path = checkpoint_path
+        self._checkpoint_lock = threading.Lock()
         os.makedirs(data_dir, exist_ok=True)
         wikipedia.set_lang("en")
     
@@ -24,6 +60,10 @@ class WikipediaScraper:
         text = re.sub(r'[^\w\s.,!?;:\-\'"]', '', text)
         return text.strip()
     
+    def truncate(self, content: str) -> str:
+        """Apply the configured content length limit."""
+        return content[:self.max_content_length] if self.max_content_length else content
+    
     def extract_links(self, page) -> List[str]:
         """Extract related Wikipedia links from page."""
         try:
@@ -32,64 +72,164 @@ class WikipediaScraper:
         except:
             return []
     
-    def scrape_topic(self, topic: str, max_pages: int = 50) -> List[Dict]:
-        """Scrape Wikipedia articles on a given topic."""
-        documents = []
-        
+    def _with_retries(self, fn, *args, **kwargs):
+        """Call fn with rate limiting, retrying transient errors with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return fn(*args, **kwargs)
+            except (wikipedia.exceptions.DisambiguationError, wikipedia.exceptions.PageError):
+                # Not transient, the caller decides what to do
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+    
+    def _build_document(self, page) -> Dict:
+        """Clean a page into a document record."""
+        return {
+            "title": page.title,
+            "content": self.truncate(self.clean_text(page.content)),
+            "summary": self.clean_text(page.summary),
+            "source_link": page.url,
+            "related_entities": self.extract_links(page)
+        }
+    
+    def fetch_page(self, title: str) -> Optional[Dict]:
+        """Fetch and clean one page, following the first option of disambiguation pages."""
         try:
-            # Search for the topic
-            search_results = wikipedia.search(topic, results=max_pages)
-            
-            for i, title in enumerate(search_results[:max_pages]):
-                try:
-                    page = wikipedia.page(title, auto_suggest=False)
-                    
-                    # Clean content
-                    content = self.clean_text(page.content)
-                    summary = self.clean_text(page.summary)
-                    
-                    # Extract related entities
-                    related_entities = self.extract_links(page)
-                    
-                    doc = {
-                        "id": i + 1,
-                        "title": page.title,
-                        "content": content[:5000],  # Limit content length
-                        "summary": summary,
-                        "source_link": page.url,
-                        "related_entities": related_entities
-                    }
-                    
-                    documents.append(doc)
-                    print(f"Scraped: {page.title}")
-                    
-                except wikipedia.exceptions.DisambiguationError as e:
-                    # Handle disambiguation pages
+            page = self._with_retries(wikipedia.page, title, auto_suggest=False)
+            return self._with_retries(self._build_document, page)
+        except wikipedia.exceptions.DisambiguationError as e:
+            if not e.options:
+                return None
+            page = self._with_retries(wikipedia.page, e.options[0], auto_suggest=False)
+            return self._with_retries(self._build_document, page)
+        except wikipedia.exceptions.PageError:
+            return None
+    
+    def checkpoint_file(self, topics: List[str], max_pages: int) -> str:
+        """Checkpoint file of a run over these topics, so runs over other topics don't resume from it."""
+        if self.checkpoint_path:
+            return self.checkpoint_path
+        key = hashlib.blake2b(json.dumps([topics, max_pages]).encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(self.data_dir, f"scrape_checkpoint_{key}.jsonl")
+    
+    def clear_checkpoint(self, topics: List[str], max_pages: int = 50):
+        """Delete the checkpoint of a run once its pages are safely ingested."""
+        path = self.checkpoint_file(topics, max_pages)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def load_checkpoint(self, path: str) -> Dict[str, Dict]:
+        """Finished records of an interrupted run, keyed by search-result title."""
+        records = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written line from a crash
+                    records[record["query_title"]] = record
+        # Failed pages are retried on the next run
+        return {title: record for title, record in records.items() if record["status"] != "failed"}
+    
+    def _write_checkpoint(self, path: str, record: Dict):
+        """Append one record to the checkpoint file."""
+        with self._checkpoint_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+    
+    def _search_titles(self, topics: List[str], max_pages: int) -> Dict[str, str]:
+        """Search each topic and merge the result titles, keeping order and dropping repeats.
+        
+        Maps each title to the first topic it was found under.
+        """
+        titles = {}
+        for topic in topics:
+            try:
+                for title in self._with_retries(wikipedia.search, topic, results=max_pages)[:max_pages]:
+                    titles.setdefault(title, topic)
+            except Exception as e:
+                print(f"Error in search for '{topic}': {e}")
+        return titles
+    
+    def iter_topics(self, topics: List[str], max_pages: int = 50, resume: bool = False) -> Iterator[Dict]:
+        """Scrape pages for several topics concurrently, yielding documents as they finish.
+        
+        Each document carries the topic it was found under as `topic`. Every
+        finished page is appended to the run's checkpoint file first. With
+        resume=True, pages already recorded there by an interrupted run over
+        the same topics are yielded from it without fetching; otherwise the
+        checkpoint is started over and every page is fetched fresh.
+        """
+        checkpoint = self.checkpoint_file(topics, max_pages)
+        if not resume and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        titles = self._search_titles(topics, max_pages)
+        done = self.load_checkpoint(checkpoint)
+        
+        pending = []
+        for title, topic in titles.items():
+            record = done.get(title)
+            if record is None:
+                pending.append(title)
+            elif record["status"] == "ok":
+                yield dict(record["doc"], topic=topic)
+        if len(pending) < len(titles):
+            print(f"Resuming: {len(titles) - len(pending)} of {len(titles)} pages already in checkpoint")
+        
+        # At most 2 * workers fetches in flight, so a slow consumer bounds memory
+        pending = iter(pending)
+        window = 2 * self.workers
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scraper") as pool:
+            futures = {}
+            for title in pending:
+                futures[pool.submit(self.fetch_page, title)] = title
+                if len(futures) >= window:
+                    break
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    title = futures.pop(future)
+                    next_title = next(pending, None)
+                    if next_title is not None:
+                        futures[pool.submit(self.fetch_page, next_title)] = next_title
                     try:
-                        page = wikipedia.page(e.options[0], auto_suggest=False)
-                        content = self.clean_text(page.content)
-                        summary = self.clean_text(page.summary)
-                        related_entities = self.extract_links(page)
-                        
-                        doc = {
-                            "id": i + 1,
-                            "title": page.title,
-                            "content": content[:5000],
-                            "summary": summary,
-                            "source_link": page.url,
-                            "related_entities": related_entities
-                        }
-                        documents.append(doc)
-                        print(f"Scraped (disambiguation): {page.title}")
-                    except:
+                        doc = future.result()
+                    except Exception as e:
+                        print(f"Error scraping {title}: {e}")
+                        self._write_checkpoint(checkpoint, {"query_title": title, "status": "failed", "error": str(e)})
                         continue
-                        
-                except Exception as e:
-                    print(f"Error scraping {title}: {e}")
-                    continue
                     
-        except Exception as e:
-            print(f"Error in search: {e}")
+                    if doc is None:
+                        self._write_checkpoint(checkpoint, {"query_title": title, "status": "missing"})
+                        continue
+                    doc["topic"] = titles[title]
+                    self._write_checkpoint(checkpoint, {"query_title": title, "status": "ok", "doc": doc})
+                    print(f"Scraped: {doc['title']}")
+                    yield doc
+    
+    def scrape_topics(self, topics: List[str], max_pages: int = 50, resume: bool = False) -> List[Dict]:
+        """Scrape Wikipedia articles for several topics."""
+        documents = []
+        seen = set()
+        for doc in self.iter_topics(topics, max_pages=max_pages, resume=resume):
+            # Different search results can resolve to the same page
+            if doc["title"] in seen:
+                continue
+            seen.add(doc["title"])
+            doc["id"] = len(documents) + 1
+            documents.append(doc)
+        self.clear_checkpoint(topics, max_pages)
+        return documents
+    
+    def scrape_topic(self, topic: str, max_pages: int = 50) -> List[Dict]:
+        """Scrape Wikipedia articles on a given topic."""
+        documents = self.scrape_topics([topic], max_pages=max_pages)
         
         # Save to JSON
         output_file = os.path.join(self.data_dir, f"{topic.replace(' ', '_')}_data.json")
@@ -98,4 +238,3 @@ class WikipediaScraper:
         
         print(f"\nScraped {len(documents)} documents. Saved to {output_file}")
         return documents
-
@@ -0,0 +1,313 @@
+"""Vector store partitioned across several FAISS indexes, searched in parallel."""
+import heapq
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+
+import faiss
+import numpy as np
+
+from app.attribute_index import IDFilter, _pack
+from app.vector_store import FAISSVectorStore, _save_json
+
+def _manifest_path(index_path: str) -> str:
+    return index_path.replace('.bin', '_shards.json')
+
+def saved_shards(index_path: str = "faiss_index.bin") -> int:
+    """Number of shards of the index saved at index_path (1 if unsharded), or 0 if there is none.
+    
+    When both layouts exist (the index was rebuilt with another shard
+    count), the newer one wins.
+    """
+    manifest_path = _manifest_path(index_path)
+    if os.path.exists(manifest_path):
+        if not os.path.exists(index_path) or os.path.getmtime(manifest_path) >= os.path.getmtime(index_path):
+            with open(manifest_path) as f:
+                return json.load(f)['num_shards']
+    return 1 if os.path.exists(index_path) else 0
+
+def create_vector_store(index_path: str = "faiss_index.bin", num_shards: int = None, **kwargs):
+    """FAISSVectorStore, or a ShardedVectorStore for more than one shard.
+    
+    Without num_shards, the layout of the index saved at index_path is used,
+    falling back to VECTOR_INDEX_SHARDS when nothing is saved yet.
+    """
+    if num_shards is None:
+        num_shards = saved_shards(index_path) or int(os.getenv("VECTOR_INDEX_SHARDS", "1"))
+    if num_shards > 1:
+        return ShardedVectorStore(num_shards, index_path=index_path, **kwargs)
+    return FAISSVectorStore(index_path=index_path, **kwargs)
+
+class _ShardedIndex:
+    """What callers read from a store's FAISS index (ntotal, is_trained, d), over all shards."""
+    
+    def __init__(self, indexes: List):
+        self._indexes = indexes
+    
+    @property
+    def ntotal(self) -> int:
+        return sum(index.ntotal for index in self._indexes)
+    
+    @property
+    def is_trained(self) -> bool:
+        return all(index.is_trained for index in self._indexes)
+    
+    @property
+    def d(self) -> int:
+        return self._indexes[0].d
+
+class ShardedVectorStore:
+    """FAISSVectorStore interface over num_shards independent stores.
+    
+    Documents are assigned to shard doc_id % num_shards, so all chunks of a
+    document live in one shard and per-document scores never need combining
+    across shards. Each shard is saved as its own index files (faiss_index_shard0.bin,
+    ...) next to a faiss_index_shards.json manifest, and can be memory-mapped
+    like an unsharded index. Searches run on every shard at once in a thread
+    pool (FAISS releases the GIL) and the per-shard top-k lists are merged
+    with a heap. IVF shards are all trained on the same sample, so they share
+    one coarse quantizer layout. A filtered search gives each shard the
+    filter restricted to that shard's vectors, so its selectivity (which
+    scales nprobe and picks exact over HNSW search) is the shard's own, and
+    shards with no selected vector are not searched.
+    """
+    
+    def __init__(self, num_shards: int = None, index_path: str = "faiss_index.bin", **kwargs):
+        self.num_shards = num_shards or int(os.getenv("VECTOR_INDEX_SHARDS", "2"))
+        self.index_path = index_path
+        self._shard_kwargs = kwargs
+        self.shards = self._new_shards()
+        self._pool = None
+        self._start_pool()
+        self._version = 0  # Bumped whenever vectors are added or removed
+        self._shard_bits = {}  # (shard, number of bits) -> (version, bitmap of the shard's live IDs)
+    
+    def _start_pool(self):
+        """Threads shared by all searches; more than one per shard so concurrent requests overlap."""
+        if self._pool is not None:
+            self._pool.shutdown()
+        threads = int(os.getenv("VECTOR_INDEX_SHARD_THREADS", "0")) or max(self.num_shards, os.cpu_count() or 1)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="vector-shard")
+    
+    def _shard_path(self, path: str, shard: int) -> str:
+        return path.replace('.bin', f'_shard{shard}.bin')
+    
+    def _new_shards(self) -> List[FAISSVectorStore]:
+        return [FAISSVectorStore(index_path=self._shard_path(self.index_path, shard), **self._shard_kwargs)
+                for shard in range(self.num_shards)]
+    
+    def _map(self, fn, items: Iterable) -> list:
+        """fn over items on the shard threads, results in order."""
+        return list(self._pool.map(fn, items))
+    
+    def _changed(self):
+        """Invalidate the cached shard bitmaps."""
+        self._version += 1
+    
+    def _shard_filter(self, shard: int, id_filter: IDFilter) -> IDFilter:
+        """id_filter restricted to the live vectors of one shard."""
+        num_bits = len(id_filter.bits) * 8
+        version = self._version
+        cached = self._shard_bits.get((shard, num_bits))
+        if cached is None or cached[0] != version:
+            keys = self.shards[shard].id_arrays()[0]
+            cached = self._shard_bits[(shard, num_bits)] = (version, _pack(keys[keys < num_bits], num_bits))
+        return IDFilter(id_filter.bits & cached[1], id_filter.doc_bits)
+    
+    def _route(self, doc_ids: List[int]) -> Dict[int, List[int]]:
+        """Positions of doc_ids grouped by the shard they belong to."""
+        rows = {}
+        for position, doc_id in enumerate(doc_ids):
+            rows.setdefault(doc_id % self.num_shards, []).append(position)
+        return rows
+    
+    @property
+    def index(self):
+        """Combined view of the shard indexes, or None until they are created."""
+        if any(shard.index is None for shard in self.shards):
+            return None
+        return _ShardedIndex([shard.index for shard in self.shards])
+    
+    @property
+    def dimension(self) -> int:
+        return self.shards[0].dimension
+    
+    @dimension.setter
+    def dimension(self, dimension: int):
+        for shard in self.shards:
+            shard.dimension = dimension
+    
+    @property
+    def index_type(self) -> str:
+        return self.shards[0].index_type
+    
+    @property
+    def chunked(self) -> bool:
+        return any(shard.chunked for shard in self.shards)
+    
+    @property
+    def read_only(self) -> bool:
+        return any(shard.read_only for shard in self.shards)
+    
+    def create_index(self, use_gpu: bool = False):
+        """Create a new FAISS index in every shard."""
+        for shard in self.shards:
+            shard.create_index(use_gpu)
+    
+    def reset(self):
+        """Drop every vector and ID mapping of every shard."""
+        for shard in self.shards:
+            shard.reset()
+        self._changed()
+    
+    def min_training_points(self) -> int:
+        """Smallest training set the configured index can be trained on (each shard trains on all of it)."""
+        return self.shards[0].min_training_points()
+    
+    def train(self, vectors: np.ndarray):
+        """Train every untrained shard on the same sample of (normalized) vectors."""
+        for shard in self.shards:
+            shard.train(vectors)
+    
+    def apply_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Set runtime search knobs on every shard."""
+        for shard in self.shards:
+            shard.apply_search_params(nprobe, ef_search)
+    
+    def _prepare(self, vectors: np.ndarray):
+        """Create and train the shard indexes before vectors are split between them."""
+        if self.index is None:
+            self.create_index()
+        if not self.index.is_trained:
+            # Shards only see their part of a batch; train them all on the whole of it
+            vectors = np.array(vectors, dtype='float32')
+            faiss.normalize_L2(vectors)
+            self.train(vectors)
+    
+    def _per_shard(self, method: str, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None):
+        """Call add_vectors or upsert on each shard with its rows; returns the keys in input order."""
+        self._prepare(vectors)
+        doc_ids = list(doc_ids)
+        keys = list(chunk_ids) if chunk_ids is not None else list(doc_ids)
+        vectors = np.asarray(vectors, dtype='float32')
+        
+        def run(item):
+            shard, rows = item
+            return getattr(self.shards[shard], method)(
+                vectors[rows], [doc_ids[row] for row in rows],
+                [keys[row] for row in rows] if chunk_ids is not None else None
+            )
+        
+        self._map(run, self._route(doc_ids).items())
+        self._changed()
+        return keys
+    
+    def add_vectors(self, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None):
+        """Add vectors to the shards of their documents (see FAISSVectorStore.add_vectors)."""
+        return self._per_shard("add_vectors", vectors, doc_ids, chunk_ids)
+    
+    def upsert(self, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None):
+        """Replace all vectors of the given documents with new ones."""
+        return self._per_shard("upsert", vectors, doc_ids, chunk_ids)
+    
+    def delete(self, doc_ids: Iterable[int], compact: bool = True) -> int:
+        """Remove documents from search results; returns the number of vectors deleted."""
+        doc_ids = list(doc_ids)
+        deleted = sum(self.shards[shard].delete([doc_ids[row] for row in rows], compact)
+                      for shard, rows in self._route(doc_ids).items())
+        self._changed()
+        return deleted
+    
+    def document_embedding_id(self, doc_id: int):
+        """FAISS ID of a document's first vector, or None if it is not indexed."""
+        return self.shards[doc_id % self.num_shards].document_embedding_id(doc_id)
+    
+    def maybe_compact(self):
+        """Compact the shards whose tombstones exceed compact_ratio."""
+        for shard in self.shards:
+            shard.maybe_compact()
+    
+    def compact(self) -> int:
+        """Physically remove tombstoned vectors from every shard; returns how many were removed."""
+        return sum(self._map(lambda shard: shard.compact(), self.shards))
+    
+    def id_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Live FAISS IDs (ascending) of all shards and the document ID of each, as aligned arrays."""
+        arrays = [shard.id_arrays() for shard in self.shards if shard.index is not None]
+        if not arrays:
+            return np.zeros(0, dtype='int64'), np.zeros(0, dtype='int64')
+        keys = np.concatenate([keys for keys, _ in arrays])
+        doc_ids = np.concatenate([doc_ids for _, doc_ids in arrays])
+        order = np.argsort(keys, kind='stable')
+        return keys[order], doc_ids[order]
+    
+    def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Search for similar vectors in every shard."""
+        hits = self._map(lambda shard: shard.search(query_vector, top_k), self.shards)
+        return heapq.nlargest(top_k, chain.from_iterable(hits), key=lambda hit: hit[1])
+    
+    def search_documents(self, query_vector: np.ndarray, top_k: int = 5, collapse: str = None,
+                         overfetch: int = None, id_filter=None) -> List[Tuple[int, float, int]]:
+        """Search chunk vectors of every shard and collapse hits to documents (see FAISSVectorStore)."""
+        return self.search_documents_batch(query_vector, top_k, collapse=collapse, overfetch=overfetch,
+                                           id_filter=id_filter)[0]
+    
+    def search_documents_batch(self, query_vectors: np.ndarray, top_k: int = 5, collapse: str = None,
+                               overfetch: int = None, id_filter=None) -> List[List[Tuple[int, float, int]]]:
+        """search_documents for several queries (one per row), each shard searched by one thread."""
+        def search_shard(item):
+            shard, store = item
+            shard_filter = None
+            if id_filter is not None:
+                shard_filter = self._shard_filter(shard, id_filter)
+                if not shard_filter.count:
+                    return [[] for _ in range(len(np.atleast_2d(query_vectors)))]
+            return store.search_documents_batch(query_vectors, top_k, collapse=collapse, overfetch=overfetch,
+                                                id_filter=shard_filter)
+        
+        per_shard = self._map(search_shard, enumerate(self.shards))
+        # A document's score is complete within its shard, so merging is a top-k over the shard lists
+        return [heapq.nlargest(top_k, chain.from_iterable(results), key=lambda hit: hit[1])
+                for results in zip(*per_shard)]
+    
+    def save(self, path: str = None):
+        """Save every shard, then the manifest that makes them the current index."""
+        path = path or self.index_path
+        if self.index is None:
+            return
+        self._map(lambda item: item[1].save(self._shard_path(path, item[0])), enumerate(self.shards))
+        FAISSVectorStore._write_atomic(_manifest_path(path),
+                                       lambda tmp: _save_json(tmp, {'num_shards': self.num_shards}))
+    
+    def load(self, path: str = None, mmap: bool = False):
+        """Load the shards listed in the manifest (memory-mapped read-only with mmap=True)."""
+        path = path or self.index_path
+        if not os.path.exists(_manifest_path(path)):
+            return False
+        with open(_manifest_path(path)) as f:
+            num_shards = json.load(f)['num_shards']
+        if num_shards != self.num_shards:
+            self.num_shards = num_shards
+            self._start_pool()
+        self.shards = self._new_shards()
+        self._map(lambda item: item[1].load(self._shard_path(path, item[0]), mmap=mmap), enumerate(self.shards))
+        self._changed()
+        return True
+    
+    def num_documents(self) -> int:
+        """Number of indexed documents."""
+        return sum(shard.num_documents() for shard in self.shards)
+    
+    def get_stats(self) -> dict:
+        """Get index statistics, summed over the shards."""
+        shard_stats = [shard.get_stats() for shard in self.shards]
+        stats = dict(shard_stats[0])
+        for key in ('total_vectors', 'tombstones', 'total_documents'):
+            stats[key] = sum(s[key] for s in shard_stats)
+        stats['chunked'] = self.chunked
+        stats['mmap'] = self.read_only
+        stats['shards'] = self.num_shards
+        stats['shard_vectors'] = [s['total_vectors'] for s in shard_stats]
+        return stats
@@ -1,102 +1,587 @@
 """FAISS vector store for semantic search."""
 import faiss
+import json
+import math
 import numpy as np
 import pickle
 import os
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
+
+# Supported index types (see _factory_string for the FAISS layout of each)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def _save_array(path: str, array: np.ndarray):
+    with open(path, 'wb') as f:
+        np.save(f, np.asarray(array))
+
+def _save_json(path: str, data: dict):
+    with open(path, 'w') as f:
+        json.dump(data, f)
 
 class FAISSVectorStore:
-    """FAISS-based vector store for efficient similarity search."""
+    """FAISS-based vector store for efficient similarity search.
+    
+    Vectors are stored under their own IDs (the chunk ID, or the document ID
+    for unchunked indexes), so documents can be upserted and deleted in
+    place. Deleted vectors are tombstoned and excluded from searches until
+    compact() removes them from the index.
+    
+    The ID mappings are saved as flat numpy arrays next to the index. With
+    load(mmap=True) both the index and the arrays are memory-mapped read-only,
+    so worker processes start without copying them and share the page cache;
+    the dict views are only built when the store is modified.
+    """
     
-    def __init__(self, dimension: int = 384, index_path: str = "faiss_index.bin"):
+    def __init__(self, dimension: int = 384, index_path: str = "faiss_index.bin",
+                 index_type: str = None, nlist: int = None, pq_m: int = None,
+                 hnsw_m: int = None, nprobe: int = None, ef_search: int = None,
+                 train_sample_size: int = None, compact_ratio: float = None):
         self.dimension = dimension
         self.index_path = index_path
         self.index = None
-        self.id_to_doc = {}  # Map FAISS ID to document ID
-        self.doc_to_id = {}  # Map document ID to FAISS ID
+        self._id_to_doc = {}  # Map FAISS ID to document ID (None until built from _id_arrays)
+        self._doc_to_ids = {}  # Map document ID to the FAISS IDs of its vectors (built lazily)
+        self._id_arrays = None  # (sorted FAISS IDs, their document IDs) as loaded from disk
+        self._num_documents = 0  # Document count saved with the arrays
+        self.read_only = False  # Index and arrays are memory-mapped
+        self.chunked = False  # FAISS IDs are chunk IDs rather than document IDs
+        self.tombstones = set()  # Deleted FAISS IDs still physically in the index
+        self._tombstone_selector = None
+        self.compact_ratio = compact_ratio if compact_ratio is not None else float(os.getenv("VECTOR_INDEX_COMPACT_RATIO", "0.2"))
         
+        # Build-time parameters (persisted with the index)
+        self.index_type = (index_type or os.getenv("VECTOR_INDEX_TYPE", "flat")).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{self.index_type}', expected one of {INDEX_TYPES}")
+        self.index_params = {
+            'nlist': nlist or int(os.getenv("VECTOR_INDEX_NLIST", "1024")),
+            'pq_m': pq_m or int(os.getenv("VECTOR_INDEX_PQ_M", "16")),
+            'hnsw_m': hnsw_m or int(os.getenv("VECTOR_INDEX_HNSW_M", "32")),
+        }
+        self.train_sample_size = train_sample_size or int(os.getenv("VECTOR_INDEX_TRAIN_SAMPLE", "100000"))
+        
+        # Runtime search parameters (not persisted, applied after create/load)
+        self.search_params = {
+            'nprobe': nprobe or int(os.getenv("VECTOR_INDEX_NPROBE", "16")),
+            'ef_search': ef_search or int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64")),
+        }
+    
+    @property
+    def id_to_doc(self) -> dict:
+        """Map FAISS ID to document ID."""
+        if self._id_to_doc is None:
+            keys, doc_ids = self._id_arrays
+            self._id_to_doc = dict(zip(keys.tolist(), doc_ids.tolist()))
+        return self._id_to_doc
+    
+    @property
+    def doc_to_ids(self) -> dict:
+        """Map document ID to the FAISS IDs of its vectors."""
+        if self._doc_to_ids is None:
+            self._doc_to_ids = {}
+            for key, doc_id in sorted(self.id_to_doc.items()):
+                self._doc_to_ids.setdefault(doc_id, []).append(key)
+        return self._doc_to_ids
+    
+    def id_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Live FAISS IDs (ascending) and the document ID of each, as aligned arrays."""
+        if self._id_to_doc is None:
+            return self._id_arrays
+        keys = np.fromiter(sorted(self._id_to_doc), dtype='int64', count=len(self._id_to_doc))
+        doc_ids = np.fromiter((self._id_to_doc[key] for key in keys.tolist()), dtype='int64', count=len(keys))
+        return keys, doc_ids
+    
+    def _docs_for(self, ids: np.ndarray) -> List[int]:
+        """Document IDs of FAISS IDs, without building the dicts when only the arrays are loaded."""
+        if self._id_to_doc is None:
+            keys, doc_ids = self._id_arrays
+            if not len(keys):
+                return ids.tolist()
+            positions = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+            return np.where(keys[positions] == ids, doc_ids[positions], ids).tolist()
+        return [self._id_to_doc.get(i, i) for i in ids.tolist()]
+    
+    def _check_writable(self):
+        """Memory-mapped indexes cannot be modified (FAISS aborts the process)."""
+        if self.read_only:
+            raise RuntimeError("Index is memory-mapped read-only; load it with mmap=False to modify it")
+    
+    def _mappings_changed(self):
+        """Drop the loaded arrays once the dicts have diverged from them."""
+        self._id_arrays = None
+    
+    def _factory_string(self) -> str:
+        """FAISS index_factory description for the configured index type."""
+        # IVF indexes store arbitrary IDs natively, the others need an ID map
+        if self.index_type == "ivf_flat":
+            return f"IVF{self.index_params['nlist']},Flat"
+        if self.index_type == "ivf_pq":
+            return f"IVF{self.index_params['nlist']},PQ{self.index_params['pq_m']}"
+        if self.index_type == "hnsw":
+            return f"IDMap2,HNSW{self.index_params['hnsw_m']}"
+        return "IDMap2,Flat"
+    
     def create_index(self, use_gpu: bool = False):
         """Create a new FAISS index."""
-        # Use IndexFlatL2 for exact search (can upgrade to IndexIVFFlat for speed)
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = faiss.index_factory(self.dimension, self._factory_string(), faiss.METRIC_L2)
+        self.read_only = False
+        self.tombstones = set()
+        self._tombstone_selector = None
+        self.apply_search_params()
         if use_gpu:
             res = faiss.StandardGpuResources()
             self.index = faiss.index_cpu_to_gpu(res, 0, self.index)
     
-    def add_vectors(self, vectors: np.ndarray, doc_ids: List[int]):
-        """Add vectors to the index."""
+    def reset(self):
+        """Drop every vector and ID mapping; the next add creates an empty index of the configured type."""
+        self.index = None
+        self._id_to_doc = {}
+        self._doc_to_ids = {}
+        self._id_arrays = None
+        self._num_documents = 0
+        self.read_only = False
+        self.chunked = False
+        self.tombstones = set()
+        self._tombstone_selector = None
+    
+    def min_training_points(self) -> int:
+        """Smallest training set the configured index can be trained on."""
+        if self.index_type == "ivf_pq":
+            # Each PQ sub-quantizer learns 256 centroids
+            return max(self.index_params['nlist'], 256)
+        if self.index_type == "ivf_flat":
+            return self.index_params['nlist']
+        return 0
+    
+    def train(self, vectors: np.ndarray):
+        """Train the index on a random sample of (normalized) vectors."""
+        if self.index is None:
+            self.create_index()
+        if self.index.is_trained:
+            return
+        
+        if len(vectors) < self.min_training_points():
+            print(f"⚠️  {len(vectors)} vectors are too few to train a '{self.index_type}' index "
+                  f"(need {self.min_training_points()}), falling back to flat index")
+            self.index_type = "flat"
+            self.create_index()
+            return
+        
+        if len(vectors) > self.train_sample_size:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), self.train_sample_size, replace=False)]
+        else:
+            sample = vectors
+        print(f"Training '{self.index_type}' index on {len(sample)} vectors...")
+        self.index.train(np.ascontiguousarray(sample, dtype='float32'))
+    
+    def apply_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Set runtime search knobs (nprobe for IVF, efSearch for HNSW)."""
+        if nprobe is not None:
+            self.search_params['nprobe'] = nprobe
+        if ef_search is not None:
+            self.search_params['ef_search'] = ef_search
+        if self.index is None:
+            return
+        
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(self.index).nprobe = self.search_params['nprobe']
+        elif self.index_type == "hnsw":
+            faiss.downcast_index(faiss.downcast_index(self.index).index).hnsw.efSearch = self.search_params['ef_search']
+    
+    def _search_parameters(self, id_filter=None):
+        """Per-query FAISS parameters that skip tombstoned IDs and, with id_filter, unselected ones.
+        
+        Returns None when every vector may match.
+        """
+        selector = None
+        if self.tombstones:
+            if self._tombstone_selector is None:
+                deleted = faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype='int64', count=len(self.tombstones)))
+                self._tombstone_selector = (deleted, faiss.IDSelectorNot(deleted))
+            selector = self._tombstone_selector[1]
+        nprobe = self.search_params['nprobe']
+        if id_filter is not None:
+            selected = id_filter.selector()
+            selector = selected if selector is None else faiss.IDSelectorAnd(selected, selector)
+            # Selected vectors are spread over all inverted lists; probe proportionally more of them
+            selectivity = max(id_filter.count, 1) / max(self.index.ntotal, 1)
+            nprobe = min(self.index_params['nlist'], math.ceil(nprobe / min(selectivity, 1.0)))
+        if selector is None:
+            return None
+        # Passing parameters overrides the index's own knobs, so repeat them here
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.search_params['ef_search'])
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        params.referenced_objects = [selector]  # Parameters do not keep their selector alive
+        return params
+    
+    def _live(self, keys: np.ndarray) -> np.ndarray:
+        """The given FAISS IDs that are indexed here and not deleted."""
+        if self._id_to_doc is None:
+            live_keys = self._id_arrays[0]
+            if not len(live_keys):
+                return keys[:0]
+            positions = np.minimum(np.searchsorted(live_keys, keys), len(live_keys) - 1)
+            return keys[live_keys[positions] == keys]
+        return keys[np.fromiter((key in self._id_to_doc for key in keys.tolist()), dtype=bool, count=len(keys))]
+    
+    def _search_subset(self, query_vector: np.ndarray, k: int, keys: np.ndarray):
+        """Exact k-NN over the given IDs' stored vectors, in the same (distances, indices) form as a search."""
+        keys = self._live(keys)
+        distances = np.full((len(query_vector), k), np.finfo('float32').max, dtype='float32')
+        indices = np.full((len(query_vector), k), -1, dtype='int64')
+        if not len(keys):
+            return distances, indices
+        # Squared L2 distance between normalized vectors
+        scores = 2.0 - 2.0 * (query_vector @ self.index.reconstruct_batch(keys).T)
+        n = min(k, len(keys))
+        if n < len(keys):
+            top = np.argpartition(scores, n - 1, axis=1)[:, :n]
+        else:
+            top = np.tile(np.arange(n), (len(scores), 1))
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        distances[:, :n] = np.take_along_axis(scores, top, axis=1)
+        indices[:, :n] = keys[top]
+        return distances, indices
+    
+    def _search_index(self, query_vector: np.ndarray, k: int, id_filter=None):
+        """Normalize the queries (one per row) and run a k-NN search over live (and selected) vectors."""
+        query_vector = query_vector.reshape(-1, self.index.d).astype('float32')
+        faiss.normalize_L2(query_vector)
+        if (id_filter is not None and self.index_type == "hnsw"
+                and id_filter.count <= int(os.getenv("FILTER_EXACT_MAX", "20000"))):
+            # The graph walk finds few matches for selective filters; scoring them directly is exact and cheap
+            return self._search_subset(query_vector, k, id_filter.keys())
+        params = self._search_parameters(id_filter)
+        if params is None:
+            return self.index.search(query_vector, k)
+        return self.index.search(query_vector, k, params=params)
+    
+    def add_vectors(self, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None):
+        """Add vectors to the index (one per document, or one per chunk when chunk_ids is given).
+        
+        Vectors are stored under their chunk ID, or their document ID when
+        chunk_ids is not given; IDs that are already indexed are rejected
+        (use upsert to replace a document).
+        """
+        self._check_writable()
+        keys = self._check_batch(vectors, doc_ids, chunk_ids)
         if self.index is None:
             self.create_index()
+        if self.tombstones.intersection(keys):
+            # A deleted copy of a reused ID is still in the index, drop it first
+            self.compact()
         
         # Normalize vectors for cosine similarity
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
         faiss.normalize_L2(vectors)
         
-        start_id = self.index.ntotal
-        self.index.add(vectors.astype('float32'))
+        if not self.index.is_trained:
+            self.train(vectors)
+        
+        self.index.add_with_ids(vectors, np.asarray(keys, dtype='int64'))
         
         # Map FAISS IDs to document IDs
-        for i, doc_id in enumerate(doc_ids):
-            faiss_id = start_id + i
-            self.id_to_doc[faiss_id] = doc_id
-            self.doc_to_id[doc_id] = faiss_id
+        if chunk_ids is not None:
+            self.chunked = True
+        id_to_doc = self.id_to_doc
+        doc_to_ids = self.doc_to_ids
+        for key, doc_id in zip(keys, doc_ids):
+            id_to_doc[key] = doc_id
+            doc_to_ids.setdefault(doc_id, []).append(key)
+        self._mappings_changed()
+        return keys
+    
+    def _check_batch(self, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None,
+                     replacing: Iterable[int] = ()) -> List[int]:
+        """Validate vectors and their IDs before anything is modified; returns the vector IDs.
+        
+        IDs may already be indexed only for documents in replacing.
+        """
+        keys = list(chunk_ids) if chunk_ids is not None else list(doc_ids)
+        dimension = self.index.d if self.index is not None else self.dimension
+        shape = np.shape(vectors)
+        if len(shape) != 2 or shape[0] != len(keys) or len(doc_ids) != len(keys) or shape[1] != dimension:
+            raise ValueError(f"Expected {len(keys)} vectors of dimension {dimension} for {len(doc_ids)} "
+                             f"document IDs and {len(keys)} vector IDs, got shape {shape}")
+        replacing = set(replacing)
+        id_to_doc = self.id_to_doc
+        if len(set(keys)) != len(keys) or any(key in id_to_doc and id_to_doc[key] not in replacing for key in keys):
+            raise ValueError("Vector IDs must be unique and not already indexed; use upsert to replace documents")
+        return keys
+    
+    def upsert(self, vectors: np.ndarray, doc_ids: List[int], chunk_ids: List[int] = None):
+        """Replace all vectors of the given documents with new ones.
+        
+        The batch is validated first, so a bad batch leaves the old vectors in place.
+        """
+        self._check_writable()
+        self._check_batch(vectors, doc_ids, chunk_ids, replacing=doc_ids)
+        self.delete(set(doc_ids), compact=False)
+        keys = self.add_vectors(vectors, doc_ids, chunk_ids)
+        self.maybe_compact()
+        return keys
+    
+    def delete(self, doc_ids: Iterable[int], compact: bool = True) -> int:
+        """Remove documents from search results; returns the number of vectors deleted.
+        
+        The vectors are tombstoned rather than removed, so deleting is cheap;
+        they are dropped from the index once tombstones exceed compact_ratio
+        of it (or on an explicit compact()).
+        """
+        self._check_writable()
+        deleted = 0
+        for doc_id in doc_ids:
+            for key in self.doc_to_ids.pop(doc_id, []):
+                del self.id_to_doc[key]
+                self.tombstones.add(key)
+                deleted += 1
+        if deleted:
+            self._mappings_changed()
+            self._tombstone_selector = None
+            if compact:
+                self.maybe_compact()
+        return deleted
+    
+    def document_embedding_id(self, doc_id: int):
+        """FAISS ID of a document's first vector, or None if it is not indexed."""
+        keys = self.doc_to_ids.get(doc_id)
+        return keys[0] if keys else None
+    
+    def maybe_compact(self):
+        """Compact once tombstones make up more than compact_ratio of the index."""
+        if self.index is not None and self.tombstones and len(self.tombstones) > self.compact_ratio * self.index.ntotal:
+            self.compact()
+    
+    def compact(self) -> int:
+        """Physically remove tombstoned vectors; returns how many were removed."""
+        if self.index is None or not self.tombstones:
+            return 0
+        self._check_writable()
+        removed = len(self.tombstones)
+        if self.index_type == "hnsw":
+            # HNSW graphs cannot drop nodes, so rebuild from the live vectors
+            keys = np.fromiter(self.id_to_doc.keys(), dtype='int64', count=len(self.id_to_doc))
+            vectors = self.index.reconstruct_batch(keys) if len(keys) else None
+            self.create_index()
+            if vectors is not None:
+                self.index.add_with_ids(vectors, keys)
+        else:
+            self.index.remove_ids(faiss.IDSelectorBatch(np.fromiter(self.tombstones, dtype='int64', count=removed)))
+        self.tombstones = set()
+        self._tombstone_selector = None
+        print(f"🧹 Compacted {removed} deleted vectors out of the index")
+        return removed
     
     def search(self, query_vector: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
         """Search for similar vectors."""
         if self.index is None or self.index.ntotal == 0:
             return []
         
-        # Normalize query vector
-        query_vector = query_vector.reshape(1, -1).astype('float32')
-        faiss.normalize_L2(query_vector)
-        
-        # Search
-        distances, indices = self.index.search(query_vector, top_k)
+        distances, indices = self._search_index(query_vector, top_k)
         
         # Convert FAISS IDs to document IDs
         results = []
-        for idx, dist in zip(indices[0], distances[0]):
+        for idx, doc_id, dist in zip(indices[0], self._docs_for(indices[0]), distances[0]):
             if idx != -1:  # Valid result
-                doc_id = self.id_to_doc.get(idx, idx)
                 similarity = 1 - dist  # Convert L2 distance to similarity
                 results.append((doc_id, float(similarity)))
         
         return results
     
+    def search_documents(self, query_vector: np.ndarray, top_k: int = 5, collapse: str = None,
+                         overfetch: int = None, id_filter=None) -> List[Tuple[int, float, int]]:
+        """Search chunk vectors and collapse hits to documents.
+        
+        Fetches top_k * overfetch vectors, groups them by document and scores
+        each document by its best chunk ('max') or the sum of its chunk
+        similarities ('sum'). Returns (doc_id, score, best_chunk_id) tuples;
+        best_chunk_id is None for indexes built without chunks. With an
+        id_filter (see AttributeIndex) only its vectors are searched.
+        """
+        return self.search_documents_batch(query_vector, top_k, collapse=collapse, overfetch=overfetch,
+                                           id_filter=id_filter)[0]
+    
+    def search_documents_batch(self, query_vectors: np.ndarray, top_k: int = 5, collapse: str = None,
+                               overfetch: int = None, id_filter=None) -> List[List[Tuple[int, float, int]]]:
+        """search_documents for several queries (one per row) in a single FAISS search call."""
+        collapse = collapse or os.getenv("CHUNK_COLLAPSE", "max")
+        overfetch = overfetch or int(os.getenv("CHUNK_OVERFETCH", "4"))
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in range(len(np.atleast_2d(query_vectors)))]
+        
+        fetch_k = top_k * overfetch if self.chunked else top_k
+        distances, indices = self._search_index(query_vectors, fetch_k, id_filter)
+        return [self._collapse(row_indices, row_distances, top_k, collapse)
+                for row_indices, row_distances in zip(indices, distances)]
+    
+    def _collapse(self, indices: np.ndarray, distances: np.ndarray, top_k: int,
+                  collapse: str) -> List[Tuple[int, float, int]]:
+        """Group one query's vector hits by document."""
+        scores = {}
+        best = {}  # doc_id -> (similarity, chunk_id) of its best chunk
+        for idx, doc_id, dist in zip(indices, self._docs_for(indices), distances):
+            if idx == -1:
+                continue
+            similarity = float(1 - dist)
+            if collapse == "sum":
+                scores[doc_id] = scores.get(doc_id, 0.0) + similarity
+            else:
+                scores[doc_id] = max(scores.get(doc_id, similarity), similarity)
+            if doc_id not in best or similarity > best[doc_id][0]:
+                best[doc_id] = (similarity, int(idx) if self.chunked else None)
+        
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(doc_id, score, best[doc_id][1]) for doc_id, score in ranked]
+    
+    @staticmethod
+    def _sidecar(path: str, suffix: str) -> str:
+        """Path of a file stored next to the index."""
+        return path.replace('.bin', suffix)
+    
+    @staticmethod
+    def _write_atomic(path: str, write):
+        """Write through a temporary file so processes mapping the old file keep a consistent view."""
+        tmp_path = path + ".tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    
     def save(self, path: str = None):
-        """Save index and mappings to disk."""
+        """Save the index, the ID arrays and metadata to disk."""
         path = path or self.index_path
-        if self.index is not None:
-            faiss.write_index(self.index, path)
-            # Save mappings
-            mapping_path = path.replace('.bin', '_mappings.pkl')
-            with open(mapping_path, 'wb') as f:
-                pickle.dump({
-                    'id_to_doc': self.id_to_doc,
-                    'doc_to_id': self.doc_to_id,
-                    'dimension': self.dimension
-                }, f)
-    
-    def load(self, path: str = None):
-        """Load index and mappings from disk."""
+        if self.index is None:
+            return
+        self._write_atomic(path, lambda tmp: faiss.write_index(self.index, tmp))
+        
+        # ID mappings as two aligned arrays sorted by FAISS ID, so they can be
+        # memory-mapped and searched without unpickling
+        keys, doc_ids = self.id_arrays()
+        tombstones = np.fromiter(sorted(self.tombstones), dtype='int64', count=len(self.tombstones))
+        for suffix, array in (('_ids.npy', keys), ('_docs.npy', doc_ids), ('_tombstones.npy', tombstones)):
+            self._write_atomic(self._sidecar(path, suffix), lambda tmp: _save_array(tmp, array))
+        
+        meta = {
+            'dimension': self.dimension,
+            'index_type': self.index_type,
+            'index_params': self.index_params,
+            'chunked': self.chunked,
+            'num_documents': self.num_documents()
+        }
+        self._write_atomic(self._sidecar(path, '_meta.json'), lambda tmp: _save_json(tmp, meta))
+        
+        # Superseded by the arrays above
+        if os.path.exists(self._sidecar(path, '_mappings.pkl')):
+            os.remove(self._sidecar(path, '_mappings.pkl'))
+    
+    def load(self, path: str = None, mmap: bool = False):
+        """Load index and mappings from disk.
+        
+        With mmap=True the index data and ID arrays are memory-mapped
+        read-only instead of read into memory; the store then cannot be
+        modified.
+        """
         path = path or self.index_path
-        if os.path.exists(path):
-            self.index = faiss.read_index(path)
-            # Load mappings
-            mapping_path = path.replace('.bin', '_mappings.pkl')
-            if os.path.exists(mapping_path):
-                with open(mapping_path, 'rb') as f:
-                    mappings = pickle.load(f)
-                    self.id_to_doc = mappings.get('id_to_doc', {})
-                    self.doc_to_id = mappings.get('doc_to_id', {})
-                    self.dimension = mappings.get('dimension', 384)
-            return True
-        return False
+        if not os.path.exists(path):
+            return False
+        
+        meta_path = self._sidecar(path, '_meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dimension = meta['dimension']
+            self.index_type = meta['index_type']
+            self.index_params.update(meta['index_params'])
+            self.chunked = meta['chunked']
+            self._num_documents = meta['num_documents']
+            
+            flags = 0
+            if mmap:
+                # IVF lists and flat codes have separate mapping paths in FAISS
+                if self.index_type in ("ivf_flat", "ivf_pq"):
+                    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                else:
+                    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+            self.index = faiss.read_index(path, flags)
+            mmap_mode = 'r' if mmap else None
+            self._id_arrays = (np.load(self._sidecar(path, '_ids.npy'), mmap_mode=mmap_mode),
+                               np.load(self._sidecar(path, '_docs.npy'), mmap_mode=mmap_mode))
+            self._id_to_doc = None
+            self._doc_to_ids = None
+            self.tombstones = set(np.load(self._sidecar(path, '_tombstones.npy')).tolist())
+            self.read_only = mmap
+        else:
+            self._load_pickled(path)
+        self._tombstone_selector = None
+        self.apply_search_params()
+        return True
+    
+    def _load_pickled(self, path: str):
+        """Load an index saved with pickled mapping dicts (older versions)."""
+        self.index = faiss.read_index(path)
+        self._id_to_doc = {}
+        self._doc_to_ids = None
+        self._id_arrays = None
+        self.read_only = False
+        mapping_path = self._sidecar(path, '_mappings.pkl')
+        if os.path.exists(mapping_path):
+            with open(mapping_path, 'rb') as f:
+                mappings = pickle.load(f)
+                self.dimension = mappings.get('dimension', 384)
+                # Indexes saved before index types existed are always flat
+                self.index_type = mappings.get('index_type', 'flat')
+                self.index_params.update(mappings.get('index_params', {}))
+                if mappings.get('id_mapped'):
+                    self._id_to_doc = mappings.get('id_to_doc', {})
+                    self.tombstones = mappings.get('tombstones', set())
+                    self.chunked = mappings.get('chunked', False)
+                else:
+                    self._migrate_positional(mappings.get('id_to_doc', {}), mappings.get('id_to_chunk', {}))
+    
+    def _migrate_positional(self, id_to_doc: dict, id_to_chunk: dict):
+        """Re-key an index saved with positional IDs by chunk (or document) ID."""
+        print("Migrating positional index to ID-mapped storage...")
+        old_index = self.index
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            faiss.extract_index_ivf(old_index).make_direct_map()
+        vectors = old_index.reconstruct_n(0, old_index.ntotal)
+        keys = [id_to_chunk.get(i, id_to_doc.get(i, i)) for i in range(old_index.ntotal)]
+        self.chunked = bool(id_to_chunk)
+        
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            # Keep the trained quantizer, re-add the vectors under their new IDs
+            faiss.extract_index_ivf(old_index).make_direct_map(False)
+            old_index.reset()
+            self.index = old_index
+        else:
+            self.create_index()
+        self.index.add_with_ids(vectors, np.asarray(keys, dtype='int64'))
+        self._id_to_doc = {key: id_to_doc.get(i, i) for i, key in enumerate(keys)}
+        self.tombstones = set()
+    
+    def num_documents(self) -> int:
+        """Number of indexed documents."""
+        if self._id_to_doc is None:
+            return self._num_documents
+        return len(self.doc_to_ids)
     
     def get_stats(self) -> dict:
         """Get index statistics."""
-        return {
-            'total_vectors': self.index.ntotal if self.index else 0,
+        stats = {
+            'total_vectors': self.index.ntotal - len(self.tombstones) if self.index else 0,
+            'tombstones': len(self.tombstones),
             'dimension': self.dimension,
-            'index_type': type(self.index).__name__ if self.index else None
+            'index_type': type(self.index).__name__ if self.index else None,
+            'index_kind': self.index_type,
+            'total_documents': self.num_documents(),
+            'chunked': self.chunked,
+            'mmap': self.read_only
         }
-
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            stats['nprobe'] = self.search_params['nprobe']
+        elif self.index_type == "hnsw":
+            stats['ef_search'] = self.search_params['ef_search']
+        return stats
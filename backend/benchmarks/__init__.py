@@ -0,0 +1 @@
+# Benchmark and evaluation tools
@@ -0,0 +1,74 @@
+"""Compare N queries sent as individual /search calls with the same queries sent to /search/batch.
+
+Run against a live server:
+    python -m uvicorn app.main:app --port 8000
+    python -m benchmarks.batch_search --url http://localhost:8000 --num-queries 1000 --batch-size 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.load_test import SEARCH_QUERIES
+
+def make_queries(num_queries: int):
+    """Distinct queries, so the embedding cache does not hide the model cost."""
+    return [f"{SEARCH_QUERIES[i % len(SEARCH_QUERIES)]} {i}" for i in range(num_queries)]
+
+async def run_single(client: httpx.AsyncClient, queries, top_k: int, concurrency: int) -> float:
+    """Seconds to send every query as its own /search request, concurrency at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(query: str):
+        async with semaphore:
+            response = await client.get("/search", params={"query": query, "top_k": top_k, "include_content": False})
+            response.raise_for_status()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[one(query) for query in queries])
+    return time.perf_counter() - start
+
+async def run_batched(client: httpx.AsyncClient, queries, top_k: int, batch_size: int) -> float:
+    """Seconds to send the queries to /search/batch, batch_size per request, one request at a time."""
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        response = await client.post("/search/batch", json={"queries": queries[i:i + batch_size], "top_k": top_k})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+async def main_async(args):
+    queries = make_queries(args.num_queries)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120.0) as client:
+        # Different suffixes per run so neither run hits embeddings cached by the other
+        single_s = await run_single(client, [q + " single" for q in queries], args.top_k, args.concurrency)
+        batched_s = await run_batched(client, [q + " batched" for q in queries], args.top_k, args.batch_size)
+    return {
+        'num_queries': args.num_queries,
+        'single_qps': args.num_queries / single_s,
+        'batched_qps': args.num_queries / batched_s,
+        'speedup': single_s / batched_s
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight /search requests")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    summary = asyncio.run(main_async(args))
+    print(f"\n{summary['num_queries']} queries\n")
+    print(f"{'/search':<14} {summary['single_qps']:>10.1f} queries/s")
+    print(f"{'/search/batch':<14} {summary['batched_qps']:>10.1f} queries/s ({summary['speedup']:.1f}x)")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
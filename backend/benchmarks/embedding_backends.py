@@ -0,0 +1,127 @@
+"""Compare local embedding backends (PyTorch, ONNX Runtime, ONNX int8).
+
+For each backend, reports:
+
+  - single: p50/p99 latency of embedding one query, as /search does
+  - batch: texts per second embedding the corpus batch-size at a time
+  - cosine: mean and minimum cosine similarity to the PyTorch embeddings
+
+Exits non-zero if a backend's minimum cosine is below its tolerance (the
+check tests/test_embedding_backends.py runs on a few texts). Texts are
+stored chunks from the database when there are any, synthetic sentences
+otherwise.
+Needs the ONNX extras: pip install -r requirements-onnx.txt.
+
+Usage (from the backend directory):
+    python -m benchmarks.embedding_backends --backends torch,onnx,onnx-int8 --threads 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+from app.embeddings import EmbeddingGenerator
+from benchmarks.load_test import percentile
+
+# Lowest acceptable cosine similarity to the PyTorch embedding of the same text
+TOLERANCE = {"torch": 1.0 - 1e-6, "onnx": 0.9999, "onnx-int8": 0.98}
+
+WORDS = ("graph neural network search index vector query document retrieval language model embedding "
+         "physics chemistry history economics protein energy quantum climate market theory data").split()
+
+def load_texts(num_texts: int, seed: int = 0) -> List[str]:
+    """Stored chunk texts, or synthetic sentences when the database has none."""
+    try:
+        from sqlalchemy import select
+        from app.database import SessionLocal, DocumentChunk
+        db = SessionLocal()
+        try:
+            texts = db.scalars(select(DocumentChunk.text).limit(num_texts)).all()
+        finally:
+            db.close()
+    except Exception:
+        texts = []
+    if len(texts) >= num_texts:
+        return list(texts)
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(8, 120))) for _ in range(num_texts)]
+
+def run(backend: str, texts: List[str], queries: List[str], batch_size: int, threads: int) -> Dict:
+    """Latency, throughput and the embeddings of one backend."""
+    start = time.perf_counter()
+    generator = EmbeddingGenerator(cache=EmbeddingCache(max_size=0), backend=backend, threads=threads)
+    load_s = time.perf_counter() - start
+    generator.generate_embeddings_batch(queries[:5], batch_size=1, show_progress_bar=False)  # Warm up
+    
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        generator.generate_embeddings_batch([query], batch_size=1, show_progress_bar=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    embeddings = generator.generate_embeddings_batch(texts, batch_size=batch_size, show_progress_bar=False)
+    batch_s = time.perf_counter() - start
+    return {
+        'backend': backend,
+        'load_s': load_s,
+        'single_p50_ms': percentile(latencies, 50),
+        'single_p99_ms': percentile(latencies, 99),
+        'batch_texts_per_s': len(texts) / batch_s,
+        'embeddings': np.asarray(embeddings, dtype='float32')
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--num-texts", type=int, default=1000)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: EMBEDDING_THREADS)")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    # Measure the local model even where an OpenAI key is configured
+    os.environ.pop("OPENAI_API_KEY", None)
+    texts = load_texts(args.num_texts)
+    queries = [" ".join(text.split()[:8]) for text in texts[:args.num_queries]]
+    backends = [b for b in args.backends.split(",") if b]
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # Reference for the cosine check
+    
+    results = []
+    reference = None
+    failed = []
+    print(f"\n{len(texts)} texts, {len(queries)} queries, batch size {args.batch_size}\n")
+    print(f"{'backend':<10} {'load s':>7} {'p50 ms':>8} {'p99 ms':>8} {'texts/s':>9} {'mean cos':>9} {'min cos':>8}")
+    for backend in backends:
+        row = run(backend, texts, queries, args.batch_size, args.threads)
+        embeddings = row.pop('embeddings')
+        if reference is None:
+            reference = embeddings
+        cosine = (embeddings * reference).sum(axis=1) / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+        row['mean_cosine'] = float(cosine.mean())
+        row['min_cosine'] = float(cosine.min())
+        row['tolerance'] = TOLERANCE[backend]
+        if row['min_cosine'] < row['tolerance']:
+            failed.append(backend)
+        results.append(row)
+        print(f"{backend:<10} {row['load_s']:>7.1f} {row['single_p50_ms']:>8.2f} {row['single_p99_ms']:>8.2f} "
+              f"{row['batch_texts_per_s']:>9.0f} {row['mean_cosine']:>9.5f} {row['min_cosine']:>8.5f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        print(f"❌ Below cosine tolerance: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ All backends within cosine tolerance of PyTorch")
+
+if __name__ == "__main__":
+    main()
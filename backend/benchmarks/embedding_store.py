@@ -0,0 +1,106 @@
+"""Measure rebuilding an index from the embedding store instead of the model.
+
+Writes num-vectors synthetic embeddings to a fresh EmbeddingStore (in
+flush-every batches, as ingestion does), then, per storage dtype, reports:
+
+  - write: time to buffer and flush all vectors, and the bytes on disk
+  - lookup: time to fetch every vector back by text, batch-size at a time
+  - rebuild: lookups plus adding the vectors to a new index of index-type
+  - cosine: the lowest cosine similarity between a stored and original vector
+
+Usage (from the backend directory):
+    python -m benchmarks.embedding_store --num-vectors 1000000 --index-type hnsw
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.embedding_store import EmbeddingStore
+from app.vector_store import FAISSVectorStore
+from benchmarks.index_recall import synthetic_vectors
+
+MODEL_NAME = "benchmark-model"
+
+def text_of(i: int) -> str:
+    """Text that vector i stands for."""
+    return f"chunk {i}: synthetic benchmark text"
+
+def run(dtype: str, vectors: np.ndarray, batch_size: int, flush_every: int, index_type: str) -> dict:
+    """Write, read back and index the vectors with one storage dtype."""
+    path = tempfile.mkdtemp(prefix="embedding_store_")
+    try:
+        store = EmbeddingStore(path, dtype)
+        unflushed = 0
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), batch_size):
+            batch = vectors[offset:offset + batch_size]
+            store.put_many(MODEL_NAME, [text_of(i) for i in range(offset, offset + len(batch))], batch)
+            unflushed += len(batch)
+            if unflushed >= flush_every:
+                store.flush()
+                unflushed = 0
+        store.flush()
+        write_s = time.perf_counter() - start
+        stats = store.get_stats()
+        
+        store = EmbeddingStore(path, dtype)
+        vector_store = FAISSVectorStore(dimension=vectors.shape[1], index_type=index_type)
+        lookup_s = 0.0
+        worst = 1.0
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), batch_size):
+            texts = [text_of(i) for i in range(offset, min(offset + batch_size, len(vectors)))]
+            lookup_start = time.perf_counter()
+            found = np.stack(store.get_many(MODEL_NAME, texts))
+            lookup_s += time.perf_counter() - lookup_start
+            original = vectors[offset:offset + len(texts)]
+            cosine = (found * original).sum(axis=1) / (np.linalg.norm(found, axis=1) * np.linalg.norm(original, axis=1))
+            worst = min(worst, float(cosine.min()))
+            keys = list(range(offset, offset + len(texts)))
+            vector_store.add_vectors(found, keys, keys)
+        rebuild_s = time.perf_counter() - start
+        return {
+            'dtype': dtype,
+            'write_s': write_s,
+            'segments': stats['segments'],
+            'bytes_per_vector': stats['bytes'] / len(vectors),
+            'lookup_s': lookup_s,
+            'lookups_per_s': len(vectors) / lookup_s,
+            'rebuild_s': rebuild_s,
+            'min_cosine': worst
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--flush-every", type=int, default=50000)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--dtypes", default="float16,int8")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    vectors = synthetic_vectors(args.num_vectors, args.dimension)
+    print(f"\n{len(vectors)} vectors of dimension {args.dimension}, rebuilding a {args.index_type} index\n")
+    print(f"{'dtype':<8} {'write s':>8} {'segs':>5} {'bytes/vec':>10} {'lookup s':>9} {'lookups/s':>10} "
+          f"{'rebuild s':>10} {'min cos':>8}")
+    results = []
+    for dtype in [d for d in args.dtypes.split(",") if d]:
+        row = run(dtype, vectors, args.batch_size, args.flush_every, args.index_type)
+        results.append(row)
+        print(f"{dtype:<8} {row['write_s']:>8.1f} {row['segments']:>5} {row['bytes_per_vector']:>10.1f} "
+              f"{row['lookup_s']:>9.1f} {row['lookups_per_s']:>10.0f} {row['rebuild_s']:>10.1f} {row['min_cosine']:>8.4f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Deterministic stand-in for EmbeddingGenerator, for offline benchmarks."""
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+
+class HashingEmbedder:
+    """Bag-of-words feature hashing into a fixed number of dimensions.
+    
+    Each token is hashed (CRC32, so the same on every run and machine) to a
+    signed dimension and weighted by 1 + log(tf); the vector is L2-normalized.
+    Texts sharing words get similar vectors, so retrieval quality is
+    measurable, and no model or network is needed. Has the same interface as
+    EmbeddingGenerator.
+    """
+    
+    def __init__(self, dimension: int = 384, cache: EmbeddingCache = None):
+        self.dimension = dimension
+        self.model_name = f"hashing-{dimension}"
+        self.cache = cache if cache is not None else EmbeddingCache(max_size=0)
+        self._slots = {}  # token -> (dimension, sign)
+    
+    def _slot(self, token: str):
+        slot = self._slots.get(token)
+        if slot is None:
+            digest = zlib.crc32(token.encode("utf-8"))
+            slot = self._slots[token] = (digest % self.dimension, 1.0 if digest & 0x80000000 else -1.0)
+        return slot
+    
+    def _embed(self, text: str) -> np.ndarray:
+        counts = {}
+        for token in re.findall(r"\w+", text.lower()):
+            counts[token] = counts.get(token, 0) + 1
+        vector = np.zeros(self.dimension, dtype='float32')
+        for token, count in counts.items():
+            dim, sign = self._slot(token)
+            vector[dim] += sign * (1.0 + np.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def generate_embedding(self, text: str) -> np.ndarray:
+        return self._embed(text)
+    
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32,
+                                  show_progress_bar: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+        return np.stack([self._embed(text) for text in texts])
+    
+    def generate_query_embeddings(self, texts: List[str], check_cache: bool = True) -> List[np.ndarray]:
+        return [self._embed(text) for text in texts]
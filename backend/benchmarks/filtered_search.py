@@ -0,0 +1,131 @@
+"""Compare filtered search through an ID selector with over-fetching and filtering afterwards.
+
+Builds a chunked index of synthetic vectors, gives a random fraction of the
+documents a topic and, for each selectivity, reports per index type:
+
+  - unfiltered: latency of the plain search
+  - selector: latency and recall@k of search_documents with the topic's IDFilter
+  - post-filter: the old approach, fetching overfetch * k documents and
+    keeping those with the topic; `filled` is the share of the k slots filled
+
+Recall is measured against exact search over the selected vectors.
+
+Usage (from the backend directory):
+    python -m benchmarks.filtered_search --num-vectors 200000 --selectivity 0.5,0.1,0.01,0.001
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from app.attribute_index import AttributeIndex
+from app.vector_store import FAISSVectorStore
+from benchmarks.index_recall import synthetic_vectors, sample_queries
+from benchmarks.load_test import percentile
+
+def exact_filtered(vectors: np.ndarray, doc_ids: np.ndarray, selected: np.ndarray, queries: np.ndarray,
+                   k: int) -> List[set]:
+    """Top k selected documents (by best chunk) of each query by brute force."""
+    keys = np.flatnonzero(selected)
+    scores = queries @ vectors[keys].T
+    truth = []
+    for row in scores:
+        best = {}
+        for doc_id, score in zip(doc_ids[keys].tolist(), row.tolist()):
+            if score > best.get(doc_id, -np.inf):
+                best[doc_id] = score
+        truth.append(set(sorted(best, key=best.get, reverse=True)[:k]))
+    return truth
+
+def timed(search, queries: np.ndarray):
+    """Results and per-query latencies (ms) of a search function."""
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query.copy()))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+def evaluate(store: FAISSVectorStore, vectors: np.ndarray, doc_ids: np.ndarray, queries: np.ndarray,
+             selectivities: List[float], k: int, overfetch: int, seed: int) -> List[Dict]:
+    """One row per selectivity for an index."""
+    rng = np.random.default_rng(seed)
+    num_docs = int(doc_ids.max()) + 1
+    keys = np.arange(len(vectors), dtype='int64')
+    _, unfiltered_ms = timed(lambda q: store.search_documents(q, k), queries)
+    
+    rows = []
+    for selectivity in selectivities:
+        in_topic = rng.random(num_docs) < selectivity
+        attributes = AttributeIndex()
+        attributes.build(((doc_id, "in" if in_topic[doc_id] else "out", None) for doc_id in range(num_docs)),
+                         keys, doc_ids)
+        id_filter = attributes.filter(topics=["in"])
+        truth = exact_filtered(vectors, doc_ids, in_topic[doc_ids], queries, k)
+        
+        selected, selector_ms = timed(lambda q: store.search_documents(q, k, id_filter=id_filter), queries)
+        fetched, post_ms = timed(lambda q: store.search_documents(q, k * overfetch), queries)
+        post = [[hit for hit in hits if in_topic[hit[0]]][:k] for hits in fetched]
+        
+        def recall(results):
+            return float(np.mean([len({doc_id for doc_id, _, _ in hits} & expected) / max(len(expected), 1)
+                                  for hits, expected in zip(results, truth)]))
+        
+        rows.append({
+            'selectivity': selectivity,
+            'selected_vectors': id_filter.count,
+            'unfiltered_p50_ms': percentile(unfiltered_ms, 50),
+            'selector_p50_ms': percentile(selector_ms, 50),
+            'selector_recall': recall(selected),
+            'post_filter_p50_ms': percentile(post_ms, 50),
+            'post_filter_recall': recall(post),
+            'post_filter_filled': float(np.mean([len(hits) / float(k) for hits in post]))
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100000)
+    parser.add_argument("--chunks-per-doc", type=int, default=4)
+    parser.add_argument("--dimension", type=int, default=128)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--selectivity", default="0.5,0.1,0.01,0.001",
+                        help="Fractions of documents matching the filter, comma-separated")
+    parser.add_argument("--overfetch", type=int, default=10, help="Post-filter fetches this many times k documents")
+    parser.add_argument("--index-types", default="flat,hnsw,ivf_flat")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    vectors = synthetic_vectors(args.num_vectors, args.dimension)
+    faiss.normalize_L2(vectors)
+    queries = sample_queries(vectors, args.num_queries)
+    faiss.normalize_L2(queries)
+    doc_ids = np.arange(len(vectors), dtype='int64') // args.chunks_per_doc
+    selectivities = [float(s) for s in args.selectivity.split(",") if s]
+    
+    results = {}
+    print(f"\n{len(vectors)} vectors, {int(doc_ids.max()) + 1} documents, k={args.k}\n")
+    print(f"{'index':<9} {'select':>7} {'plain ms':>9} {'filter ms':>10} {'recall':>7} "
+          f"{'post ms':>8} {'recall':>7} {'filled':>7}")
+    for index_type in [t for t in args.index_types.split(",") if t]:
+        nlist = max(16, int(np.sqrt(len(vectors))))
+        store = FAISSVectorStore(dimension=args.dimension, index_type=index_type, nlist=nlist)
+        store.add_vectors(vectors.copy(), doc_ids.tolist(), list(range(len(vectors))))
+        results[index_type] = evaluate(store, vectors, doc_ids, queries, selectivities, args.k, args.overfetch,
+                                       seed=0)
+        for row in results[index_type]:
+            print(f"{index_type:<9} {row['selectivity']:>7.3f} {row['unfiltered_p50_ms']:>9.3f} "
+                  f"{row['selector_p50_ms']:>10.3f} {row['selector_recall']:>7.3f} {row['post_filter_p50_ms']:>8.3f} "
+                  f"{row['post_filter_recall']:>7.3f} {row['post_filter_filled']:>7.2f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
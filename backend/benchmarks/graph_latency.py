@@ -0,0 +1,81 @@
+"""Measure knowledge-graph build time and per-query traversal latency.
+
+Uses the saved graph if one exists, otherwise a synthetic corpus where each
+document links to a few popular and a few rare entities (like Wikipedia).
+
+Usage (from the backend directory):
+    python -m benchmarks.graph_latency --num-docs 200000 --links 10
+    python -m benchmarks.graph_latency --graph-path knowledge_graph.npz
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.graph import KnowledgeGraph
+from benchmarks.load_test import percentile
+
+def synthetic_graph(num_docs: int, links: int, seed: int = 0) -> KnowledgeGraph:
+    """Graph over num_docs documents with Zipf-distributed entity links."""
+    rng = np.random.default_rng(seed)
+    targets = np.minimum(rng.zipf(1.3, (num_docs, links)), num_docs * 2) - 1
+    rows = ((doc_id, f"Page {doc_id}", [f"Page {t}" for t in targets[doc_id]]) for doc_id in range(num_docs))
+    graph = KnowledgeGraph()
+    start = time.perf_counter()
+    graph.build(rows)
+    print(f"Built graph in {time.perf_counter() - start:.2f}s")
+    return graph
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph-path", help="Saved graph to benchmark (default: synthetic)")
+    parser.add_argument("--num-docs", type=int, default=100000)
+    parser.add_argument("--links", type=int, default=10)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--hits", type=int, default=10, help="Retrieval hits re-ranked per query")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    if args.graph_path:
+        graph = KnowledgeGraph(args.graph_path)
+        if not graph.load():
+            parser.error(f"No graph at {args.graph_path}")
+    else:
+        graph = synthetic_graph(args.num_docs, args.links)
+    
+    rng = np.random.default_rng(1)
+    doc_ids = np.array(sorted(graph.doc_to_node), dtype='int64')
+    neighbor_ms = []
+    rerank_ms = []
+    for _ in range(args.num_queries):
+        hits = rng.choice(doc_ids, min(args.hits, len(doc_ids)), replace=False)
+        results = [(int(doc_id), 1.0 - 0.05 * rank, None) for rank, doc_id in enumerate(hits)]
+        
+        start = time.perf_counter()
+        graph.neighbors(int(hits[0]), hops=2, limit=50)
+        neighbor_ms.append((time.perf_counter() - start) * 1000)
+        
+        start = time.perf_counter()
+        graph.rerank(results, len(results))
+        rerank_ms.append((time.perf_counter() - start) * 1000)
+    
+    summary = {
+        'nodes': graph.num_nodes,
+        'edges': graph.num_edges,
+        'neighbors_p50_ms': percentile(neighbor_ms, 50),
+        'neighbors_p95_ms': percentile(neighbor_ms, 95),
+        'rerank_p50_ms': percentile(rerank_ms, 50),
+        'rerank_p95_ms': percentile(rerank_ms, 95)
+    }
+    print(f"\n{summary['nodes']} nodes, {summary['edges']} edges, {args.hits} hits per query\n")
+    print(f"{'operation':<16} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'neighbors (2)':<16} {summary['neighbors_p50_ms']:>8.3f} {summary['neighbors_p95_ms']:>8.3f}")
+    print(f"{'ppr rerank':<16} {summary['rerank_p50_ms']:>8.3f} {summary['rerank_p95_ms']:>8.3f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare dense, BM25 and hybrid retrieval on known-item queries (recall@k, latency).
+
+Queries are built from sampled chunks of the ingested corpus: 'exact' queries
+are the chunk's rarest terms (names, acronyms, rare entities) and 'natural'
+queries are the opening words of the chunk. A query is a hit when the chunk's
+document is in the top k.
+
+Usage (from the backend directory, after ingestion):
+    python -m benchmarks.hybrid_search --num-queries 500 --k 5
+"""
+import argparse
+import json
+import random
+import time
+from typing import List, Dict
+
+from sqlalchemy import select
+
+from app.database import SessionLocal, Document, DocumentChunk
+from app.embeddings import EmbeddingGenerator
+from app.vector_store import FAISSVectorStore
+from app.bm25 import BM25Index, tokenize
+from app.hybrid import fuse_rankings
+from benchmarks.load_test import percentile
+
+def sample_chunks(num_chunks: int, seed: int = 0) -> List[Dict]:
+    """Random indexed chunks with their document IDs and titles."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(DocumentChunk.document_id, DocumentChunk.text, Document.title)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .where(DocumentChunk.embedding_id.is_not(None))
+        ).all()
+    finally:
+        db.close()
+    rng = random.Random(seed)
+    picks = rng.sample(rows, min(num_chunks, len(rows)))
+    return [{'doc_id': row.document_id, 'text': row.text, 'title': row.title} for row in picks]
+
+def make_queries(chunks: List[Dict], keyword_index: BM25Index, num_terms: int = 2,
+                 num_words: int = 12) -> Dict[str, List[Dict]]:
+    """Exact-term and natural-language queries, each labelled with its target document."""
+    exact = []
+    natural = []
+    for chunk in chunks:
+        terms = sorted(set(tokenize(chunk['text'])), key=lambda term: len(keyword_index.postings.get(term, ())))
+        if terms:
+            exact.append({'query': " ".join(terms[:num_terms]), 'doc_id': chunk['doc_id']})
+        natural.append({'query': " ".join(chunk['text'].split()[:num_words]), 'doc_id': chunk['doc_id']})
+    return {'exact': exact, 'natural': natural}
+
+def evaluate(queries: List[Dict], embeddings, vector_store: FAISSVectorStore, keyword_index: BM25Index,
+             k: int, depth: int) -> List[Dict]:
+    """Recall@k and search latency of each retrieval mode over one query set."""
+    modes = {
+        'dense': lambda q, e: vector_store.search_documents(e, k),
+        'bm25': lambda q, e: keyword_index.search_documents(q, k),
+        'hybrid_rrf': lambda q, e: fuse_rankings(vector_store.search_documents(e, depth),
+                                                 keyword_index.search_documents(q, depth), k, method="rrf"),
+        'hybrid_weighted': lambda q, e: fuse_rankings(vector_store.search_documents(e, depth),
+                                                      keyword_index.search_documents(q, depth), k, method="weighted"),
+    }
+    rows = []
+    for mode, search in modes.items():
+        hits = 0
+        latencies = []
+        for query, embedding in zip(queries, embeddings):
+            start = time.perf_counter()
+            results = search(query['query'], embedding.copy())
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += any(doc_id == query['doc_id'] for doc_id, _, _ in results)
+        rows.append({
+            'mode': mode,
+            'recall_at_k': hits / float(len(queries)) if queries else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95)
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-path", default="faiss_index.bin")
+    parser.add_argument("--bm25-path", default="bm25_index.npz")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=20, help="Candidates per retriever before fusion")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    vector_store = FAISSVectorStore(index_path=args.index_path)
+    keyword_index = BM25Index(index_path=args.bm25_path)
+    if not vector_store.load() or not keyword_index.load():
+        parser.error("Run ingestion first: both the FAISS and the BM25 index are required")
+    embedding_gen = EmbeddingGenerator()
+    
+    query_sets = make_queries(sample_chunks(args.num_queries), keyword_index)
+    results = {}
+    print(f"\n{len(keyword_index)} chunks, k={args.k}, fusion depth={args.depth}\n")
+    print(f"{'queries':<8} {'mode':<16} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, queries in query_sets.items():
+        embeddings = embedding_gen.generate_embeddings_batch([q['query'] for q in queries], show_progress_bar=False)
+        results[name] = evaluate(queries, embeddings, vector_store, keyword_index, args.k, args.depth)
+        for row in results[name]:
+            print(f"{name:<8} {row['mode']:<16} {row['recall_at_k']:>9.4f} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
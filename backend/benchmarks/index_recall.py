@@ -0,0 +1,130 @@
+"""Compare ANN index types against the exact flat index (recall@k, latency, memory).
+
+Usage (from the backend directory):
+    python -m benchmarks.index_recall --num-vectors 200000 --k 10
+    python -m benchmarks.index_recall --index-path faiss_index.bin --nprobe 4,16,64
+"""
+import argparse
+import json
+import time
+from typing import List, Dict, Tuple
+
+import faiss
+import numpy as np
+
+from app.vector_store import FAISSVectorStore
+
+def synthetic_vectors(num_vectors: int, dimension: int, num_clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered gaussian vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dimension)).astype('float32')
+    assignments = rng.integers(0, num_clusters, num_vectors)
+    vectors = centers[assignments] + 0.5 * rng.standard_normal((num_vectors, dimension)).astype('float32')
+    return vectors
+
+def vectors_from_index(path: str) -> np.ndarray:
+    """Reconstruct the stored vectors of an existing flat index."""
+    index = faiss.read_index(path)
+    return index.reconstruct_n(0, index.ntotal)
+
+def sample_queries(vectors: np.ndarray, num_queries: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus vectors, so queries have near (but not exact) neighbours."""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), num_queries, replace=False)]
+    return picks + 0.1 * rng.standard_normal(picks.shape).astype('float32')
+
+def build_store(index_type: str, vectors: np.ndarray, **params) -> Tuple[FAISSVectorStore, float]:
+    """Build (and train) a store of the given type, returning it with build seconds."""
+    store = FAISSVectorStore(dimension=vectors.shape[1], index_type=index_type, **params)
+    start = time.perf_counter()
+    store.add_vectors(vectors.copy(), list(range(len(vectors))))
+    return store, time.perf_counter() - start
+
+def run_queries(store: FAISSVectorStore, queries: np.ndarray, k: int) -> Tuple[List[List[int]], float]:
+    """Run queries one at a time (like the API does), returning ids and mean latency in ms."""
+    ids = []
+    start = time.perf_counter()
+    for query in queries:
+        ids.append([doc_id for doc_id, _ in store.search(query.copy(), top_k=k)])
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall_at_k(truth: List[List[int]], found: List[List[int]], k: int) -> float:
+    """Fraction of the exact top-k neighbours that the ANN index returned."""
+    hits = sum(len(set(t[:k]) & set(f[:k])) for t, f in zip(truth, found))
+    return hits / float(k * len(truth))
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, k: int, index_types: List[str],
+              nprobes: List[int], ef_searches: List[int], nlist: int = None,
+              pq_m: int = None, hnsw_m: int = None) -> List[Dict]:
+    """Benchmark each index type and search knob against the flat baseline."""
+    flat, flat_build = build_store("flat", vectors)
+    truth, flat_latency = run_queries(flat, queries, k)
+    rows = [{
+        'index_type': 'flat', 'param': None, 'recall_at_k': 1.0, 'latency_ms': flat_latency,
+        'build_s': flat_build, 'index_bytes': int(faiss.serialize_index(flat.index).nbytes)
+    }]
+
+    for index_type in index_types:
+        store, build_s = build_store(index_type, vectors, nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m)
+        index_bytes = int(faiss.serialize_index(store.index).nbytes)
+        if store.index_type in ("ivf_flat", "ivf_pq"):
+            knobs = [('nprobe', value) for value in nprobes]
+        elif store.index_type == "hnsw":
+            knobs = [('ef_search', value) for value in ef_searches]
+        else:
+            knobs = [(None, None)]
+
+        for knob, value in knobs:
+            if knob:
+                store.apply_search_params(**{knob: value})
+            found, latency = run_queries(store, queries, k)
+            rows.append({
+                'index_type': store.index_type,
+                'param': f"{knob}={value}" if knob else None,
+                'recall_at_k': recall_at_k(truth, found, k),
+                'latency_ms': latency,
+                'build_s': build_s,
+                'index_bytes': index_bytes
+            })
+    return rows
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-path", help="Existing flat index to take vectors from (default: synthetic)")
+    parser.add_argument("--num-vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--pq-m", type=int, default=None)
+    parser.add_argument("--hnsw-m", type=int, default=None)
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,64,256")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.index_path:
+        vectors = vectors_from_index(args.index_path)
+    else:
+        vectors = synthetic_vectors(args.num_vectors, args.dimension)
+    queries = sample_queries(vectors, min(args.num_queries, len(vectors)))
+
+    rows = benchmark(vectors, queries, args.k, args.types.split(","), _int_list(args.nprobe),
+                     _int_list(args.ef_search), nlist=args.nlist, pq_m=args.pq_m, hnsw_m=args.hnsw_m)
+
+    print(f"\n{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+    print(f"{'index':<10} {'param':<14} {'recall@k':>9} {'ms/query':>9} {'build s':>8} {'size MB':>8}")
+    for row in rows:
+        print(f"{row['index_type']:<10} {row['param'] or '-':<14} {row['recall_at_k']:>9.4f} "
+              f"{row['latency_ms']:>9.3f} {row['build_s']:>8.2f} {row['index_bytes'] / 1e6:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
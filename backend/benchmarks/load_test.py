@@ -0,0 +1,97 @@
+"""Measure /search throughput with and without concurrent /ask calls in flight.
+
+Run against a live server:
+    python -m uvicorn app.main:app --port 8000
+    python -m benchmarks.load_test --url http://localhost:8000 --duration 20
+
+If the request path blocks the event loop, /search throughput collapses while
+/ask calls wait on the LLM; with a fully async path it stays roughly flat.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Dict
+
+import httpx
+
+SEARCH_QUERIES = [
+    "machine learning", "neural networks", "computer vision", "reinforcement learning",
+    "natural language processing", "robotics", "expert systems", "deep learning"
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+async def search_worker(client: httpx.AsyncClient, deadline: float, latencies: List[float], errors: List[int]):
+    """Issue /search requests back to back until the deadline."""
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get("/search", params={"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)], "top_k": 5})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            errors.append(1)
+        i += 1
+
+async def ask_worker(client: httpx.AsyncClient, deadline: float, completed: List[float]):
+    """Issue /ask requests back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post("/ask", json={"question": "What is artificial intelligence?", "top_k": 3})
+            response.raise_for_status()
+            completed.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            pass
+
+async def run_phase(url: str, duration: float, search_concurrency: int, ask_concurrency: int) -> Dict:
+    """Drive /search (and optionally /ask) for duration seconds and summarize /search."""
+    latencies, errors, ask_latencies = [], [], []
+    limits = httpx.Limits(max_connections=search_concurrency + ask_concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120.0, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+        workers = [search_worker(client, deadline, latencies, errors) for _ in range(search_concurrency)]
+        workers += [ask_worker(client, deadline, ask_latencies) for _ in range(ask_concurrency)]
+        await asyncio.gather(*workers)
+    return {
+        'ask_in_flight': ask_concurrency,
+        'search_qps': len(latencies) / duration,
+        'search_p50_ms': percentile(latencies, 50),
+        'search_p99_ms': percentile(latencies, 99),
+        'search_errors': len(errors),
+        'asks_completed': len(ask_latencies),
+        'ask_p50_ms': percentile(ask_latencies, 50)
+    }
+
+async def main_async(args):
+    """Run the baseline and the mixed phase and print the comparison."""
+    results = [await run_phase(args.url, args.duration, args.concurrency, 0)]
+    results.append(await run_phase(args.url, args.duration, args.concurrency, args.ask_concurrency))
+    
+    baseline = results[0]['search_qps'] or 1.0
+    for row in results:
+        print(f"asks in flight={row['ask_in_flight']:<3} search qps={row['search_qps']:8.1f} "
+              f"({row['search_qps'] / baseline:6.1%} of baseline)  p50={row['search_p50_ms']:7.1f}ms "
+              f"p99={row['search_p99_ms']:7.1f}ms  errors={row['search_errors']}  asks done={row['asks_completed']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent /search clients")
+    parser.add_argument("--ask-concurrency", type=int, default=8, help="Concurrent /ask clients in phase 2")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
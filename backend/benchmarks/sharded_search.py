@@ -0,0 +1,96 @@
+"""Compare search latency of one index with the same vectors split across shards.
+
+Builds a chunked index of synthetic vectors once per shard count (1 is the
+plain FAISSVectorStore) and reports per top_k:
+
+  - p50/p99 latency of single-query search_documents calls
+  - throughput of search_documents_batch over all queries at once
+  - overlap: share of the unsharded top_k documents the sharded store returns
+
+Sharding pays off for exact (flat) indexes and large top_k, where one search
+call is CPU-bound; set OMP_NUM_THREADS=1 to measure the shard threads alone.
+
+Usage (from the backend directory):
+    python -m benchmarks.sharded_search --num-vectors 500000 --shards 1,2,4,8 --top-k 10,100
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from app.sharded_store import create_vector_store
+from benchmarks.index_recall import synthetic_vectors, sample_queries
+from benchmarks.load_test import percentile
+
+def build(num_shards: int, vectors: np.ndarray, doc_ids: List[int], index_type: str):
+    """Store with the vectors added in ingestion-sized batches, and its build time."""
+    nlist = max(16, int(np.sqrt(len(vectors))))
+    store = create_vector_store(num_shards=num_shards, dimension=vectors.shape[1], index_type=index_type,
+                                nlist=nlist)
+    keys = list(range(len(vectors)))
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), 10000):
+        store.add_vectors(vectors[offset:offset + 10000], doc_ids[offset:offset + 10000], keys[offset:offset + 10000])
+    return store, time.perf_counter() - start
+
+def measure(store, queries: np.ndarray, top_k: int) -> Dict:
+    """Latency, batch throughput and results of one store."""
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(store.search_documents(query.copy(), top_k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    store.search_documents_batch(queries.copy(), top_k)
+    batch_s = time.perf_counter() - start
+    return {
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'batch_qps': len(queries) / batch_s,
+        'results': [{doc_id for doc_id, _, _ in hits} for hits in results]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=200000)
+    parser.add_argument("--chunks-per-doc", type=int, default=4)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--shards", default="1,2,4", help="Shard counts to compare, comma-separated")
+    parser.add_argument("--top-k", default="10,100", help="top_k values, comma-separated")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    vectors = synthetic_vectors(args.num_vectors, args.dimension)
+    queries = sample_queries(vectors, args.num_queries)
+    faiss.normalize_L2(queries)
+    doc_ids = (np.arange(len(vectors)) // args.chunks_per_doc).tolist()
+    top_ks = [int(k) for k in args.top_k.split(",") if k]
+    
+    results = []
+    baseline = {}
+    print(f"\n{len(vectors)} vectors, {args.index_type} index, {args.num_queries} queries\n")
+    print(f"{'shards':>6} {'build s':>8} {'top_k':>6} {'p50 ms':>8} {'p99 ms':>8} {'batch qps':>10} {'overlap':>8}")
+    for num_shards in [int(s) for s in args.shards.split(",") if s]:
+        store, build_s = build(num_shards, vectors, doc_ids, args.index_type)
+        for top_k in top_ks:
+            row = measure(store, queries, top_k)
+            found = row.pop('results')
+            baseline.setdefault(top_k, found)
+            row['overlap'] = float(np.mean([len(a & b) / max(len(a), 1) for a, b in zip(baseline[top_k], found)]))
+            row.update({'shards': num_shards, 'build_s': build_s, 'top_k': top_k})
+            results.append(row)
+            print(f"{num_shards:>6} {build_s:>8.1f} {top_k:>6} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+                  f"{row['batch_qps']:>10.0f} {row['overlap']:>8.3f}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
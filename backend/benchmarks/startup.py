@@ -0,0 +1,67 @@
+"""Measure API cold start: import time, time until /ready and time until fully warm.
+
+Each run starts a fresh interpreter, imports app.main, enters the app's
+lifespan (which starts the background warm-up) and polls readiness. With
+--preload the components are loaded at import instead (PRELOAD_COMPONENTS),
+as in the gunicorn master before it forks workers.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --preload --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+
+PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+import app.main as main
+imported = time.perf_counter() - start
+
+async def warm():
+    ready = None
+    async with main.lifespan(main.app):
+        while not all(s['loaded'] or s['error'] or not s['warm_up'] for s in main.components.status().values()):
+            if ready is None and main.components.ready():
+                ready = time.perf_counter() - start
+            await asyncio.sleep(0.005)
+        warm = time.perf_counter() - start
+    return ready if ready is not None else warm, warm
+
+ready, warm = asyncio.run(warm())
+print(json.dumps({'import_s': imported, 'ready_s': ready, 'warm_s': warm}))
+"""
+
+def run_probe(preload: bool) -> dict:
+    """Cold-start timings of one fresh interpreter."""
+    env = dict(os.environ, PRELOAD_COMPONENTS="true" if preload else "false", WARMUP_ON_STARTUP="true")
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--preload", action="store_true", help="Load components at import (PRELOAD_COMPONENTS=true)")
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    args = parser.parse_args()
+    
+    runs = [run_probe(args.preload) for _ in range(args.runs)]
+    summary = {key: median(run[key] for run in runs) for key in ('import_s', 'ready_s', 'warm_s')}
+    summary['preload'] = args.preload
+    summary['runs'] = args.runs
+    
+    print(f"\nMedian of {args.runs} cold starts ({'preload' if args.preload else 'lazy'})\n")
+    print(f"{'import app.main':<18} {summary['import_s']:>8.3f} s")
+    print(f"{'ready':<18} {summary['ready_s']:>8.3f} s")
+    print(f"{'fully warm':<18} {summary['warm_s']:>8.3f} s")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Offline benchmark suite: ingestion, index build, query latency/QPS, memory and retrieval quality.
+
+Runs on a synthetic corpus with a deterministic hashing embedder
+(benchmarks.fake_embedder), so it needs no model, network or existing data,
+and the same arguments produce the same corpus, queries and rankings on every
+run. For each corpus size it measures:
+
+  - ingestion: documents and chunks per second through IngestionPipeline
+    (SQLite in a temporary directory, chunking, embedding, indexing, saving)
+  - index build: seconds to add every chunk vector to a fresh index
+  - queries: p50/p99 latency and QPS of search_documents at each concurrency
+  - memory: index size, process RSS after ingestion and peak RSS
+  - quality: recall@k and MRR on known-item queries (a window of a document's
+    words with some words dropped and noise words added)
+
+Results are printed and written as JSON; --compare shows the change in each
+metric between two result files (e.g. from two commits).
+
+Usage (from the backend directory):
+    python -m benchmarks.suite --sizes 1000,10000 --concurrency 1,4,16 --json bench.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import faiss
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, Document, DocumentChunk
+from app.ingestion import IngestionPipeline
+from app.vector_store import FAISSVectorStore
+from benchmarks.fake_embedder import HashingEmbedder
+from benchmarks.load_test import percentile
+
+def synthetic_corpus(num_docs: int, words_per_doc: int = 300, vocab_size: int = 20000, num_topics: int = 50,
+                     seed: int = 0) -> List[Dict]:
+    """Documents mixing Zipf-distributed common words with words of their topic.
+    
+    Documents on the same topic share vocabulary, so they are hard negatives
+    for each other's queries.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    topic_vocab = rng.integers(0, vocab_size, (num_topics, 40))
+    documents = []
+    for doc_id in range(num_docs):
+        common = np.minimum(rng.zipf(1.2, words_per_doc), vocab_size) - 1
+        topical = rng.choice(topic_vocab[doc_id % num_topics], words_per_doc // 3)
+        words = vocab[np.concatenate([common, topical])]
+        rng.shuffle(words)
+        documents.append({
+            'title': f"Document {doc_id}",
+            'content': " ".join(words.tolist()),
+            'source_link': f"https://example.org/{doc_id}",
+            'related_entities': [f"Document {int(t)}" for t in rng.integers(0, num_docs, 3)]
+        })
+    return documents
+
+def known_item_queries(documents: List[Dict], num_queries: int, window: int = 12, drop: float = 0.3,
+                       noise: int = 3, vocab_size: int = 20000, seed: int = 1) -> List[Dict]:
+    """Queries built from a random window of a document's words, labelled with its title."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for position in rng.choice(len(documents), min(num_queries, len(documents)), replace=False).tolist():
+        words = documents[position]['content'].split()
+        start = int(rng.integers(0, max(1, len(words) - window)))
+        kept = [word for word in words[start:start + window] if rng.random() >= drop]
+        kept += [f"w{int(i)}" for i in rng.integers(0, vocab_size, noise)]
+        queries.append({'query': " ".join(kept), 'title': documents[position]['title']})
+    return queries
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if platform.system() == "Darwin" else peak / 1e3
+
+def ingest(documents: List[Dict], embedder: HashingEmbedder, workdir: str, index_type: str):
+    """Run the ingestion pipeline into a fresh SQLite database and index."""
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    store = FAISSVectorStore(dimension=embedder.dimension, index_path=os.path.join(workdir, "index.bin"),
+                             index_type=index_type)
+    pipeline = IngestionPipeline(embedder, store, session_factory=session_factory)
+    stats = pipeline.run(iter(documents))
+    return store, stats, session_factory
+
+def build_index(embedder: HashingEmbedder, session_factory, index_type: str) -> Dict:
+    """Time adding every stored chunk's vector to an empty index (embedding excluded)."""
+    db = session_factory()
+    try:
+        rows = db.execute(select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.text)).all()
+    finally:
+        db.close()
+    vectors = embedder.generate_embeddings_batch([row.text for row in rows])
+    store = FAISSVectorStore(dimension=embedder.dimension, index_type=index_type)
+    start = time.perf_counter()
+    store.add_vectors(vectors, [row.document_id for row in rows], [row.id for row in rows])
+    return {'vectors': len(rows), 'build_s': time.perf_counter() - start}
+
+def query_latency(store: FAISSVectorStore, query_vectors: np.ndarray, top_k: int, concurrency: int) -> Dict:
+    """Latency percentiles and throughput of search_documents with concurrency threads."""
+    def timed(vector):
+        start = time.perf_counter()
+        store.search_documents(vector, top_k)
+        return (time.perf_counter() - start) * 1000
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, query_vectors))
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'qps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+def retrieval_quality(store: FAISSVectorStore, session_factory, queries: List[Dict], query_vectors: np.ndarray,
+                      k: int) -> Dict:
+    """Recall@k and MRR (within the top k) of the known-item queries."""
+    db = session_factory()
+    try:
+        doc_ids = {row.title: row.id for row in db.execute(select(Document.id, Document.title))}
+    finally:
+        db.close()
+    hits = 0
+    reciprocal_ranks = 0.0
+    for query, vector in zip(queries, query_vectors):
+        ranked = [doc_id for doc_id, _, _ in store.search_documents(vector, k)]
+        target = doc_ids[query['title']]
+        if target in ranked:
+            hits += 1
+            reciprocal_ranks += 1.0 / (ranked.index(target) + 1)
+    return {'recall_at_k': hits / float(len(queries)), 'mrr': reciprocal_ranks / len(queries)}
+
+def run_size(num_docs: int, args) -> Dict:
+    """Every measurement for one corpus size."""
+    embedder = HashingEmbedder(dimension=args.dimension)
+    documents = synthetic_corpus(num_docs, words_per_doc=args.words_per_doc, seed=args.seed)
+    queries = known_item_queries(documents, args.num_queries, seed=args.seed + 1)
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        rss_before = rss_mb()
+        store, stats, session_factory = ingest(documents, embedder, workdir, args.index_type)
+        rss_after = rss_mb()
+        build = build_index(embedder, session_factory, args.index_type)
+        
+        start = time.perf_counter()
+        query_vectors = embedder.generate_embeddings_batch([q['query'] for q in queries])
+        embed_s = time.perf_counter() - start
+        
+        result = {
+            'num_docs': num_docs,
+            'ingestion': {
+                'seconds': stats['seconds'],
+                'docs_per_s': num_docs / stats['seconds'],
+                'chunks_per_s': stats['chunks'] / stats['seconds'],
+                'chunks': stats['chunks']
+            },
+            'index_build': build,
+            'query_embed_per_s': len(queries) / embed_s if embed_s else 0.0,
+            'queries': [query_latency(store, query_vectors, args.k, c) for c in args.concurrency],
+            'memory': {
+                'index_mb': faiss.serialize_index(store.index).nbytes / 1e6,
+                'rss_mb': rss_after,
+                'ingest_rss_growth_mb': rss_after - rss_before,
+                'peak_rss_mb': peak_rss_mb()
+            },
+            'quality': retrieval_quality(store, session_factory, queries, query_vectors, args.k)
+        }
+    return result
+
+def git_commit() -> str:
+    """Current commit, if the benchmark runs inside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(result: Dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric metrics of one size as 'section.metric' keys."""
+    flat = {}
+    for key, value in result.items():
+        if key == 'queries':
+            for row in value:
+                for metric in ('qps', 'p50_ms', 'p99_ms'):
+                    flat[f"queries.c{row['concurrency']}.{metric}"] = row[metric]
+        elif isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and key != 'num_docs':
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(before_path: str, after_path: str):
+    """Print each metric of two result files side by side with the relative change."""
+    with open(before_path) as f:
+        before = {r['num_docs']: flatten(r) for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = {r['num_docs']: flatten(r) for r in json.load(f)['results']}
+    for num_docs in sorted(set(before) & set(after)):
+        print(f"\n{num_docs} documents")
+        print(f"{'metric':<34} {'before':>12} {'after':>12} {'change':>8}")
+        for metric in sorted(set(before[num_docs]) & set(after[num_docs])):
+            old, new = before[num_docs][metric], after[num_docs][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+            print(f"{metric:<34} {old:>12.4g} {new:>12.4g} {change:>8}")
+
+def print_result(result: Dict):
+    ingestion = result['ingestion']
+    print(f"\n{result['num_docs']} documents, {ingestion['chunks']} chunks")
+    print(f"  ingestion     {ingestion['docs_per_s']:>10.1f} docs/s  {ingestion['chunks_per_s']:>10.1f} chunks/s")
+    print(f"  index build   {result['index_build']['build_s']:>10.3f} s")
+    for row in result['queries']:
+        print(f"  queries x{row['concurrency']:<4} {row['qps']:>10.1f} qps     "
+              f"p50 {row['p50_ms']:.3f} ms  p99 {row['p99_ms']:.3f} ms")
+    memory = result['memory']
+    print(f"  memory        index {memory['index_mb']:.1f} MB, rss {memory['rss_mb']:.1f} MB, "
+          f"peak {memory['peak_rss_mb']:.1f} MB")
+    print(f"  quality       recall@k {result['quality']['recall_at_k']:.4f}  MRR {result['quality']['mrr']:.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Corpus sizes (documents), comma-separated")
+    parser.add_argument("--concurrency", default="1,4,16", help="Query threads, comma-separated")
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--words-per-doc", type=int, default=300)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c]
+    
+    results = []
+    for num_docs in [int(s) for s in args.sizes.split(",") if s]:
+        results.append(run_size(num_docs, args))
+        print_result(results[-1])
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'timestamp': time.time(),
+                    'python': platform.python_version(),
+                    'faiss': faiss.__version__,
+                    'cpus': os.cpu_count(),
+                    'args': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')}
+                },
+                'results': results
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
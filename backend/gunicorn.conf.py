@@ -0,0 +1,16 @@
+"""Gunicorn settings: load the app and its components once, then fork workers.
+
+Usage (from the backend directory):
+    gunicorn app.main:app -c gunicorn.conf.py
+"""
+import os
+
+# Importing app.main in the master loads the embedding model and memory-maps
+# the indexes before forking, so workers start ready and share those pages.
+os.environ.setdefault("PRELOAD_COMPONENTS", "true")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
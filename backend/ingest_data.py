@@ -1,102 +1,97 @@
 """Script to ingest data from Wikipedia and build the vector index."""
 import os
 import sys
-from sqlalchemy.orm import Session
-from app.database import init_db, SessionLocal, Document
+from app.database import init_db
 from app.scraper import WikipediaScraper
 from app.embeddings import EmbeddingGenerator
-from app.vector_store import FAISSVectorStore
-import numpy as np
+from app.sharded_store import create_vector_store
+from app.bm25 import BM25Index
+from app.graph import KnowledgeGraph
+from app.answer_cache import SemanticAnswerCache
+from app.embedding_store import EmbeddingStore
+from app.ingestion import IngestionPipeline
 
-def ingest_data(topic: str = "Artificial Intelligence", max_pages: int = 50):
-    """Ingest Wikipedia data and build vector index."""
-    print(f"🚀 Starting data ingestion for topic: {topic}")
+def ingest_data(topic: str = "Artificial Intelligence", max_pages: int = 50, resume: bool = False):
+    """Ingest Wikipedia data and build vector index.
+    
+    Several topics can be ingested in one run by separating them with ';'.
+    Pages stream through scraping, DB insert, embedding and indexing, so
+    memory stays bounded however many pages are ingested. With resume=True,
+    pages scraped by an interrupted run over the same topics are not fetched
+    again.
+    """
+    topics = [t.strip() for t in topic.split(";") if t.strip()]
+    print(f"🚀 Starting data ingestion for topic(s): {', '.join(topics)}")
     
     # Initialize components
     scraper = WikipediaScraper()
     embedding_gen = EmbeddingGenerator()
-    vector_store = FAISSVectorStore()
+    vector_store = create_vector_store()
+    keyword_index = BM25Index()
     
     # Initialize database
     init_db()
-    db = SessionLocal()
+    
+    # Append to the existing index rather than starting over; changed pages
+    # replace their old vectors in place
+    if vector_store.load():
+        print(f"Loaded existing index with {vector_store.index.ntotal} vectors")
+    keyword_index.load()
+    
+    pipeline = IngestionPipeline(embedding_gen, vector_store, answer_cache=SemanticAnswerCache(),
+                                 keyword_index=keyword_index, graph=KnowledgeGraph(),
+                                 embedding_store=EmbeddingStore())
+    if not len(keyword_index) and vector_store.num_documents():
+        print(f"🔤 Built keyword index from {pipeline.backfill_keyword_index()} stored chunks")
     
     try:
-        # Scrape Wikipedia
-        print("\n📥 Scraping Wikipedia...")
-        documents = scraper.scrape_topic(topic, max_pages=max_pages)
+        print("\n📥 Scraping, storing, embedding and indexing...")
+        stats = pipeline.run(scraper.iter_topics(topics, max_pages=max_pages, resume=resume))
+        # Everything is indexed and saved; the next run fetches fresh pages
+        scraper.clear_checkpoint(topics, max_pages)
         
-        if not documents:
-            print("❌ No documents scraped. Exiting.")
+        if not stats['documents'] and not stats['updated']:
+            print("No new or changed documents to index.")
             return
         
-        # Store in database and prepare for embedding
-        print("\n💾 Storing documents in database...")
-        texts = []
-        doc_ids = []
-        
-        for doc in documents:
-            # Check if document already exists
-            existing = db.query(Document).filter(Document.title == doc["title"]).first()
-            if existing:
-                continue
-            
-            db_doc = Document(
-                title=doc["title"],
-                content=doc["content"],
-                source_link=doc["source_link"],
-                related_entities=doc.get("related_entities", [])
-            )
-            db.add(db_doc)
-            db.flush()  # Get the ID
-            
-            # Prepare text for embedding (use summary + first part of content)
-            text_for_embedding = f"{doc.get('summary', '')} {doc['content'][:1000]}"
-            texts.append(text_for_embedding)
-            doc_ids.append(db_doc.id)
-        
-        db.commit()
-        print(f"✅ Stored {len(doc_ids)} documents in database")
-        
-        # Generate embeddings
-        print("\n🔢 Generating embeddings...")
-        embeddings = embedding_gen.generate_embeddings_batch(texts, batch_size=32)
-        
-        # Update dimension if needed
-        if embeddings.shape[1] != vector_store.dimension:
-            vector_store.dimension = embeddings.shape[1]
-            vector_store.create_index()
-        elif vector_store.index is None:
-            vector_store.create_index()
-        
-        # Add to vector store
-        print("\n📊 Building vector index...")
-        vector_store.add_vectors(embeddings, doc_ids)
-        
-        # Update embedding_id in database
-        for i, doc_id in enumerate(doc_ids):
-            doc = db.query(Document).filter(Document.id == doc_id).first()
-            if doc:
-                doc.embedding_id = i
-        
-        db.commit()
-        
-        # Save vector store
-        vector_store.save()
-        print(f"✅ Vector index built with {len(doc_ids)} vectors")
+        print(f"✅ Stored {stats['documents']} new and {stats['updated']} changed documents "
+              f"({stats['chunks']} chunks), skipped {stats['skipped']} unchanged")
+        print(f"✅ Vector index built with {stats['vectors']} new vectors in {stats['seconds']:.1f}s")
         
         print("\n🎉 Data ingestion complete!")
-        
+    
     except Exception as e:
         print(f"❌ Error during ingestion: {e}")
         import traceback
         traceback.print_exception(*sys.exc_info())
-        db.rollback()
-    finally:
-        db.close()
+
+def rebuild_index():
+    """Rebuild the vector and keyword indexes from the stored chunks.
+    
+    The index type and shard count come from VECTOR_INDEX_TYPE and
+    VECTOR_INDEX_SHARDS, so this is how an existing corpus moves to another
+    index layout. Embeddings are read from the embedding store; only chunks
+    missing from it are embedded.
+    """
+    print("🔁 Rebuilding indexes from stored chunks")
+    init_db()
+    embedding_store = EmbeddingStore()
+    print(f"Embedding store has {len(embedding_store)} vectors")
+    vector_store = create_vector_store(num_shards=int(os.getenv("VECTOR_INDEX_SHARDS", "1")))
+    pipeline = IngestionPipeline(EmbeddingGenerator(), vector_store, keyword_index=BM25Index(),
+                                 embedding_store=embedding_store)
+    stats = pipeline.rebuild_index()
+    store_stats = embedding_store.get_stats()
+    print(f"✅ Indexed {stats['vectors']} vectors in {stats['seconds']:.1f}s "
+          f"({store_stats['hits']} stored, {store_stats['misses']} embedded)")
 
 if __name__ == "__main__":
-    topic = sys.argv[1] if len(sys.argv) > 1 else "Artificial Intelligence"
-    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 50
-    ingest_data(topic, max_pages)
+    if sys.argv[1:] == ["--rebuild"]:
+        rebuild_index()
+        sys.exit(0)
+    resume = "--resume" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--resume"]
+    topic = args[0] if args else "Artificial Intelligence"
+    max_pages = int(args[1]) if len(args) > 1 else 50
+    ingest_data(topic, max_pages, resume)
 
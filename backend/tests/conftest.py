@@ -0,0 +1,121 @@
+"""Shared fixtures: a local fake of the wikipedia package the scraper calls, and a scratch database.
+
+The wikipedia package itself is stubbed when it is not installed, so the
+scraper tests run without it.
+"""
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+def _stub_wikipedia():
+    """Minimal wikipedia module so app.scraper imports when the package is not installed.
+    
+    Only the exception classes are real; tests replace the module's functions
+    with a FakeWikipedia through the fake_wikipedia fixture.
+    """
+    class DisambiguationError(Exception):
+        def __init__(self, title, may_refer_to):
+            super().__init__(title)
+            self.title = title
+            self.options = may_refer_to
+    
+    class PageError(Exception):
+        pass
+    
+    def offline(*args, **kwargs):
+        raise RuntimeError("wikipedia is not installed; use the fake_wikipedia fixture")
+    
+    module = types.ModuleType("wikipedia")
+    module.exceptions = types.SimpleNamespace(DisambiguationError=DisambiguationError, PageError=PageError)
+    module.set_lang = module.search = module.page = offline
+    return module
+
+try:
+    import wikipedia  # noqa: F401
+except ImportError:
+    sys.modules["wikipedia"] = _stub_wikipedia()
+
+class FakeWikipedia:
+    """In-memory stand-in for the wikipedia module (search, page, exceptions).
+    
+    Pages are plain objects built from `articles` (title -> content). Titles
+    in `flaky` raise a transient error that many times before succeeding,
+    titles in `missing` raise PageError. Every call is logged with its
+    monotonic time, and the number of page fetches running at once is
+    tracked, so tests can check rate limiting and concurrency.
+    """
+    
+    def __init__(self, exceptions, articles, flaky=None, missing=(), delay: float = 0.0):
+        self.exceptions = exceptions
+        self.articles = dict(articles)
+        self.flaky = dict(flaky or {})
+        self.missing = set(missing)
+        self.delay = delay
+        self.calls = []  # (time, function, title)
+        self.page_calls = {}  # title -> number of page() calls
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+    
+    def set_lang(self, lang):
+        pass
+    
+    def search(self, query, results=10):
+        with self._lock:
+            self.calls.append((time.monotonic(), "search", query))
+        return list(self.articles)[:results]
+    
+    def page(self, title, auto_suggest=True):
+        with self._lock:
+            self.calls.append((time.monotonic(), "page", title))
+            self.page_calls[title] = self.page_calls.get(title, 0) + 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if title in self.missing:
+                raise self.exceptions.PageError(title)
+            with self._lock:
+                if self.flaky.get(title):
+                    self.flaky[title] -= 1
+                    raise ConnectionError(f"transient error fetching {title}")
+            return FakePage(title, self.articles[title])
+        finally:
+            with self._lock:
+                self.running -= 1
+
+class FakePage:
+    def __init__(self, title, content):
+        self.title = title
+        self.content = content
+        self.summary = content[:100]
+        self.url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+        self.links = []
+
+@pytest.fixture
+def fake_wikipedia(monkeypatch):
+    """Factory that installs a FakeWikipedia in place of the module the scraper uses."""
+    from app import scraper
+    
+    def install(articles, **kwargs):
+        fake = FakeWikipedia(scraper.wikipedia.exceptions, articles, **kwargs)
+        monkeypatch.setattr(scraper, "wikipedia", fake)
+        return fake
+    
+    return install
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory for an empty SQLite database with the app's tables."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
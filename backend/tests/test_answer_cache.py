@@ -0,0 +1,137 @@
+"""SemanticAnswerCache: similarity threshold, LRU eviction, invalidation and persistence."""
+import asyncio
+import threading
+
+import numpy as np
+
+from app.answer_cache import SemanticAnswerCache
+from app.database import AnswerCacheEntry
+from app.rag import RAGPipeline
+
+DOCS = [{"id": 1, "content": "Paris is the capital of France."},
+        {"id": 2, "content": "Berlin is the capital of Germany."}]
+
+def unit(*values):
+    vector = np.asarray(values, dtype='float32')
+    return vector / np.linalg.norm(vector)
+
+def make_cache(**kwargs):
+    options = {"max_size": 10, "threshold": 0.95, "session_factory": None}
+    options.update(kwargs)
+    return SemanticAnswerCache(**options)
+
+def persisted_keys(session_factory):
+    db = session_factory()
+    try:
+        return {row.key for row in db.query(AnswerCacheEntry.key)}
+    finally:
+        db.close()
+
+def test_hit_requires_similarity_above_threshold():
+    cache = make_cache()
+    cache.put("capital?", unit(1, 0, 0), DOCS, "Paris")
+    
+    assert cache.lookup(unit(1, 0.1, 0), DOCS) == "Paris"  # cosine ~0.995
+    assert cache.lookup(unit(1, 0.5, 0), DOCS) is None  # cosine ~0.894
+    assert cache.lookup(unit(1, 0, 0), DOCS[:1]) is None  # Different documents
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_changed_document_content_misses():
+    cache = make_cache()
+    cache.put("capital?", unit(1, 0, 0), DOCS, "Paris")
+    
+    edited = [dict(DOCS[0], content="Lyon is the capital of France."), DOCS[1]]
+    assert cache.lookup(unit(1, 0, 0), edited) is None
+    assert cache.lookup(unit(1, 0, 0), list(reversed(DOCS))) == "Paris"  # Order does not matter
+
+def test_lru_eviction():
+    cache = make_cache(max_size=2)
+    cache.put("a", unit(1, 0, 0), DOCS[:1], "A")
+    cache.put("b", unit(0, 1, 0), DOCS[:1], "B")
+    assert cache.lookup(unit(1, 0, 0), DOCS[:1]) == "A"  # "a" is now the most recent
+    cache.put("c", unit(0, 0, 1), DOCS[:1], "C")
+    
+    assert cache.evictions == 1
+    assert cache.lookup(unit(0, 1, 0), DOCS[:1]) is None
+    assert cache.lookup(unit(1, 0, 0), DOCS[:1]) == "A"
+    assert cache.lookup(unit(0, 0, 1), DOCS[:1]) == "C"
+
+def test_invalidate_documents():
+    cache = make_cache()
+    cache.put("both", unit(1, 0, 0), DOCS, "both")
+    cache.put("second", unit(1, 0, 0), DOCS[1:], "second")
+    cache.invalidate_documents([1])
+    
+    assert cache.invalidations == 1
+    assert cache.lookup(unit(1, 0, 0), DOCS) is None
+    assert cache.lookup(unit(1, 0, 0), DOCS[1:]) == "second"
+
+def test_flush_and_load(session_factory):
+    cache = make_cache(session_factory=session_factory)
+    cache.put("both", unit(1, 0, 0), DOCS, "both")
+    cache.put("second", unit(0, 1, 0), DOCS[1:], "second")
+    cache.flush()
+    
+    reloaded = make_cache(session_factory=session_factory)
+    reloaded.load()
+    assert reloaded.lookup(unit(0, 1, 0), DOCS[1:]) == "second"
+    
+    # Entries persisted by another process are invalidated by document ID
+    cache.invalidate_documents([1])
+    cache.flush()
+    assert len(persisted_keys(session_factory)) == 1
+
+def test_failed_flush_is_retried(session_factory):
+    failing = {"on": True}
+    
+    def flaky_factory():
+        db = session_factory()
+        if failing["on"]:
+            def fail():
+                raise RuntimeError("database is locked")
+            db.commit = fail
+        return db
+    
+    seed = make_cache(session_factory=session_factory)
+    seed.put("old", unit(1, 0, 0), DOCS, "old")
+    seed.flush()
+    
+    cache = make_cache(session_factory=flaky_factory)
+    cache.put("new", unit(0, 1, 0), DOCS[1:], "new")
+    cache.invalidate_documents([1])
+    cache.flush()
+    assert len(persisted_keys(session_factory)) == 1  # Only the seeded entry
+    
+    failing["on"] = False
+    cache.flush()
+    db = session_factory()
+    try:
+        assert [row.answer for row in db.query(AnswerCacheEntry)] == ["new"]
+    finally:
+        db.close()
+
+def test_pipeline_coalesces_flushes(monkeypatch):
+    class SlowCache:
+        def __init__(self):
+            self.flushes = 0
+            self.release = threading.Event()
+        
+        def flush(self):
+            self.release.wait(5)
+            self.flushes += 1
+    
+    async def main():
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        cache = SlowCache()
+        pipeline = RAGPipeline(answer_cache=cache)
+        for _ in range(20):
+            pipeline._schedule_flush()  # One running, the rest coalesce into one follow-up
+        cache.release.set()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if cache.flushes == 2 and pipeline._flush_future.done():
+                break
+        await asyncio.sleep(0.05)  # No third flush follows
+        return cache.flushes
+    
+    assert asyncio.run(main()) == 2
@@ -0,0 +1,98 @@
+"""AttributeIndex: attribute bitmaps, filter combination and filtered vector search."""
+import numpy as np
+import pytest
+
+from app.attribute_index import AttributeIndex, IDFilter, _pack
+from app.vector_store import FAISSVectorStore
+
+DIMENSION = 16
+NUM_DOCS = 40
+CHUNKS_PER_DOC = 3
+
+# Even documents are about science from Wikipedia, odd ones about history; every third is from example.org
+DOCUMENTS = [(doc_id, " Science " if doc_id % 2 == 0 else "history",
+              "https://example.org/a" if doc_id % 3 == 0 else f"https://en.wikipedia.org/wiki/{doc_id}")
+             for doc_id in range(1, NUM_DOCS + 1)]
+
+def chunk_ids(doc_id: int):
+    return [doc_id * 10 + i for i in range(CHUNKS_PER_DOC)]
+
+@pytest.fixture(scope="module")
+def corpus():
+    doc_ids = [doc_id for doc_id in range(1, NUM_DOCS + 1) for _ in range(CHUNKS_PER_DOC)]
+    keys = [key for doc_id in range(1, NUM_DOCS + 1) for key in chunk_ids(doc_id)]
+    vectors = np.random.default_rng(0).standard_normal((len(keys), DIMENSION)).astype('float32')
+    return vectors, doc_ids, keys
+
+@pytest.fixture
+def attribute_index(corpus):
+    _, doc_ids, keys = corpus
+    index = AttributeIndex()
+    index.build(DOCUMENTS, np.array(keys), np.array(doc_ids))
+    return index
+
+def selected_docs(id_filter: IDFilter):
+    return sorted({int(key) // 10 for key in id_filter.keys()})
+
+def test_pack_sets_little_endian_bits():
+    bits = _pack(np.array([0, 3, 9]), 12)
+    assert bits.tolist() == [0b00001001, 0b00000010]
+    id_filter = IDFilter(bits, bits)
+    assert id_filter.count == 3 and id_filter.keys().tolist() == [0, 3, 9]
+    assert 9 in id_filter and 8 not in id_filter and 100 not in id_filter and -1 not in id_filter
+
+def test_filter_combines_conditions(attribute_index):
+    assert attribute_index.filter() is None
+    
+    science = attribute_index.filter(topics=["SCIENCE"])
+    assert selected_docs(science) == list(range(2, NUM_DOCS + 1, 2))
+    assert science.count == NUM_DOCS // 2 * CHUNKS_PER_DOC
+    assert science.keys().tolist() == [key for doc_id in range(2, NUM_DOCS + 1, 2) for key in chunk_ids(doc_id)]
+    
+    # Values of one attribute are OR-ed, attributes AND-ed
+    assert selected_docs(attribute_index.filter(topics=["science", "history"])) == list(range(1, NUM_DOCS + 1))
+    both = attribute_index.filter(topics=["science"], sources=["example.org"])
+    assert selected_docs(both) == [6, 12, 18, 24, 30, 36]
+    assert both.allows_document(6) and not both.allows_document(3) and not both.allows_document(8)
+    
+    by_id = attribute_index.filter(topics=["history"], doc_ids=[1, 2, 3, 999])
+    assert selected_docs(by_id) == [1, 3]
+    assert attribute_index.filter(topics=["poetry"]).count == 0
+
+@pytest.mark.parametrize("index_type, exact_max", [("flat", "20000"), ("ivf_flat", "20000"),
+                                                   ("hnsw", "20000"), ("hnsw", "0")])
+def test_filtered_search_returns_only_selected(tmp_path, monkeypatch, corpus, attribute_index, index_type, exact_max):
+    monkeypatch.setenv("FILTER_EXACT_MAX", exact_max)  # 0 makes HNSW search with the bitmap selector
+    vectors, doc_ids, keys = corpus
+    store = FAISSVectorStore(dimension=DIMENSION, index_path=str(tmp_path / "index.bin"), index_type=index_type,
+                             nlist=4, nprobe=1, hnsw_m=8)
+    store.add_vectors(vectors, doc_ids, keys)
+    history = attribute_index.filter(topics=["history"])
+    
+    results = store.search_documents(vectors[0], top_k=10, id_filter=history)  # First chunk of document 1
+    assert results[0][::2] == (1, 10)
+    assert len(results) == 10 and all(doc_id % 2 == 1 for doc_id, _, _ in results)
+    
+    # A query next to an excluded document only finds selected ones
+    results = store.search_documents(vectors[3], top_k=10, id_filter=history)  # Document 2
+    assert 2 not in {doc_id for doc_id, _, _ in results}
+    assert all(doc_id % 2 == 1 for doc_id, _, _ in results)
+    
+    # Deleted documents stay excluded inside the filter
+    store.delete([1])
+    assert 1 not in {doc_id for doc_id, _, _ in store.search_documents(vectors[0], top_k=10, id_filter=history)}
+
+def test_filtered_search_matches_exact_search_over_subset(tmp_path, corpus, attribute_index):
+    vectors, doc_ids, keys = corpus
+    store = FAISSVectorStore(dimension=DIMENSION, index_path=str(tmp_path / "index.bin"), index_type="flat")
+    store.add_vectors(vectors, doc_ids, keys)
+    id_filter = attribute_index.filter(sources=["en.wikipedia.org"])
+    
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    allowed = np.isin(keys, id_filter.keys())
+    query = normalized[7]
+    best = {}  # Document -> its best chunk, in order of score
+    for key in np.array(keys)[allowed][np.argsort(-(normalized[allowed] @ query))].tolist():
+        best.setdefault(key // 10, key)
+    results = store.search_documents(vectors[7], top_k=5, id_filter=id_filter)
+    assert [(doc_id, chunk) for doc_id, _, chunk in results] == list(best.items())[:5]
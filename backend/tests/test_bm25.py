@@ -0,0 +1,76 @@
+"""BM25Index: scoring, tombstoned deletes and persistence."""
+import os
+import pickle
+
+from app.bm25 import BM25Index
+
+TEXTS = ["the cat sat on the mat", "dogs chase cats", "a cat and a dog", "quantum physics lecture"]
+
+def build(path=None) -> BM25Index:
+    index = BM25Index(index_path=path or "unused.npz", k1=1.2, b=0.75)
+    # Chunk keys 10.. of documents 1, 1, 2, 3
+    index.add(TEXTS, [1, 1, 2, 3], [10, 11, 12, 13])
+    return index
+
+def test_ranks_by_term_matches():
+    index = build()
+    hits = index.search("cat", top_k=5)
+    assert [key for key, _ in hits] == [12, 10]  # "cats" is a different term; the shorter text wins
+    assert index.search("unknown words", top_k=5) == []
+    documents = index.search_documents("cat dog", top_k=5)
+    assert [(doc_id, key) for doc_id, _, key in documents] == [(2, 12), (1, 10)]
+    assert documents[0][1] > hits[0][1]  # Both terms match
+
+def test_deleted_entries_stop_matching_before_compaction():
+    index = build()
+    assert index.delete([2]) == 1
+    assert index.tombstones == {12}
+    assert [key for key, _ in index.search("cat")] == [10]
+    assert "dog" in index.postings  # Still referenced until compacted
+    
+    index.compact()
+    assert not index.tombstones and "dog" not in index.postings
+
+def test_upsert_replaces_document_entries():
+    index = build()
+    index.upsert(["cat videos"], [1], [14])
+    assert index.doc_to_ids[1] == [14]
+    assert 10 not in index.id_to_doc and 11 not in index.id_to_doc
+    assert [key for key, _ in index.search("cats")] == []  # Document 1's "dogs chase cats" is gone
+    
+    # Reusing a tombstoned key drops its old postings first
+    index.upsert(["mat"], [1], [10])
+    assert [key for key, _ in index.search("mat")] == [10]
+    assert [key for key, _ in index.search("videos")] == []
+
+def test_filter_restricts_candidates():
+    index = build()
+    assert [key for key, _ in index.search("cat", id_filter={10, 13})] == [10]
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "bm25_index.npz")
+    index = build(path)
+    index.delete([3])
+    index.save()
+    
+    loaded = BM25Index(index_path=path)
+    assert loaded.load()
+    assert loaded.search("cat") == index.search("cat")
+    assert loaded.doc_to_ids == {1: [10, 11], 2: [12]}
+    assert loaded.search("quantum") == []
+    assert not os.path.exists(path + ".tmp")
+
+def test_loads_legacy_pickle(tmp_path):
+    index = build()
+    with open(tmp_path / "bm25_index.pkl", 'wb') as f:
+        pickle.dump({'postings': index.postings, 'doc_len': index.doc_len, 'id_to_doc': index.id_to_doc}, f)
+    
+    loaded = BM25Index(index_path=str(tmp_path / "bm25_index.npz"))
+    assert loaded.load()
+    assert loaded.search("cat dog") == index.search("cat dog")
+    assert loaded.doc_to_ids == {1: [10, 11], 2: [12], 3: [13]}
+    
+    # The next save writes the array format
+    loaded.save()
+    assert os.path.exists(tmp_path / "bm25_index.npz")
+    assert not BM25Index(index_path=str(tmp_path / "missing.npz")).load()
@@ -0,0 +1,50 @@
+"""TextChunker: token budgets, overlap and word boundaries."""
+import pytest
+
+from app.chunking import TextChunker, count_tokens
+
+TEXT = " ".join(f"word{i}" for i in range(100))  # One token per word
+
+def words(chunk):
+    return chunk["text"].split()
+
+def test_count_tokens_splits_punctuation():
+    assert count_tokens("Hello, world!") == 4
+    assert count_tokens("") == 0
+
+def test_chunks_respect_budget_and_overlap():
+    chunks = TextChunker(max_tokens=20, overlap_tokens=5).chunk(TEXT)
+    
+    assert all(count_tokens(chunk["text"]) <= 20 for chunk in chunks)
+    assert [len(words(chunk)) for chunk in chunks[:-1]] == [20] * (len(chunks) - 1)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert words(previous)[-5:] == words(chunk)[:5]
+    assert words(chunks[0])[0] == "word0" and words(chunks[-1])[-1] == "word99"
+    assert len(chunks) == 7  # Every chunk after the first adds 15 new words
+
+def test_offsets_point_into_the_source():
+    text = "  Alpha beta,\ngamma   delta. Epsilon zeta eta theta.  "
+    chunks = TextChunker(max_tokens=4, overlap_tokens=1).chunk(text)
+    
+    for chunk in chunks:
+        assert text[chunk["start_char"]:chunk["end_char"]] == chunk["text"]
+        assert chunk["text"] == chunk["text"].strip()  # Cut on word boundaries
+    assert chunks[0]["start_char"] == text.index("Alpha")
+    assert chunks[-1]["end_char"] == len(text.rstrip())
+
+def test_oversized_word_gets_its_own_chunk():
+    text = "a " + "-" * 30 + " b c"
+    chunks = TextChunker(max_tokens=10, overlap_tokens=2).chunk(text)
+    
+    assert [chunk["text"] for chunk in chunks] == ["a", "-" * 30, "b c"]
+
+def test_model_token_counter():
+    # A tokenizer that counts characters makes long words expensive
+    chunks = TextChunker(max_tokens=10, overlap_tokens=0, token_counter=len).chunk("aaaa bbbb cccc dd")
+    assert [chunk["text"] for chunk in chunks] == ["aaaa bbbb", "cccc dd"]
+
+def test_empty_text_and_invalid_overlap():
+    assert TextChunker(max_tokens=10, overlap_tokens=2).chunk("") == []
+    assert TextChunker(max_tokens=10, overlap_tokens=2).chunk(None) == []
+    with pytest.raises(ValueError):
+        TextChunker(max_tokens=10, overlap_tokens=10)
@@ -0,0 +1,59 @@
+"""ContextPacker: token budget, near-duplicate removal and sentence selection and order."""
+from app.context_packer import ContextPacker, split_sentences
+
+def words(text: str) -> int:
+    return len(text.split())
+
+# Sentences sharing no term with each other or with the questions
+FILLER = [" ".join(f"filler{i}{letter}" for letter in "abcdefg").capitalize() + "." for i in range(30)]
+
+def packer(budget: int, **kwargs) -> ContextPacker:
+    return ContextPacker(token_budget=budget, token_counter=words, **kwargs)
+
+def test_split_sentences():
+    assert split_sentences("One. Two?  Three!\nFour\n\n") == ["One.", "Two?", "Three!", "Four"]
+    assert split_sentences(None) == []
+
+def test_stays_within_budget_and_prefers_relevant_sentences():
+    docs = [{"title": "Archive", "content": " ".join(FILLER[:10] + ["Turing designed the bombe machine at Bletchley."]
+                                                    + FILLER[10:])},
+            {"title": "Bombe", "content": "The bombe machine was designed to break Enigma. " + " ".join(FILLER[:5])}]
+    text, stats = packer(40).pack("Who designed the bombe machine?", docs)
+    
+    assert stats['context_tokens'] == words(text) <= 40  # Every header and sentence is paid for
+    assert "Turing designed the bombe machine at Bletchley." in text
+    assert "The bombe machine was designed to break Enigma." in text
+    assert stats['documents'] == 2
+    
+    text, stats = packer(1000).pack("Who designed the bombe machine?", docs)
+    assert words(text) == stats['context_tokens'] <= 1000
+    assert "filler20a" not in text  # Not leading, not in the chunk, no question term
+
+def test_near_duplicates_are_taken_once():
+    sentence = "Alan Turing broke the Enigma cipher during the war."
+    docs = [{"title": "Turing", "content": sentence},
+            {"title": "Enigma", "content": "Alan Turing broke the Enigma cipher during the war!"},
+            {"title": "Bletchley", "content": "Bletchley Park was where Enigma messages were read."}]
+    text, stats = packer(1000).pack("Who broke the Enigma cipher?", docs)
+    assert text.count("Alan Turing broke") == 1
+    assert stats['documents'] == 2 and "Document 2: Enigma" not in text
+    
+    text, _ = packer(1000, dedup_threshold=1.01).pack("Who broke the Enigma cipher?", docs)
+    assert text.count("Alan Turing broke") == 2  # Jaccard never reaches the threshold
+
+def test_sentences_are_emitted_in_document_order():
+    docs = [{"title": "First", "content": "Enigma intro. Nothing here. Enigma rotors were wired. The Enigma cipher fell."},
+            {"title": "Second", "content": "Turing studied the Enigma cipher closely."}]
+    text, _ = packer(1000).pack("Enigma cipher", docs)
+    assert text == ("Document 1: First\nEnigma intro. Nothing here. Enigma rotors were wired. The Enigma cipher fell."
+                    "\n\nDocument 2: Second\nTuring studied the Enigma cipher closely.")
+
+def test_chunk_sentences_are_candidates():
+    chunk = "Its capital is quiet at night."
+    docs = [{"title": "Town", "content": " ".join(FILLER[:4] + [chunk] + FILLER[4:8]), "chunk": chunk},
+            {"title": "Chunk only", "chunk": "Only a chunk was fetched. It mentions nothing relevant."}]
+    text, stats = packer(1000).pack("What about the bombe?", docs)
+    assert chunk in text
+    assert "filler5a" not in text
+    assert "Document 2: Chunk only\nOnly a chunk was fetched. It mentions nothing relevant." in text
+    assert stats['sentences'] == 2 + 1 + 2  # Two lead sentences and the chunk's, and the whole chunk
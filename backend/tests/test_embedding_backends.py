@@ -0,0 +1,44 @@
+"""ONNX embedding backends stay within their cosine tolerance of the PyTorch embeddings."""
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+from app.embedding_cache import EmbeddingCache
+from app.embeddings import EmbeddingGenerator
+from benchmarks.embedding_backends import TOLERANCE
+
+TEXTS = [
+    "Graph neural networks learn representations of nodes from their neighbours.",
+    "The French Revolution began in 1789.",
+    "Photosynthesis converts light energy into chemical energy.",
+    "Quantum entanglement links the states of two particles.",
+    "A vector index finds the nearest neighbours of a query embedding.",
+    "short",
+]
+
+@pytest.fixture(scope="module")
+def onnx_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("onnx_models"))
+
+def embed(backend: str, monkeypatch, onnx_dir: str) -> np.ndarray:
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", onnx_dir)
+    generator = EmbeddingGenerator(cache=EmbeddingCache(max_size=0), backend=backend)
+    return np.asarray(generator.generate_embeddings_batch(TEXTS, show_progress_bar=False), dtype='float32')
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_backend_within_tolerance_of_torch(backend, monkeypatch, onnx_dir):
+    reference = embed("torch", monkeypatch, onnx_dir)
+    embeddings = embed(backend, monkeypatch, onnx_dir)
+    assert embeddings.shape == reference.shape
+    cosine = (embeddings * reference).sum(axis=1) / (
+        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+    assert cosine.min() >= TOLERANCE[backend]
+
+def test_backends_are_cached_separately(monkeypatch, onnx_dir):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", onnx_dir)
+    names = {backend: EmbeddingGenerator(cache=EmbeddingCache(max_size=0), backend=backend).model_name
+             for backend in ("torch", "onnx", "onnx-int8")}
+    assert len(set(names.values())) == 3
@@ -0,0 +1,99 @@
+"""EmbeddingBatcher: batches close on size or wait, results go back to the right callers."""
+import asyncio
+import time
+
+import numpy as np
+
+from app.embedding_batcher import EmbeddingBatcher
+from app.embedding_cache import EmbeddingCache
+
+class FakeGenerator:
+    """Embeds a text as [len(text), index of the call]; records each batch."""
+    
+    model_name = "fake"
+    
+    def __init__(self, fail: bool = False):
+        self.cache = EmbeddingCache(max_size=100, disk_path="")
+        self.fail = fail
+        self.batches = []
+    
+    def generate_query_embeddings(self, texts, check_cache=True):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [np.array([len(text), len(self.batches)], dtype='float32') for text in texts]
+
+def queue_requests(batcher: EmbeddingBatcher, texts):
+    batcher._queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    for text in texts:
+        batcher._queue.put_nowait((text, loop.create_future()))
+
+def test_collect_closes_full_batch_without_waiting():
+    async def main():
+        batcher = EmbeddingBatcher(FakeGenerator(), max_batch_size=4, max_wait_ms=1000)
+        queue_requests(batcher, [f"q{i}" for i in range(6)])
+        start = time.perf_counter()
+        batch = await batcher._collect()
+        return [text for text, _ in batch], time.perf_counter() - start, batcher._queue.qsize()
+    
+    texts, elapsed, left = asyncio.run(main())
+    assert texts == ["q0", "q1", "q2", "q3"]
+    assert left == 2
+    assert elapsed < 0.5
+
+def test_collect_waits_for_stragglers_until_deadline():
+    async def main():
+        batcher = EmbeddingBatcher(FakeGenerator(), max_batch_size=8, max_wait_ms=100)
+        queue_requests(batcher, ["first"])
+        
+        async def straggler():
+            await asyncio.sleep(0.02)
+            await batcher._queue.put(("second", asyncio.get_running_loop().create_future()))
+        
+        start = time.perf_counter()
+        batch, _ = await asyncio.gather(batcher._collect(), straggler())
+        return [text for text, _ in batch], time.perf_counter() - start
+    
+    texts, elapsed = asyncio.run(main())
+    assert texts == ["first", "second"]
+    assert 0.09 <= elapsed < 0.5  # Held open for max_wait, then closed part-full
+
+def test_concurrent_embeds_share_batches():
+    generator = FakeGenerator()
+    
+    async def main():
+        batcher = EmbeddingBatcher(generator, max_batch_size=4, max_wait_ms=20)
+        texts = ["a" * i for i in range(1, 11)]
+        try:
+            return texts, await asyncio.gather(*(batcher.embed(text) for text in texts))
+        finally:
+            await batcher.stop()
+    
+    texts, embeddings = asyncio.run(main())
+    assert [len(batch) for batch in generator.batches] == [4, 4, 2]
+    assert [int(embedding[0]) for embedding in embeddings] == [len(text) for text in texts]
+    assert sorted(sum(generator.batches, [])) == sorted(texts)
+    assert generator.batches[0] == texts[:4]  # First come, first batched
+
+def test_cached_text_skips_the_queue():
+    generator = FakeGenerator()
+    generator.cache.put("fake", "cached", np.array([7.0, 0.0], dtype='float32'))
+    
+    async def main():
+        batcher = EmbeddingBatcher(generator, max_batch_size=4, max_wait_ms=1)
+        return await batcher.embed("cached")
+    
+    assert asyncio.run(main()).tolist() == [7.0, 0.0]
+    assert generator.batches == []
+
+def test_model_error_fails_the_whole_batch():
+    async def main():
+        batcher = EmbeddingBatcher(FakeGenerator(fail=True), max_batch_size=4, max_wait_ms=20)
+        try:
+            return await asyncio.gather(*(batcher.embed(f"q{i}") for i in range(3)), return_exceptions=True)
+        finally:
+            await batcher.stop()
+    
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,104 @@
+"""EmbeddingStore: quantized round trips, reuse without model calls and segment compaction."""
+import os
+
+import numpy as np
+import pytest
+
+from app.embedding_store import EmbeddingStore, dequantize, quantize
+from benchmarks.fake_embedder import HashingEmbedder
+
+DIMENSION = 32
+TEXTS = [f"passage {i} about topic {i % 5}" for i in range(20)]
+
+class CountingEmbedder(HashingEmbedder):
+    """Records the texts sent to the model."""
+    
+    def __init__(self):
+        super().__init__(DIMENSION)
+        self.embedded = []
+    
+    def generate_embeddings_batch(self, texts, **kwargs):
+        self.embedded.extend(texts)
+        return super().generate_embeddings_batch(texts, **kwargs)
+
+def random_vectors(n: int, seed: int = 0, dimension: int = DIMENSION) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, dimension)).astype('float32')
+
+def segment_files(path) -> set:
+    return {name.split(".")[0] for name in os.listdir(path) if name.endswith(".npy")}
+
+def test_int8_quantization_error_is_within_half_a_step():
+    vectors = np.vstack([random_vectors(50), np.zeros((1, DIMENSION), dtype='float32')])
+    values, scales = quantize(vectors, "int8")
+    assert values.dtype == np.int8 and scales.dtype == np.float32
+    assert np.abs(values).max() == 127
+    restored = dequantize(values, scales)
+    assert np.all(np.abs(restored - vectors) <= scales[:, None] / 2 + 1e-6)
+    assert not restored[-1].any()  # Zero vectors stay zero
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 2e-2)])
+def test_round_trip_through_disk(tmp_path, dtype, tolerance):
+    vectors = random_vectors(len(TEXTS))
+    store = EmbeddingStore(path=str(tmp_path), dtype=dtype)
+    store.put_many("model", TEXTS, vectors)
+    assert store.flush() == len(TEXTS)
+    
+    reopened = EmbeddingStore(path=str(tmp_path), dtype=dtype)
+    assert len(reopened) == len(TEXTS)
+    found = reopened.get_many("model", TEXTS[::-1] + ["never stored"])
+    assert found[-1] is None
+    np.testing.assert_allclose(np.stack(found[:-1]), vectors[::-1], atol=tolerance * np.abs(vectors).max())
+    assert reopened.get_many("other model", TEXTS[:1]) == [None]  # Keys include the model name
+
+def test_embed_reuses_stored_vectors(tmp_path):
+    embedder = CountingEmbedder()
+    store = EmbeddingStore(path=str(tmp_path), dtype="int8")
+    first = store.embed(embedder, TEXTS[:10] + TEXTS[:2])  # Repeated texts are embedded once
+    assert embedder.embedded == TEXTS[:10]
+    store.flush()
+    
+    embedder.embedded = []
+    reopened = EmbeddingStore(path=str(tmp_path), dtype="int8")
+    second = reopened.embed(embedder, TEXTS)
+    assert embedder.embedded == TEXTS[10:]
+    assert (reopened.hits, reopened.misses) == (10, 10)
+    np.testing.assert_allclose(second[:10], first[:10], atol=0.02)
+    np.testing.assert_array_equal(second[10:], embedder.generate_embeddings_batch(TEXTS[10:]))
+
+def test_flush_compacts_past_max_segments(tmp_path):
+    store = EmbeddingStore(path=str(tmp_path), dtype="int8", max_segments=2)
+    store.put_many("model", TEXTS[:10], random_vectors(10, seed=1))
+    store.flush()
+    store.put_many("model", TEXTS[5:15], random_vectors(10, seed=2))  # Overwrites TEXTS[5:10]
+    store.flush()
+    assert store.get_stats()['segments'] == 2
+    
+    newest = random_vectors(10, seed=3)
+    store.put_many("model", TEXTS[10:], newest)
+    store.flush()
+    assert store.get_stats()['segments'] == 1 and len(store) == len(TEXTS)
+    assert len(segment_files(tmp_path)) == 1  # Merged segments' files are deleted
+    
+    reopened = EmbeddingStore(path=str(tmp_path), dtype="int8")
+    found = np.stack(reopened.get_many("model", TEXTS))
+    np.testing.assert_allclose(found[5:10], random_vectors(10, seed=2)[:5], atol=0.05)  # Newest copy kept
+    np.testing.assert_allclose(found[10:], newest, atol=0.05)
+
+def test_compaction_converts_dtype_and_keeps_dimensions_apart(tmp_path):
+    vectors = random_vectors(len(TEXTS))
+    store = EmbeddingStore(path=str(tmp_path), dtype="float16")
+    store.put_many("model", TEXTS, vectors)
+    store.put_many("small model", TEXTS[:3], random_vectors(3, dimension=8))
+    store.flush()
+    assert store.get_stats()['segments'] == 2  # One per vector dimension
+    
+    converted = EmbeddingStore(path=str(tmp_path), dtype="int8")
+    converted.put_many("model", ["extra text"], random_vectors(1, seed=5))
+    converted.flush()
+    converted.compact()
+    assert converted.get_stats()['segments'] == 2
+    # The merged segments are rewritten as int8, a lone segment is left as it is
+    assert {segment['vectors'].shape[1]: segment['vectors'].dtype.name for segment in converted._segments} == {
+        DIMENSION: "int8", 8: "float16"}
+    np.testing.assert_allclose(np.stack(converted.get_many("model", TEXTS)), vectors, atol=0.05)
+    assert converted.get_many("small model", TEXTS[:1])[0].shape == (8,)
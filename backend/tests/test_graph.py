@@ -0,0 +1,95 @@
+"""KnowledgeGraph: CSR construction, k-hop expansion and personalized PageRank."""
+import numpy as np
+import pytest
+
+from app.graph import KnowledgeGraph
+
+DOCUMENTS = [
+    (1, "Alan Turing", ["Enigma", "Computer science", "Alan  turing"]),
+    (2, "Enigma", ["World War II"]),
+    (3, "Computer Science", ["Alan Turing"]),  # Same edge as from Alan Turing
+    (4, "Quantum physics", ["Physics"]),
+]
+TURING, ENIGMA, CS, QUANTUM, WW2, PHYSICS = range(6)  # Documents first, then entity-only nodes
+
+@pytest.fixture
+def graph():
+    graph = KnowledgeGraph(max_nodes=100, max_degree=50, ppr_hops=2, alpha=0.85, iterations=50)
+    graph.build(DOCUMENTS)
+    return graph
+
+def test_builds_undirected_csr(graph):
+    assert graph.num_nodes == 6 and graph.num_edges == 4  # No self-loop, duplicate edge stored once
+    assert [graph.title(node) for node in range(6)] == ["Alan Turing", "Enigma", "Computer Science",
+                                                         "Quantum physics", "World War II", "Physics"]
+    assert graph.node_doc.tolist() == [1, 2, 3, 4, -1, -1]
+    neighbours = {node: sorted(graph.indices[graph.indptr[node]:graph.indptr[node + 1]].tolist())
+                  for node in range(6)}
+    assert neighbours == {TURING: [ENIGMA, CS], ENIGMA: [TURING, WW2], CS: [TURING],
+                          QUANTUM: [PHYSICS], WW2: [ENIGMA], PHYSICS: [QUANTUM]}
+
+def test_expand_by_hops(graph):
+    nodes, depth = graph.expand([TURING], hops=2)
+    assert nodes.tolist() == [TURING, ENIGMA, CS, WW2]
+    assert depth.tolist() == [0, 1, 1, 2]
+    
+    assert graph.expand([TURING], hops=2, max_nodes=2)[0].tolist() == [TURING, ENIGMA]
+    graph.max_degree = 1  # Only the first (lowest) neighbour is followed
+    assert graph.expand([TURING], hops=1)[0].tolist() == [TURING, ENIGMA]
+
+def test_neighbors(graph):
+    assert graph.neighbors(2, hops=1) == [{'title': "Alan Turing", 'doc_id': 1, 'hops': 1},
+                                          {'title': "World War II", 'doc_id': None, 'hops': 1}]
+    assert [n['title'] for n in graph.neighbors(1, hops=2, limit=2)] == ["Enigma", "Computer Science"]
+    assert graph.neighbors(99) is None
+
+def dense_pagerank(graph, nodes, seeds, alpha, iterations):
+    """Reference personalized PageRank with a dense matrix over the same subgraph."""
+    index = {node: i for i, node in enumerate(nodes.tolist())}
+    adjacency = np.zeros((len(nodes), len(nodes)))
+    for node, i in index.items():
+        for neighbour in graph.indices[graph.indptr[node]:graph.indptr[node + 1]].tolist():
+            if neighbour in index:
+                adjacency[i, index[neighbour]] = 1.0
+    degree = adjacency.sum(axis=1)
+    restart = np.zeros(len(nodes))
+    for node, weight in seeds.items():
+        restart[index[node]] = weight
+    restart /= restart.sum()
+    scores = restart.copy()
+    for _ in range(iterations):
+        spread = (scores / np.where(degree > 0, degree, 1)) @ adjacency
+        scores = alpha * (spread + scores[degree == 0].sum() * restart) + (1 - alpha) * restart
+    return scores
+
+def test_personalized_pagerank_matches_dense_reference(graph):
+    seeds = {TURING: 2.0, WW2: 1.0}
+    nodes, scores = graph.personalized_pagerank(seeds)
+    
+    assert set(nodes.tolist()) == {TURING, ENIGMA, CS, WW2}  # The other component is never reached
+    assert scores.sum() == pytest.approx(1.0)
+    np.testing.assert_allclose(scores, dense_pagerank(graph, nodes, seeds, 0.85, 50), rtol=1e-9)
+    ranked = nodes[np.argsort(-scores)].tolist()
+    assert ranked[0] == TURING
+
+def test_rerank_pulls_in_linked_documents(graph):
+    results = [(1, 0.9, 10), (4, 0.2, 40)]
+    reranked = graph.rerank(results, top_k=4)
+    
+    assert [doc_id for doc_id, _, _ in reranked][0] == 1
+    assert {doc_id for doc_id, _, _ in reranked} == {1, 2, 3, 4}
+    assert dict((doc_id, chunk) for doc_id, _, chunk in reranked)[2] is None  # Reached through the graph
+    
+    filtered = graph.rerank(results, top_k=4, allow=lambda doc_id: doc_id != 3)
+    assert 3 not in {doc_id for doc_id, _, _ in filtered}
+    assert graph.rerank([(99, 1.0, 5)], top_k=2) == [(99, 1.0, 5)]  # Not in the graph
+
+def test_save_and_load(graph, tmp_path):
+    path = str(tmp_path / "graph.npz")
+    graph.save(path)
+    loaded = KnowledgeGraph(path=path)
+    assert loaded.load()
+    assert loaded.doc_to_node == graph.doc_to_node
+    assert loaded.title(WW2) == "World War II"
+    np.testing.assert_array_equal(loaded.indices, graph.indices)
+    assert not KnowledgeGraph(path=str(tmp_path / "missing.npz")).load()
@@ -0,0 +1,46 @@
+"""fuse_rankings: reciprocal rank fusion and weighted score fusion."""
+import pytest
+
+from app.hybrid import fuse_rankings
+
+DENSE = [(1, 0.9, 10), (2, 0.8, 20), (3, 0.1, 30)]
+SPARSE = [(3, 12.0, 31), (4, 9.0, 40), (1, 3.0, 11)]
+
+def test_rrf_rewards_documents_in_both_rankings():
+    fused = fuse_rankings(DENSE, SPARSE, top_k=4, method="rrf", rrf_k=60)
+    
+    scores = {doc_id: score for doc_id, score, _ in fused}
+    assert scores[1] == pytest.approx(1 / 61 + 1 / 63)
+    assert scores[3] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores[2] == pytest.approx(1 / 62)
+    assert [doc_id for doc_id, _, _ in fused][2:] == [2, 4]  # Ties with 4 broken by dense first
+
+def test_rrf_ignores_raw_scores():
+    scaled = [(doc_id, score * 1000, chunk) for doc_id, score, chunk in SPARSE]
+    assert fuse_rankings(DENSE, scaled, top_k=4, method="rrf") == fuse_rankings(DENSE, SPARSE, top_k=4, method="rrf")
+
+def test_weighted_fusion_mixes_normalized_scores():
+    fused = fuse_rankings(DENSE, SPARSE, top_k=4, method="weighted", alpha=0.75)
+    
+    scores = {doc_id: score for doc_id, score, _ in fused}
+    # Dense scores scale to 1, 0.875, 0; sparse to 1, 0.667, 0
+    assert scores[1] == pytest.approx(0.75 * 1.0)
+    assert scores[2] == pytest.approx(0.75 * 0.875)
+    assert scores[3] == pytest.approx(0.25 * 1.0)
+    assert scores[4] == pytest.approx(0.25 * 6 / 9)
+    assert [doc_id for doc_id, _, _ in fused] == [1, 2, 3, 4]
+    
+    sparse_only = fuse_rankings(DENSE, SPARSE, top_k=2, method="weighted", alpha=0.0)
+    assert [doc_id for doc_id, _, _ in sparse_only] == [3, 4]
+
+def test_keeps_dense_chunk_and_truncates():
+    fused = fuse_rankings(DENSE, SPARSE, top_k=3, method="rrf")
+    chunks = {doc_id: chunk_id for doc_id, _, chunk_id in fused}
+    assert len(fused) == 3
+    assert chunks[1] == 10 and chunks[3] == 30  # The dense hit's chunk wins
+    assert fuse_rankings([], SPARSE, top_k=1, method="rrf")[0][::2] == (3, 31)
+
+def test_single_result_and_unknown_method():
+    assert fuse_rankings([(5, 0.3, None)], [], top_k=5, method="weighted", alpha=0.5) == [(5, 0.5, None)]
+    with pytest.raises(ValueError):
+        fuse_rankings(DENSE, SPARSE, top_k=3, method="borda")
@@ -0,0 +1,124 @@
+"""IngestionPipeline: incremental re-ingestion and resuming after a failed run."""
+import time
+
+import numpy as np
+import pytest
+
+from app.chunking import TextChunker
+from app.database import Document, DocumentChunk
+from app.ingestion import IngestionPipeline
+from app.vector_store import FAISSVectorStore
+from benchmarks.fake_embedder import HashingEmbedder
+
+DIMENSION = 64
+DOCS = [{"title": f"Doc {i}", "content": f"Document {i} talks about subject {i}. " * 40,
+         "source_link": f"https://example.org/{i}", "topic": "test"} for i in range(12)]
+
+class FlakyEmbedder(HashingEmbedder):
+    """Fails every embedding call after the first fail_after, once store holds their vectors."""
+    
+    def __init__(self, fail_after: int, store: FAISSVectorStore):
+        super().__init__(DIMENSION)
+        self.calls = 0
+        self.fail_after = fail_after
+        self.store = store
+    
+    def generate_embeddings_batch(self, texts, **kwargs):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            deadline = time.monotonic() + 5
+            while (self.store.index is None or not self.store.index.ntotal) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            raise RuntimeError("embedding service unavailable")
+        return super().generate_embeddings_batch(texts, **kwargs)
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "index.bin")
+
+def saved_store(index_path) -> FAISSVectorStore:
+    store = FAISSVectorStore(dimension=DIMENSION, index_path=index_path)
+    store.load()
+    return store
+
+def ingest(session_factory, index_path, docs, embedder=None, store=None) -> dict:
+    pipeline = IngestionPipeline(embedder or HashingEmbedder(DIMENSION), store or saved_store(index_path),
+                                 chunker=TextChunker(max_tokens=60, overlap_tokens=10),
+                                 session_factory=session_factory, db_batch_size=3, embed_batch_size=8)
+    return pipeline.run(docs)
+
+def stored_chunks(session_factory) -> dict:
+    """Document ID -> its chunk IDs in order."""
+    db = session_factory()
+    try:
+        chunks = {}
+        for row in db.query(DocumentChunk).order_by(DocumentChunk.document_id, DocumentChunk.chunk_index):
+            chunks.setdefault(row.document_id, []).append(row.id)
+        return chunks
+    finally:
+        db.close()
+
+def test_indexes_every_chunk_and_skips_unchanged(session_factory, index_path):
+    stats = ingest(session_factory, index_path, DOCS)
+    assert stats['documents'] == len(DOCS)
+    assert stats['chunks'] == stats['vectors'] > len(DOCS)
+    
+    store = saved_store(index_path)
+    chunks = stored_chunks(session_factory)
+    assert store.doc_to_ids == chunks
+    db = session_factory()
+    try:
+        assert {row.id: row.embedding_id for row in db.query(Document)} == {
+            doc_id: ids[0] for doc_id, ids in chunks.items()}
+    finally:
+        db.close()
+    
+    stats = ingest(session_factory, index_path, DOCS)
+    assert stats['skipped'] == len(DOCS) and stats['vectors'] == 0
+
+def test_changed_document_is_rechunked(session_factory, index_path):
+    ingest(session_factory, index_path, DOCS)
+    before = stored_chunks(session_factory)
+    
+    edited = [dict(DOCS[0], content=DOCS[0]["content"] + "It has since been expanded. " * 30)] + DOCS[1:]
+    stats = ingest(session_factory, index_path, edited)
+    assert (stats['documents'], stats['updated'], stats['skipped']) == (0, 1, len(DOCS) - 1)
+    
+    after = stored_chunks(session_factory)
+    doc_id = min(after)  # Doc 0 keeps its ID
+    assert after.keys() == before.keys()
+    assert len(after[doc_id]) > len(before[doc_id])
+    assert not set(after[doc_id]) & set(before[doc_id])
+    
+    store = saved_store(index_path)
+    assert store.doc_to_ids[doc_id] == after[doc_id]
+    assert not np.isin(before[doc_id], store.id_arrays()[0]).any()  # Old vectors are gone
+
+def test_rerun_after_failure_indexes_the_rest(session_factory, index_path):
+    store = saved_store(index_path)
+    with pytest.raises(RuntimeError):
+        ingest(session_factory, index_path, DOCS, embedder=FlakyEmbedder(1, store), store=store)
+    saved = saved_store(index_path).num_documents()
+    assert 0 < saved < len(DOCS)  # The batches indexed before the failure were saved
+    
+    stats = ingest(session_factory, index_path, DOCS)
+    # Documents stored by the failed run but never indexed are re-chunked, the indexed ones skipped
+    assert stats['skipped'] == saved
+    assert stats['documents'] + stats['updated'] == len(DOCS) - saved
+    assert saved_store(index_path).doc_to_ids == stored_chunks(session_factory)
+
+def test_unindexed_finds_documents_with_missing_chunks(session_factory, index_path):
+    ingest(session_factory, index_path, DOCS)
+    chunks = stored_chunks(session_factory)
+    first, second, third = sorted(chunks)[:3]
+    
+    pipeline = IngestionPipeline(HashingEmbedder(DIMENSION), saved_store(index_path), session_factory=session_factory)
+    # As if the saved index predates first's last chunk and all of second's
+    missing = {chunks[first][-1], *chunks[second]}
+    pipeline._live_keys = np.array(sorted(key for ids in chunks.values() for key in ids if key not in missing))
+    db = session_factory()
+    try:
+        assert pipeline._unindexed([first, second, third], db) == {first, second}
+        assert pipeline._unindexed([], db) == set()
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+"""QueryLogWriter: batches by size or interval, drops when full, flushes on stop."""
+import asyncio
+import time
+
+from app.database import QueryLog
+from app.query_log import QueryLogWriter
+
+def record(i: int) -> dict:
+    return {"query": f"q{i}", "timestamp": time.time(), "result_count": i, "endpoint": "/search", "latency_ms": 1.0}
+
+def logged_queries(session_factory):
+    db = session_factory()
+    try:
+        return [row.query for row in db.query(QueryLog).order_by(QueryLog.id)]
+    finally:
+        db.close()
+
+def test_full_queue_drops_and_stop_flushes(session_factory):
+    writer = QueryLogWriter(max_queue=3, batch_size=10, flush_interval_ms=10000, session_factory=session_factory)
+    
+    async def main():
+        for i in range(5):
+            writer.log(record(i))  # The writer task has not run yet, so nothing leaves the queue
+        stats = writer.get_stats()
+        await writer.stop()
+        return stats
+    
+    stats = asyncio.run(main())
+    assert (stats['queued'], stats['dropped']) == (3, 2)
+    assert logged_queries(session_factory) == ["q0", "q1", "q2"]
+    assert writer.get_stats()['queued'] == 0 and writer.written == 3
+
+def test_writes_full_batches_without_waiting(session_factory):
+    writer = QueryLogWriter(max_queue=100, batch_size=4, flush_interval_ms=10000, session_factory=session_factory)
+    
+    async def main():
+        for i in range(10):
+            writer.log(record(i))
+        deadline = time.monotonic() + 5
+        while writer.written < 8 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        written = writer.written
+        await writer.stop()
+        return written
+    
+    assert asyncio.run(main()) == 8  # Two full batches; the last two wait for the interval
+    assert writer.batches == 3 and writer.written == 10
+    assert logged_queries(session_factory) == [f"q{i}" for i in range(10)]
+
+def test_partial_batch_written_after_interval(session_factory):
+    writer = QueryLogWriter(max_queue=100, batch_size=100, flush_interval_ms=50, session_factory=session_factory)
+    
+    async def main():
+        for i in range(3):
+            writer.log(record(i))
+        await asyncio.sleep(0.3)
+        written = writer.written
+        await writer.stop()
+        return written
+    
+    assert asyncio.run(main()) == 3
+    assert writer.batches == 1
+
+def test_failed_write_is_counted(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")  # No query_logs table
+    writer = QueryLogWriter(max_queue=10, batch_size=10, flush_interval_ms=10, session_factory=sessionmaker(bind=engine))
+    
+    async def main():
+        writer.log(record(0))
+        writer.log(record(1))
+        await writer.stop()
+    
+    asyncio.run(main())
+    engine.dispose()
+    assert (writer.written, writer.failed) == (0, 2)
@@ -0,0 +1,95 @@
+"""WikipediaScraper against a local fake of Wikipedia: retries, rate limiting, resume."""
+import os
+
+import pytest
+
+from app.scraper import WikipediaScraper
+
+ARTICLES = {f"Page {i}": f"Article number {i} about a topic." for i in range(12)}
+
+def make_scraper(tmp_path, **kwargs):
+    options = {"workers": 3, "rate_limit": 0, "max_retries": 2, "backoff": 0}
+    options.update(kwargs)
+    return WikipediaScraper(data_dir=str(tmp_path), **options)
+
+def test_retries_transient_errors(tmp_path, fake_wikipedia):
+    fake = fake_wikipedia(ARTICLES, flaky={"Page 1": 2, "Page 2": 5}, missing={"Page 3"})
+    docs = make_scraper(tmp_path).scrape_topics(["topic"])
+    
+    titles = {doc["title"] for doc in docs}
+    assert "Page 1" in titles  # Succeeded on the last retry
+    assert "Page 2" not in titles and "Page 3" not in titles
+    assert titles == set(ARTICLES) - {"Page 2", "Page 3"}
+    assert fake.page_calls["Page 1"] == 3
+    assert fake.page_calls["Page 2"] == 3  # max_retries + 1 attempts
+    assert fake.page_calls["Page 3"] == 1  # Missing pages are not retried
+
+def test_rate_limit_spaces_requests(tmp_path, fake_wikipedia):
+    fake = fake_wikipedia(ARTICLES)
+    make_scraper(tmp_path, workers=4, rate_limit=100).scrape_topics(["topic"])
+    
+    times = sorted(t for t, _, _ in fake.calls)
+    assert len(times) == len(ARTICLES) + 1
+    # Calls are logged after the limiter releases them, so allow one interval of thread scheduling jitter
+    spans = [b - a for a, b in zip(times, times[4:])]
+    assert min(spans) >= 0.01 * 3
+    assert times[-1] - times[0] >= 0.01 * (len(times) - 1) * 0.9
+
+def test_bounded_fetches_in_flight(tmp_path, fake_wikipedia):
+    fake = fake_wikipedia(ARTICLES, delay=0.01)
+    pages = make_scraper(tmp_path, workers=2).iter_topics(["topic"])
+    next(pages)
+    assert sum(fake.page_calls.values()) <= 2 * 2 + 1
+    assert len(list(pages)) == len(ARTICLES) - 1
+    assert fake.max_running <= 2
+
+def test_resume_skips_finished_pages(tmp_path, fake_wikipedia):
+    fake = fake_wikipedia(ARTICLES)
+    scraper = make_scraper(tmp_path)
+    pages = scraper.iter_topics(["topic"])
+    first = [next(pages)["title"] for _ in range(5)]
+    pages.close()  # Interrupted run
+    checkpoint = scraper.checkpoint_file(["topic"], 50)
+    assert os.path.exists(checkpoint)
+    
+    fake = fake_wikipedia(ARTICLES)
+    resumed = list(make_scraper(tmp_path).iter_topics(["topic"], resume=True))
+    assert sorted(doc["title"] for doc in resumed) == sorted(ARTICLES)
+    assert not set(first) & set(fake.page_calls)
+    assert sum(fake.page_calls.values()) == len(ARTICLES) - len(first)
+    assert all(doc["topic"] == "topic" for doc in resumed)
+
+def test_fresh_run_refetches_edited_pages(tmp_path, fake_wikipedia):
+    fake_wikipedia(ARTICLES)
+    scraper = make_scraper(tmp_path)
+    list(scraper.iter_topics(["topic"]))
+    
+    edited = dict(ARTICLES, **{"Page 0": "Article number 0, edited since."})
+    fake = fake_wikipedia(edited)
+    docs = {doc["title"]: doc for doc in scraper.iter_topics(["topic"])}
+    assert sum(fake.page_calls.values()) == len(ARTICLES)
+    assert docs["Page 0"]["content"] == "Article number 0, edited since."
+
+def test_checkpoint_is_per_topics_and_cleared(tmp_path, fake_wikipedia):
+    fake_wikipedia(ARTICLES)
+    scraper = make_scraper(tmp_path)
+    assert scraper.checkpoint_file(["a"], 50) != scraper.checkpoint_file(["b"], 50)
+    
+    list(scraper.iter_topics(["a"]))
+    assert os.path.exists(scraper.checkpoint_file(["a"], 50))
+    scraper.clear_checkpoint(["a"], 50)
+    assert not os.path.exists(scraper.checkpoint_file(["a"], 50))
+    
+    scraper.scrape_topics(["b"])  # Complete scrapes clean up after themselves
+    assert not os.path.exists(scraper.checkpoint_file(["b"], 50))
+
+@pytest.mark.parametrize("resume", [False, True])
+def test_failed_pages_are_fetched_again(tmp_path, fake_wikipedia, resume):
+    fake_wikipedia(ARTICLES, flaky={"Page 4": 3})
+    scraper = make_scraper(tmp_path)
+    assert "Page 4" not in {doc["title"] for doc in scraper.iter_topics(["topic"])}
+    
+    fake = fake_wikipedia(ARTICLES)
+    titles = {doc["title"] for doc in scraper.iter_topics(["topic"], resume=resume)}
+    assert "Page 4" in titles
+    assert fake.page_calls["Page 4"] == 1
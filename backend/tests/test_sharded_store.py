@@ -0,0 +1,112 @@
+"""ShardedVectorStore: routing by document, merged results, filters per shard and the manifest."""
+import faiss
+import numpy as np
+import pytest
+
+from app.attribute_index import AttributeIndex
+from app.sharded_store import ShardedVectorStore, create_vector_store, saved_shards
+from app.vector_store import FAISSVectorStore
+
+DIMENSION = 16
+NUM_DOCS = 60
+CHUNKS_PER_DOC = 2
+NUM_SHARDS = 3
+
+@pytest.fixture(scope="module")
+def corpus():
+    doc_ids = [doc_id for doc_id in range(1, NUM_DOCS + 1) for _ in range(CHUNKS_PER_DOC)]
+    keys = [doc_id * 10 + i for doc_id in range(1, NUM_DOCS + 1) for i in range(CHUNKS_PER_DOC)]
+    vectors = np.random.default_rng(0).standard_normal((len(keys), DIMENSION)).astype('float32')
+    return vectors, doc_ids, keys
+
+def build(tmp_path, corpus, index_type: str = "flat", num_shards: int = NUM_SHARDS):
+    store = ShardedVectorStore(num_shards, index_path=str(tmp_path / "index.bin"), dimension=DIMENSION,
+                               index_type=index_type, nlist=4, nprobe=4)
+    store.add_vectors(*corpus)
+    return store
+
+def single(tmp_path, corpus) -> FAISSVectorStore:
+    store = FAISSVectorStore(dimension=DIMENSION, index_path=str(tmp_path / "single.bin"), index_type="flat")
+    store.add_vectors(*corpus)
+    return store
+
+def test_routes_documents_to_one_shard(tmp_path, corpus):
+    store = build(tmp_path, corpus)
+    for shard, shard_store in enumerate(store.shards):
+        assert all(doc_id % NUM_SHARDS == shard for doc_id in shard_store.doc_to_ids)
+    assert store.get_stats()['shard_vectors'] == [40, 40, 40]
+    assert store.num_documents() == NUM_DOCS and store.index.ntotal == len(corpus[2])
+    keys, doc_ids = store.id_arrays()
+    assert keys.tolist() == sorted(corpus[2]) and doc_ids.tolist() == corpus[1]
+    assert store.document_embedding_id(7) == 70
+    
+    assert store.delete([7, 8]) == 2 * CHUNKS_PER_DOC
+    assert store.document_embedding_id(7) is None
+    assert store.num_documents() == NUM_DOCS - 2
+
+def test_merged_results_match_single_store(tmp_path, corpus):
+    vectors, _, _ = corpus
+    sharded, reference = build(tmp_path, corpus), single(tmp_path, corpus)
+    queries = vectors[::7]
+    
+    for merged, expected in zip(sharded.search_documents_batch(queries, top_k=8),
+                                reference.search_documents_batch(queries, top_k=8)):
+        assert [(doc_id, chunk) for doc_id, _, chunk in merged] == [(doc_id, chunk) for doc_id, _, chunk in expected]
+        np.testing.assert_allclose([score for _, score, _ in merged], [score for _, score, _ in expected], rtol=1e-5)
+    assert [key for key, _ in sharded.search(vectors[3], top_k=5)] == [key for key, _ in reference.search(vectors[3], top_k=5)]
+
+def test_ivf_shards_share_one_quantizer(tmp_path, corpus):
+    store = build(tmp_path, corpus, index_type="ivf_flat")
+    centroids = [faiss.extract_index_ivf(shard.index).quantizer.reconstruct_n(0, 4) for shard in store.shards]
+    assert all(np.array_equal(centroids[0], other) for other in centroids[1:])
+    assert store.search_documents(corpus[0][0], top_k=1)[0][0] == 1
+
+def test_filter_is_restricted_per_shard(tmp_path, corpus, monkeypatch):
+    vectors, doc_ids, keys = corpus
+    store = build(tmp_path, corpus)
+    attributes = AttributeIndex()
+    attributes.build([(doc_id, "even" if doc_id % 2 == 0 else "odd", "") for doc_id in range(1, NUM_DOCS + 1)],
+                     np.array(keys), np.array(doc_ids))
+    
+    searched = []
+    for shard, shard_store in enumerate(store.shards):
+        def search(*args, shard=shard, original=shard_store.search_documents_batch, **kwargs):
+            searched.append((shard, kwargs['id_filter'].count))
+            return original(*args, **kwargs)
+        monkeypatch.setattr(shard_store, "search_documents_batch", search)
+    
+    # Documents 3, 6 and 9 are all in shard 0: the other shards are skipped
+    id_filter = attributes.filter(doc_ids=[3, 6, 9])
+    results = store.search_documents(vectors[0], top_k=5, id_filter=id_filter)
+    assert sorted(doc_id for doc_id, _, _ in results) == [3, 6, 9]
+    assert searched == [(0, 3 * CHUNKS_PER_DOC)]
+    
+    searched.clear()
+    results = store.search_documents(vectors[0], top_k=10, id_filter=attributes.filter(topics=["even"]))
+    assert all(doc_id % 2 == 0 for doc_id, _, _ in results) and len(results) == 10
+    assert sorted(searched) == [(shard, NUM_DOCS // 2 // NUM_SHARDS * CHUNKS_PER_DOC) for shard in range(NUM_SHARDS)]
+    
+    # Cached shard bitmaps follow deletes
+    store.delete([6])
+    assert sorted(doc_id for doc_id, _, _ in store.search_documents(vectors[0], top_k=5, id_filter=id_filter)) == [3, 9]
+
+def test_manifest_save_and_load(tmp_path, corpus):
+    vectors, _, _ = corpus
+    store = build(tmp_path, corpus)
+    store.delete([5])
+    expected = store.search_documents_batch(vectors[::10], top_k=5)
+    path = str(tmp_path / "index.bin")
+    assert saved_shards(path) == 0
+    store.save()
+    assert saved_shards(path) == NUM_SHARDS
+    
+    loaded = create_vector_store(index_path=path, dimension=DIMENSION)
+    assert isinstance(loaded, ShardedVectorStore) and loaded.num_shards == NUM_SHARDS
+    assert loaded.load()
+    assert loaded.search_documents_batch(vectors[::10], top_k=5) == expected
+    
+    other = ShardedVectorStore(2, index_path=path, dimension=DIMENSION)  # Shard count comes from the manifest
+    assert other.load(mmap=True)
+    assert other.num_shards == NUM_SHARDS and other.read_only
+    assert other.search_documents_batch(vectors[::10], top_k=5) == expected
+    assert other.num_documents() == NUM_DOCS - 1
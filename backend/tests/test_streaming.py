@@ -0,0 +1,158 @@
+"""Streamed answers: token order, template fallback and closing the LLM stream."""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app import main
+from app.rag import RAGPipeline
+
+DOCS = [{"id": 1, "title": "Paris", "content": "Paris is the capital of France."},
+        {"id": 2, "title": "France", "content": "France is a country in Europe."}]
+
+class FakeLLM:
+    """Streams fixed tokens, optionally failing after fail_after of them or hanging after the last.
+    
+    Records whether the stream was closed, which is how the real client
+    cancels the completion request.
+    """
+    
+    def __init__(self, tokens, fail_after: int = None, hang: bool = False):
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.hang = hang
+        self.closed = False
+    
+    async def astream(self, prompt):
+        try:
+            for i, token in enumerate(self.tokens):
+                if i == self.fail_after:
+                    raise RuntimeError("upstream error")
+                yield token
+            if self.hang:
+                await asyncio.Event().wait()
+        finally:
+            self.closed = True
+
+async def collect(pipeline: RAGPipeline):
+    return [token async for token in pipeline.astream_answer("capital of France?", DOCS)]
+
+def test_streams_llm_tokens_and_closes_stream():
+    llm = FakeLLM(["Paris ", "is ", "the ", "capital."])
+    tokens = asyncio.run(collect(RAGPipeline(llm=llm)))
+    assert tokens == ["Paris ", "is ", "the ", "capital."]
+    assert llm.closed
+
+def test_template_fallback_streams_word_by_word(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    pipeline = RAGPipeline()
+    tokens = asyncio.run(collect(pipeline))
+    template = pipeline._template_response("capital of France?", DOCS)
+    assert len(tokens) == len(template.split()) > 1
+    assert tokens == re.findall(r"\S+\s*", template)
+
+def test_error_before_first_token_falls_back_to_template():
+    llm = FakeLLM(["Paris"], fail_after=0)
+    pipeline = RAGPipeline(llm=llm)
+    tokens = asyncio.run(collect(pipeline))
+    assert "".join(tokens) == pipeline._template_response("capital of France?", DOCS)
+    assert llm.closed
+
+def test_error_mid_stream_raises_and_closes_stream():
+    llm = FakeLLM(["Paris ", "is "], fail_after=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(RAGPipeline(llm=llm)))
+    assert llm.closed
+
+def test_closing_the_answer_closes_the_stream():
+    llm = FakeLLM(["Paris ", "is "], hang=True)
+    
+    async def first_token():
+        tokens = RAGPipeline(llm=llm).astream_answer("capital of France?", DOCS)
+        token = await tokens.__anext__()
+        await tokens.aclose()
+        return token
+    
+    assert asyncio.run(first_token()) == "Paris "
+    assert llm.closed
+
+@pytest.fixture
+def stream_app(monkeypatch):
+    """/ask/stream with retrieval stubbed out and the given LLM."""
+    async def retrieve(*args, **kwargs):
+        return DOCS
+    
+    class Batcher:
+        async def embed(self, text):
+            return None
+    
+    indexes = SimpleNamespace(knowledge_graph=SimpleNamespace(num_nodes=0),
+                              attribute_index=SimpleNamespace(filter=lambda **kwargs: None))
+    monkeypatch.setattr(main, "retrieve", retrieve)
+    
+    def install(llm):
+        pipeline = RAGPipeline(llm=llm)
+        main.app.dependency_overrides.update({
+            main.get_async_db: lambda: None,
+            main.get_indexes: lambda: indexes,
+            main.get_embedding_batcher: lambda: Batcher(),
+            main.get_rag_pipeline: lambda: pipeline,
+        })
+        return main.app
+    
+    yield install
+    main.app.dependency_overrides.clear()
+
+async def call_stream(app, disconnect_after_tokens: int = None):
+    """Drive /ask/stream over ASGI, disconnecting after that many token events.
+    
+    Uses ASGI spec 2.4, where Starlette does not watch for the disconnect
+    itself. Returns the (event, data) pairs received.
+    """
+    body = json.dumps({"question": "capital of France?", "top_k": 2}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+             "method": "POST", "scheme": "http", "path": "/ask/stream", "raw_path": b"/ask/stream",
+             "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+             "client": ("test", 1), "server": ("test", 80)}
+    events = []
+    disconnected = asyncio.Event()
+    body_sent = False
+    
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        if message["type"] != "http.response.body" or not message.get("body"):
+            return
+        for block in message["body"].decode().strip().split("\n\n"):
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+        tokens = sum(event == "token" for event, _ in events)
+        if disconnect_after_tokens is not None and tokens >= disconnect_after_tokens:
+            disconnected.set()
+    
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    return events
+
+def test_stream_event_order(stream_app):
+    app = stream_app(FakeLLM(["Paris ", "is ", "the ", "capital."]))
+    events = asyncio.run(call_stream(app))
+    
+    assert [event for event, _ in events] == ["documents", "token", "token", "token", "token", "done"]
+    assert events[0][1]["supporting_documents"] == ["Paris", "France"]
+    assert events[-1][1]["answer"] == "Paris is the capital."
+    assert "generate" in events[-1][1]["timings"]
+
+def test_disconnect_while_waiting_for_token_closes_stream(stream_app):
+    llm = FakeLLM(["Paris "], hang=True)  # Never sends a second token
+    events = asyncio.run(call_stream(stream_app(llm), disconnect_after_tokens=1))
+    
+    assert [event for event, _ in events] == ["documents", "token"]
+    assert llm.closed
@@ -0,0 +1,215 @@
+"""FAISSVectorStore: ID-mapped updates, tombstones and persistence for every index type."""
+import os
+import pickle
+from functools import lru_cache
+
+import faiss
+import numpy as np
+import pytest
+
+from app.vector_store import FAISSVectorStore, INDEX_TYPES
+
+DIMENSION = 16
+NUM_DOCS = 100
+CHUNKS_PER_DOC = 3  # 300 vectors, enough to train IVF-PQ's 256 centroids
+
+def make_store(tmp_path, index_type: str, **kwargs) -> FAISSVectorStore:
+    options = {"dimension": DIMENSION, "index_path": str(tmp_path / "index.bin"), "index_type": index_type,
+               "nlist": 4, "pq_m": 4, "hnsw_m": 8, "nprobe": 4, "compact_ratio": 1.0}
+    options.update(kwargs)
+    return FAISSVectorStore(**options)
+
+def random_vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype('float32')
+
+def chunk_ids(doc_id: int):
+    return [doc_id * 10 + i for i in range(CHUNKS_PER_DOC)]
+
+@pytest.fixture
+def corpus():
+    """(vectors, doc_ids, chunk_ids) for NUM_DOCS documents of CHUNKS_PER_DOC chunks each."""
+    doc_ids = [doc_id for doc_id in range(1, NUM_DOCS + 1) for _ in range(CHUNKS_PER_DOC)]
+    keys = [key for doc_id in range(1, NUM_DOCS + 1) for key in chunk_ids(doc_id)]
+    return random_vectors(len(keys)), doc_ids, keys
+
+@lru_cache(maxsize=None)
+def trained_index(index_type: str) -> faiss.Index:
+    """An empty index of the type trained on the corpus (PQ training is slow, so done once)."""
+    store = FAISSVectorStore(dimension=DIMENSION, index_type=index_type, nlist=4, pq_m=4, hnsw_m=8)
+    vectors = random_vectors(NUM_DOCS * CHUNKS_PER_DOC)
+    faiss.normalize_L2(vectors)
+    store.train(vectors)
+    return store.index
+
+def build(tmp_path, index_type: str, corpus, **kwargs) -> FAISSVectorStore:
+    store = make_store(tmp_path, index_type, **kwargs)
+    store.index = faiss.clone_index(trained_index(index_type))
+    store.apply_search_params()
+    store.add_vectors(*corpus)
+    return store
+
+def top_docs(store: FAISSVectorStore, query: np.ndarray, k: int = 5):
+    return [doc_id for doc_id, _, _ in store.search_documents(query, top_k=k)]
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_delete_tombstones_then_compact(tmp_path, corpus, index_type):
+    vectors, _, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    query = vectors[12]  # First chunk of document 5
+    assert top_docs(store, query)[0] == 5
+    assert store.search_documents(query, top_k=1)[0][2] == 50
+    
+    assert store.delete([5]) == CHUNKS_PER_DOC
+    assert store.tombstones == set(chunk_ids(5))
+    assert 5 not in top_docs(store, query, k=20)
+    assert store.get_stats()['total_vectors'] == len(vectors) - CHUNKS_PER_DOC
+    assert store.num_documents() == NUM_DOCS - 1
+    
+    assert store.compact() == CHUNKS_PER_DOC
+    assert store.index.ntotal == len(vectors) - CHUNKS_PER_DOC
+    assert not store.tombstones
+    assert 5 not in top_docs(store, query, k=20)
+    assert top_docs(store, vectors[15])[0] == 6
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_upsert_replaces_document_vectors(tmp_path, corpus, index_type):
+    vectors, _, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    replacement = random_vectors(2, seed=1)
+    
+    # Same ID for the first chunk, a new one for the second, the third chunk goes away
+    store.upsert(replacement, [5, 5], [50, 59])
+    assert store.doc_to_ids[5] == [50, 59]
+    assert top_docs(store, replacement[0])[0] == 5
+    assert store.search_documents(replacement[1], top_k=1)[0][2] == 59
+    assert store.num_documents() == NUM_DOCS
+    assert store.get_stats()['total_vectors'] == len(vectors) - 1
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_invalid_upsert_keeps_old_vectors(tmp_path, corpus, index_type):
+    vectors, _, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    
+    with pytest.raises(ValueError):
+        store.upsert(np.zeros((3, DIMENSION + 1), dtype='float32'), [5] * 3, chunk_ids(5))  # Wrong dimension
+    with pytest.raises(ValueError):
+        store.upsert(random_vectors(2), [5] * 3, chunk_ids(5))  # Fewer vectors than IDs
+    with pytest.raises(ValueError):
+        store.upsert(random_vectors(1), [5], [60])  # Chunk ID of document 6
+    
+    assert not store.tombstones
+    assert store.doc_to_ids[5] == chunk_ids(5)
+    assert top_docs(store, vectors[12])[0] == 5
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_tombstones_survive_save_and_load(tmp_path, corpus, index_type):
+    vectors, _, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    store.delete([5, 7])
+    store.save()
+    
+    loaded = make_store(tmp_path, "flat")  # Type and parameters come from the saved metadata
+    assert loaded.load()
+    assert loaded.index_type == index_type
+    assert loaded.tombstones == set(chunk_ids(5) + chunk_ids(7))
+    assert loaded.num_documents() == NUM_DOCS - 2
+    assert 5 not in top_docs(loaded, vectors[12], k=20)
+    assert top_docs(loaded, vectors[15])[0] == 6
+    
+    # Re-adding a deleted document compacts the old copies of its IDs away first
+    loaded.add_vectors(vectors[12:15], [5] * 3, chunk_ids(5))
+    assert top_docs(loaded, vectors[12])[0] == 5
+    assert not loaded.tombstones
+    assert 7 not in top_docs(loaded, vectors[18], k=20)
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_migrates_positional_pickle(tmp_path, corpus, index_type):
+    vectors, doc_ids, keys = corpus
+    path = str(tmp_path / "index.bin")
+    vectors = vectors.copy()
+    faiss.normalize_L2(vectors)
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(DIMENSION)
+    else:
+        index = faiss.index_factory(DIMENSION, "IVF4,Flat", faiss.METRIC_L2)
+        index.train(vectors)
+    index.add(vectors)  # Positional IDs 0..n-1
+    faiss.write_index(index, path)
+    mappings = {"id_to_doc": dict(enumerate(doc_ids)), "id_to_chunk": dict(enumerate(keys)),
+                "dimension": DIMENSION, "index_type": index_type, "index_params": {"nlist": 4}}
+    with open(path.replace('.bin', '_mappings.pkl'), 'wb') as f:
+        pickle.dump(mappings, f)
+    
+    store = make_store(tmp_path, "flat")
+    assert store.load()
+    assert store.chunked and store.index_type == index_type
+    assert store.doc_to_ids[5] == chunk_ids(5)
+    assert store.search_documents(vectors[12], top_k=1)[0][::2] == (5, 50)
+    
+    # Saving writes the array format and drops the pickle
+    store.save()
+    assert not os.path.exists(path.replace('.bin', '_mappings.pkl'))
+    reloaded = make_store(tmp_path, "flat")
+    reloaded.load()
+    assert reloaded.search_documents(vectors[12], top_k=1)[0][::2] == (5, 50)
+
+@pytest.mark.parametrize("index_type, index_class", [("flat", faiss.IndexFlat), ("ivf_flat", faiss.IndexIVFFlat),
+                                                     ("ivf_pq", faiss.IndexIVFPQ), ("hnsw", faiss.IndexHNSWFlat)])
+def test_factory_builds_configured_index(tmp_path, index_type, index_class):
+    store = make_store(tmp_path, index_type, nprobe=3, ef_search=40)
+    store.create_index()
+    index = faiss.downcast_index(store.index)
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    assert isinstance(index, index_class)
+    if index_type.startswith("ivf"):
+        assert index.nlist == 4 and index.nprobe == 3
+    elif index_type == "hnsw":
+        assert index.hnsw.efSearch == 40
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_search_finds_own_vectors(tmp_path, corpus, index_type):
+    vectors, doc_ids, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    hits = [top_docs(store, vector, k=1)[0] == doc_id for vector, doc_id in zip(vectors, doc_ids)]
+    assert np.mean(hits) >= 0.9
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq"])
+def test_too_few_training_vectors_fall_back_to_flat(tmp_path, index_type):
+    store = make_store(tmp_path, index_type, nlist=64)
+    store.add_vectors(random_vectors(20), list(range(20)))
+    assert store.index_type == "flat"
+    assert store.search(random_vectors(20)[3], top_k=1)[0][0] == 3
+
+def test_trains_on_a_sample(tmp_path, monkeypatch):
+    store = make_store(tmp_path, "ivf_flat", train_sample_size=50)
+    store.create_index()
+    sizes = []
+    train = store.index.train
+    monkeypatch.setattr(store.index, "train", lambda sample: sizes.append(len(sample)) or train(sample))
+    store.add_vectors(random_vectors(200), list(range(200)))
+    assert sizes == [50]
+    assert store.index.is_trained and store.index.ntotal == 200
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_mmap_load_searches_read_only(tmp_path, corpus, index_type):
+    vectors, _, _ = corpus
+    store = build(tmp_path, index_type, corpus)
+    store.delete([5])
+    store.save()
+    queries = vectors[::30]
+    expected = store.search_documents_batch(queries, top_k=5)
+    
+    mapped = make_store(tmp_path, "flat")
+    assert mapped.load(mmap=True)
+    assert mapped.read_only and mapped.get_stats()['mmap']
+    assert all(isinstance(array, np.memmap) for array in mapped.id_arrays())
+    assert mapped.num_documents() == NUM_DOCS - 1
+    assert mapped.search_documents_batch(queries, top_k=5) == expected
+    assert mapped._id_to_doc is None  # Searching does not build the dicts
+    
+    with pytest.raises(RuntimeError):
+        mapped.delete([6])
+    with pytest.raises(RuntimeError):
+        mapped.add_vectors(random_vectors(1), [NUM_DOCS + 1])
+    assert top_docs(mapped, vectors[15])[0] == 6
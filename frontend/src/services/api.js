@@ -12,7 +12,7 @@ const api = axios.create({
 export const searchAPI = {
   search: async (query, topK = 5) => {
     const response = await api.get('/search', {
-      params: { query, top_k: topK },
+      params: { query, top_k: topK, include_content: false },
     });
     return response.data;
   },